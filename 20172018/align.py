@@ -1,13 +1,8 @@
 import pandas as pd
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 
-nltk.download('punkt')
-nltk.download('stopwords')
-
-stop_words = set(stopwords.words('english'))
+from near_dedup import WEIGHT_COL, near_dedup
+from preprocessing import nltk_resources   # NLTK 延迟到首次清洗时载入
 
 def clean_text(text):
     if not isinstance(text, str):
@@ -17,12 +12,19 @@ def clean_text(text):
     text = re.sub(r"@\w+", "", text)     # 去除 @用户名
     text = re.sub(r"#", "", text)        # 去除 #
     text = re.sub(r"[^a-z\s]", "", text) # 去除非字母字符（保留空格）
+    word_tokenize, stop_words = nltk_resources()
     tokens = word_tokenize(text)
     # 保留 no, not，过滤其他停用词
     cleaned = [word for word in tokens if word not in stop_words or word in ['no', 'not']]
     return cleaned
 
-def align_stock_data(df):
+def align_stock_data(df, near_dup_threshold=0.8, dedup_by=('STOCK', 'DATE')):
+    """先按 TWEET 原文全局精确去重，再在 dedup_by 范围内（默认同一股票同一天）做近似去重；
+    near_dup_threshold=None 时只做精确去重
+
+    DUP_COUNT 只在按 (STOCK, DATE) 分组去重时写出：跨日 / 跨股票的簇若把权重记到最早一行，
+    下游按权重求日度均值时会把别的日期的副本算到这一天。
+    """
     # 日期格式转换，指定日/月/年格式
     df['DATE'] = pd.to_datetime(df['DATE'], format='%d/%m/%Y', errors='coerce')
 
@@ -30,9 +32,15 @@ def align_stock_data(df):
     required_cols = ['TWEET', 'STOCK', 'DATE', '1_DAY_RETURN', '2_DAY_RETURN', '3_DAY_RETURN', '7_DAY_RETURN']
     df = df.dropna(subset=required_cols)
 
-    # 去重：去除重复的推文（基于TWEET列）
+    # 去重 ①：原文完全相同的推文全局只留第一条（与原脚本一致，跨日 / 跨股票的刷屏转发也一并去掉）
     df = df.drop_duplicates(subset=['TWEET'])
 
+    # 去重 ②：转推 / 截断副本 / 复制粘贴按 MinHash LSH 近似去重，每簇保留最早一行，DUP_COUNT 记簇大小
+    if near_dup_threshold is not None:
+        df = near_dedup(df, text_col='TWEET', threshold=near_dup_threshold, by=list(dedup_by) if dedup_by else None)
+        if not {'STOCK', 'DATE'} <= set(dedup_by or ()):
+            df = df.drop(columns=WEIGHT_COL)
+
     # 如果有股票代码映射字典，可以这样映射：
     # 假设stock_code_map = {'PayPal': 'PYPL', 'Amazon': 'AMZN', ...}
     # 这里暂时直接用股票名称代替代码
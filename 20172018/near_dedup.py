@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# near_dedup.py
+# Coding: UTF-8
+"""
+Near-duplicate / retweet collapsing
+===================================
+* 文本先归一化（小写、去 `RT @user:` 前缀 / 链接 / @提及 / 标点 / 截断省略号），完全相同的先按哈希合并
+* 其余的用 **MinHash LSH**：字符 k-gram 的 MinHash 签名分 band 分桶，同桶候选对再用签名一致率
+  （Jaccard 估计）与 `threshold` 比较，连通分量即一个重复簇
+* 每簇保留最早出现的一行，`DUP_COUNT` 记录簇内行数：下游按它加权平均即可，不必处理每份副本
+* `by=("STOCK", "DATE")` 时只在同一股票同一天内合并，加权后的日度均值与不去重时完全一致；
+  不分组时簇可能跨日期，`DUP_COUNT` 只适合计数、不能当日度聚合的权重
+* 纯 NumPy / pandas 实现，签名按文档分块计算，内存与块大小成正比
+
+示例
+----
+```python
+from near_dedup import near_dedup
+df = near_dedup(df, threshold=0.8, by=["STOCK", "DATE"])   # 新增 DUP_COUNT 列，可作日度加权均值的权重
+```
+"""
+
+from __future__ import annotations
+
+import logging
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+WEIGHT_COL = "DUP_COUNT"
+_PRIME = np.uint64(4294967311)                 # > 2^32：(a·x + b) mod p，x 为 32 位 shingle 哈希
+
+_NORMALIZE = [
+    (r"^\s*rt\s+@\w+:?", " "),                # 转推前缀
+    (r"https?://\S*", " "),                    # 链接（含被截断的）
+    (r"@\w+", " "),                            # @提及
+    (r"(\.\.\.|…)\s*$", " "),                  # 截断省略号
+    (r"[^a-z0-9$ ]+", " "),                    # 标点、表情
+    (r"\s+", " "),
+]
+
+# ---------------------------------------------------------------------------
+# 归一化 & shingle
+# ---------------------------------------------------------------------------
+
+def normalize_text(text: pd.Series) -> pd.Series:
+    norm = text.astype(str).str.lower()
+    for pattern, repl in _NORMALIZE:
+        norm = norm.str.replace(pattern, repl, regex=True)
+    return norm.str.strip()
+
+
+def _shingle_hashes(texts: Sequence[str], k: int) -> tuple[np.ndarray, np.ndarray]:
+    """32-bit hashes of every character k-gram, plus per-document start offsets."""
+    grams, lengths = [], np.empty(len(texts), dtype=np.int64)
+    for i, t in enumerate(texts):
+        g = [t[j:j + k] for j in range(max(len(t) - k + 1, 1))]
+        grams.extend(g)
+        lengths[i] = len(g)
+    h = pd.util.hash_array(np.asarray(grams, dtype=object)) & np.uint64(0xFFFFFFFF)
+    starts = np.zeros(len(texts), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+    return h, starts
+
+# ---------------------------------------------------------------------------
+# MinHash & LSH
+# ---------------------------------------------------------------------------
+
+def lsh_params(threshold: float, num_perm: int) -> tuple[int, int]:
+    """(bands, rows) with bands·rows ≤ num_perm whose S-curve midpoint (1/b)^(1/r) is closest to `threshold`."""
+    best = min(((b, num_perm // b) for b in range(1, num_perm + 1)),
+               key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+    return best
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = 64, k: int = 5, seed: int = 1,
+                       batch: int = 50_000) -> np.ndarray:
+    """(n, num_perm) uint64 MinHash signatures of character k-gram sets."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2**32 - 1, num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2**32 - 1, num_perm, dtype=np.uint64)
+    sig = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for lo in range(0, len(texts), batch):
+        h, starts = _shingle_hashes(texts[lo:lo + batch], k)
+        for i in range(num_perm):                       # 逐个置换：临时数组只有 shingle 数那么长
+            sig[lo:lo + len(starts), i] = np.minimum.reduceat((a[i] * h + b[i]) % _PRIME, starts)
+    return sig
+
+
+def _components(n: int, u: np.ndarray, v: np.ndarray) -> np.ndarray:
+    """Connected-component label (smallest member) for each node, by min-label propagation."""
+    labels = np.arange(n)
+    while True:
+        m = np.minimum(labels[u], labels[v])
+        new = labels.copy()
+        np.minimum.at(new, u, m)
+        np.minimum.at(new, v, m)
+        new = new[new]                                  # 指针跳跃
+        if np.array_equal(new, labels):
+            return labels
+        labels = new
+
+
+def near_duplicate_clusters(texts: Sequence[str], threshold: float = 0.8, groups: np.ndarray | None = None,
+                            num_perm: int = 64, k: int = 5, seed: int = 1) -> np.ndarray:
+    """Cluster label per text (label = index of its earliest member)."""
+    n = len(texts)
+    groups = np.zeros(n, dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+    sig = minhash_signatures(texts, num_perm, k, seed)
+    bands, rows = lsh_params(threshold, num_perm)
+    mult = np.random.default_rng(seed + 1).integers(1, 2**63 - 1, rows + 1, dtype=np.uint64)
+
+    u_all, v_all = [], []
+    for bnd in range(bands):
+        # band 键 = 该 band 的签名与分组编号的混合哈希（uint64 溢出即取模）
+        key = sig[:, bnd * rows:(bnd + 1) * rows] @ mult[:rows] + groups.astype(np.uint64) * mult[rows]
+        order = np.argsort(key, kind="stable")
+        ks = key[order]
+        head = np.maximum.accumulate(np.where(np.r_[True, ks[1:] != ks[:-1]], np.arange(n), 0))
+        member = head != np.arange(n)
+        u_all.append(order[head[member]])               # 同桶成员连到桶内最早的文档
+        v_all.append(order[member])
+    u, v = np.concatenate(u_all), np.concatenate(v_all)
+    if len(u):
+        u, v = np.unique(np.stack([np.minimum(u, v), np.maximum(u, v)]), axis=1)
+        similar = (sig[u] == sig[v]).mean(axis=1) >= threshold
+        u, v = u[similar], v[similar]
+    return _components(n, u, v)
+
+# ---------------------------------------------------------------------------
+# DataFrame 接口
+# ---------------------------------------------------------------------------
+
+def near_dedup(df: pd.DataFrame, text_col: str = "TWEET", threshold: float = 0.8,
+               by: Sequence[str] | None = None, weight_col: str = WEIGHT_COL,
+               num_perm: int = 64, k: int = 5, seed: int = 1) -> pd.DataFrame:
+    """Collapse retweets / near-copies to their earliest row with a `weight_col` count.
+
+    An existing `weight_col` is summed, so the stage can be re-run on its own output.
+    """
+    if df.empty:
+        return df.assign(**{weight_col: pd.Series(dtype=np.int64)})
+    weight = df[weight_col].to_numpy() if weight_col in df else np.ones(len(df), dtype=np.int64)
+    group_ids = (pd.MultiIndex.from_frame(df[list(by)]).factorize()[0] if by
+                 else np.zeros(len(df), dtype=np.int64))
+
+    # 1) 归一化后完全相同 → 直接合并（哈希含分组编号）
+    norm = normalize_text(df[text_col])
+    exact = pd.factorize(norm)[0]
+    if by:
+        exact = pd.factorize(group_ids.astype(np.int64) * (exact.max() + 1) + exact)[0]
+    first = pd.Series(np.arange(len(df))).groupby(exact).transform("min").to_numpy()
+    uniq = np.flatnonzero(first == np.arange(len(df)))
+
+    # 2) 其余的 MinHash LSH
+    labels = near_duplicate_clusters(norm.to_numpy()[uniq].tolist(), threshold, group_ids[uniq], num_perm, k, seed)
+    rep_of_uniq = uniq[labels]                          # 每个唯一文本所属簇的最早一行
+    rep = rep_of_uniq[np.searchsorted(uniq, first)]
+
+    counts = np.bincount(rep, weights=weight, minlength=len(df))
+    keep = np.flatnonzero(rep == np.arange(len(df)))
+    out = df.iloc[keep].copy()
+    out[weight_col] = counts[keep].astype(weight.dtype)
+    logging.info("near_dedup: %d → %d 行（阈值 %.2f，完全重复 %d，近似重复 %d）", len(df), len(out), threshold,
+                 len(df) - len(uniq), len(uniq) - len(keep))
+    return out
@@ -0,0 +1,217 @@
+"""
+Per-ticker direction model trainer
+==================================
+* 全局只拟合 **一个** TF-IDF 词表（仅用各股票训练段的文本，避免前视）→ 一次 transform
+* 行按 (STOCK_CODE, DATE) 排序 → 每只股票的训练 / 测试集就是同一稀疏矩阵的连续行切片
+* 股票分发到进程池；每个子进程用 threadpoolctl 限制 BLAS / OpenMP 线程，避免超订
+* 每只股票保存一个模型文件，并输出 耗时 + 指标 汇总表
+
+运行示例
+--------
+```bash
+python per_ticker_trainer.py --data data/cleaned_aligned_data.csv --model logistic --workers 4
+python per_ticker_trainer.py --model xgboost --workers 4 --threads_per_worker 2
+```
+"""
+
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from scipy.stats import spearmanr
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegressionCV
+from sklearn.metrics import accuracy_score, f1_score, r2_score
+from threadpoolctl import threadpool_limits
+
+from preprocessing import load_and_preprocess
+
+LABEL_THRESHOLD = 0.01          # |1 日收益| ≤ 1% 视为中性，与 sentiment direction model.py 一致
+MIN_SAMPLES, MIN_TRAIN, MIN_TEST = 100, 50, 20
+
+# ---------------------------------------------------------------------------
+# 数据切分 & 全局特征
+# ---------------------------------------------------------------------------
+
+def make_labels(ret):
+    """-1 / 0 / 1 direction labels with a ±LABEL_THRESHOLD neutral band."""
+    return np.where(ret > LABEL_THRESHOLD, 1, np.where(ret < -LABEL_THRESHOLD, -1, 0))
+
+
+def split_by_ticker(df, ticker_col="STOCK_CODE", date_col="DATE"):
+    """Sort rows by (ticker, date) and mark each ticker's train / test rows.
+
+    Same rule as the per-stock loop it replaces: the last 20% of a ticker's
+    dates are held out; tickers below the size limits are skipped.
+    """
+    df = df.copy()
+    df["text_joined"] = df["cleaned_text"].astype(str)
+    df = df[(df["text_joined"].str.strip() != "") & df["1_DAY_RETURN"].notna()]
+    df = df.sort_values([ticker_col, date_col], kind="stable").reset_index(drop=True)
+
+    split_date = df.groupby(ticker_col)[date_col].transform(lambda d: d.quantile(0.8))
+    df["is_train"] = df[date_col] <= split_date
+
+    sizes = df.groupby(ticker_col)["is_train"].agg(n="size", n_train="sum")
+    sizes["n_test"] = sizes["n"] - sizes["n_train"]
+    ok = sizes[(sizes["n"] >= MIN_SAMPLES) & (sizes["n_train"] >= MIN_TRAIN)
+               & (sizes["n_test"] >= MIN_TEST)].index
+    skipped = sizes.index.difference(ok).tolist()
+    return df[df[ticker_col].isin(ok)].reset_index(drop=True), skipped
+
+
+def build_global_features(df, max_features=5000):
+    """One TF-IDF vocabulary fitted on training rows only, applied to all rows."""
+    vectorizer = TfidfVectorizer(max_features=max_features)
+    vectorizer.fit(df.loc[df["is_train"], "text_joined"])
+    X = vectorizer.transform(df["text_joined"]).tocsr()
+    return X, vectorizer
+
+# ---------------------------------------------------------------------------
+# 单只股票训练（子进程）
+# ---------------------------------------------------------------------------
+
+def _init_worker(threads):
+    # fork 出来的子进程已经载入 numpy，只能在运行时限制线程池
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    threadpool_limits(threads)
+
+
+def fit_logistic(X_train, y_train):
+    # 沿 C 路径 warm start，代替逐点 GridSearchCV
+    model = LogisticRegressionCV(
+        Cs=np.logspace(-3, 2, 6), cv=5, scoring="accuracy", solver="lbfgs",
+        class_weight="balanced", max_iter=10000, n_jobs=1,
+    )
+    model.fit(X_train, y_train)
+    return model
+
+
+def fit_xgboost(X_train, y_train):
+    # 在子进程内导入：xgboost 的 OpenMP 线程数读取 _init_worker 设置的 OMP_NUM_THREADS
+    from sentiment_xgboost import train_dual_binary_models
+
+    # sentiment_xgboost 的标签约定：0=下跌, 1=中性, 2=上涨
+    return train_dual_binary_models(X_train, y_train + 1)
+
+
+def direction_scores(kind, model, X):
+    """Expected direction in [-1, 1] and the hard -1 / 0 / 1 prediction."""
+    if kind == "logistic":
+        proba = model.predict_proba(X)
+        return proba @ model.classes_, model.predict(X)
+    from sentiment_xgboost import predict_dual
+
+    proba, y_pred = predict_dual(*model, X)
+    return proba @ np.array([-1, 0, 1]), y_pred - 1
+
+
+def train_one(ticker, kind, X_train, y_train, X_test, y_test, ret_test, out_path):
+    t0 = time.perf_counter()
+    fit = fit_logistic if kind == "logistic" else fit_xgboost
+    model = fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - t0
+
+    scores, y_pred = direction_scores(kind, model, X_test)
+    traded = y_pred != 0
+    joblib.dump({"ticker": ticker, "kind": kind, "model": model}, out_path)
+
+    return {
+        "ticker": ticker,
+        "model": kind,
+        "n_train": X_train.shape[0],
+        "n_test": X_test.shape[0],
+        "accuracy": accuracy_score(y_test, y_pred),
+        "f1_macro": f1_score(y_test, y_pred, average="macro"),
+        "ic": spearmanr(scores, ret_test).correlation,
+        "r2": r2_score(ret_test, scores),
+        "win_rate": (y_pred[traded] == y_test[traded]).mean() if traded.any() else np.nan,
+        "best_C": float(model.C_[0]) if kind == "logistic" else np.nan,
+        "fit_seconds": fit_seconds,
+        "total_seconds": time.perf_counter() - t0,
+        "model_path": str(out_path),
+    }
+
+# ---------------------------------------------------------------------------
+# 调度
+# ---------------------------------------------------------------------------
+
+def _safe_name(ticker):
+    return re.sub(r"[^\w.-]+", "_", str(ticker))
+
+
+def train_all(df, kind="logistic", model_dir="models_per_ticker", workers=None,
+              threads_per_worker=1, max_features=5000, ticker_col="STOCK_CODE"):
+    """Train one direction model per ticker in a process pool.
+
+    Returns the per-ticker timing / metrics table (also written to
+    ``<model_dir>/<kind>/per_ticker_metrics.csv``).
+    """
+    df, skipped = split_by_ticker(df, ticker_col)
+    if skipped:
+        print(f"🚫 样本不足，跳过 {len(skipped)} 只股票: {skipped}")
+    X, vectorizer = build_global_features(df, max_features)
+    y = make_labels(df["1_DAY_RETURN"].to_numpy())
+    ret = df["1_DAY_RETURN"].to_numpy()
+    is_train = df["is_train"].to_numpy()
+
+    out_dir = Path(model_dir) / kind
+    out_dir.mkdir(parents=True, exist_ok=True)
+    joblib.dump(vectorizer, out_dir / "vectorizer.joblib")
+
+    # 每只股票的行是连续区间；训练行在前（按日期排序）
+    codes = df[ticker_col].to_numpy()
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    ends = np.r_[starts[1:], len(df)]
+
+    workers = workers or os.cpu_count() or 1
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(threads_per_worker,)) as ex:
+        futures = []
+        for a, b in zip(starts, ends):
+            split = a + int(is_train[a:b].sum())
+            ticker = codes[a]
+            futures.append(ex.submit(
+                train_one, ticker, kind,
+                X[a:split], y[a:split], X[split:b], y[split:b], ret[split:b],
+                out_dir / f"{_safe_name(ticker)}.joblib",
+            ))
+        for fut in as_completed(futures):
+            res = fut.result()
+            print(f"✅ {res['ticker']}: IC={res['ic']:.4f} acc={res['accuracy']:.3f} "
+                  f"({res['total_seconds']:.1f}s)")
+            rows.append(res)
+
+    table = pd.DataFrame(rows).sort_values("ticker").reset_index(drop=True)
+    table.to_csv(out_dir / "per_ticker_metrics.csv", index=False)
+    return table
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-ticker direction model trainer")
+    ap.add_argument("--data", default="data/cleaned_aligned_data.csv")
+    ap.add_argument("--model", choices=["logistic", "xgboost"], default="logistic")
+    ap.add_argument("--model_dir", default="models_per_ticker")
+    ap.add_argument("--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    ap.add_argument("--threads_per_worker", type=int, default=1, help="每个进程的 BLAS/OpenMP 线程数")
+    ap.add_argument("--max_features", type=int, default=5000)
+    args = ap.parse_args()
+
+    print("📦 读取并预处理数据...")
+    df = load_and_preprocess(args.data)
+    t0 = time.perf_counter()
+    table = train_all(df, args.model, args.model_dir, args.workers,
+                      args.threads_per_worker, args.max_features)
+    print(table[["ticker", "n_train", "n_test", "accuracy", "ic", "fit_seconds"]].to_string(index=False))
+    print(f"⏱️ 共 {len(table)} 只股票，用时 {time.perf_counter() - t0:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
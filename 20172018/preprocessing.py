@@ -1,19 +1,32 @@
 import pandas as pd
 import re
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
 import os
-
-nltk.download('punkt')
-nltk.download('stopwords')
-
-# 载入停用词集合，后续可根据需求调整
-stop_words = set(stopwords.words('english'))
+from functools import lru_cache
 
 # 保留金融常用词示例（你可以根据需求扩充）
 finance_keep_words = {'no', 'not', 'buy', 'sell', 'hold', 'gain', 'loss'}
 
+
+@lru_cache(maxsize=None)
+def nltk_resources():
+    """(word_tokenize, english stop-word set), loaded on first use.
+
+    NLTK 只在真正清洗文本时导入；语料已存在则不访问网络，缺失时才下载一次。
+    """
+    import nltk
+
+    for resource, package in (('tokenizers/punkt', 'punkt'), ('corpora/stopwords', 'stopwords')):
+        try:
+            nltk.data.find(resource)
+        except LookupError:
+            nltk.download(package, quiet=True)
+
+    from nltk.corpus import stopwords
+    from nltk.tokenize import word_tokenize
+
+    # 载入停用词集合，后续可根据需求调整
+    return word_tokenize, frozenset(stopwords.words('english'))
+
 def clean_text(text):
     if not isinstance(text, str):
         return []
@@ -24,6 +37,7 @@ def clean_text(text):
     text = re.sub(r"#", "", text)          # 去除 #
     text = re.sub(r"[^a-z\s]", "", text)   # 去除非字母字符（保留空格）
 
+    word_tokenize, stop_words = nltk_resources()
     tokens = word_tokenize(text)
 
     # 过滤停用词，但保留金融关键动词
@@ -1,54 +1,122 @@
-from xgboost import XGBClassifier
+import numpy as np
+import xgboost as xgb
 from sklearn.metrics import classification_report, confusion_matrix, r2_score
 from scipy.stats import spearmanr
 
-def train_binary_model(X, y_binary, pos_label):
-    neg_weight = 1
-    pos_weight = (y_binary == 0).sum() / (y_binary == 1).sum()
-    model = XGBClassifier(
-        objective='binary:logistic',
-        eval_metric='logloss',
-        use_label_encoder=False,
-        scale_pos_weight=pos_weight
+# 两个二分类头共用的树参数：直方图算法 + 适度正则
+HEAD_PARAMS = {
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "tree_method": "hist",
+    "max_depth": 4,
+    "eta": 0.1,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+}
+MAX_BIN = 256
+
+
+def evaluate_ic(y_true_cont, scores):
+    ic = spearmanr(scores, y_true_cont).correlation
+    print(f"📈 IC（Information Coefficient）: {ic:.4f}")
+    return ic
+
+
+def _train_head(dtrain, dvalid, y_train, y_valid, num_boost_round, early_stopping_rounds, params):
+    """Train one binary head on the shared quantized matrices (labels swapped in place)."""
+    n_pos = max(int((y_train == 1).sum()), 1)
+    head_params = {**HEAD_PARAMS, **(params or {}),
+                   "scale_pos_weight": (y_train == 0).sum() / n_pos}
+    dtrain.set_label(y_train)
+    evals = []
+    if dvalid is not None:
+        dvalid.set_label(y_valid)
+        evals = [(dvalid, "valid")]
+    return xgb.train(
+        head_params, dtrain, num_boost_round=num_boost_round, evals=evals,
+        early_stopping_rounds=early_stopping_rounds if evals else None, verbose_eval=False,
     )
-    sample_weights = np.where(y_binary == 1, pos_weight, neg_weight)
-    model.fit(X, y_binary, sample_weight=sample_weights)
-    return model
 
-def train_dual_binary_models(X, y):
-    y_up = (y == 2).astype(int)
-    y_down = (y == 0).astype(int)
-
-    model_up = train_binary_model(X, y_up, pos_label=2)
-    model_down = train_binary_model(X, y_down, pos_label=0)
 
+def _quantized_split(X, n_rows, valid_frac):
+    """Shared quantized train matrix + a time-ordered validation tail using the same cuts."""
+    n_valid = int(n_rows * valid_frac) if valid_frac else 0
+    n_train = n_rows - n_valid
+    dtrain = xgb.QuantileDMatrix(X[:n_train], label=np.zeros(n_train), max_bin=MAX_BIN)
+    dvalid = (xgb.QuantileDMatrix(X[n_train:], label=np.zeros(n_valid), ref=dtrain)
+              if n_valid else None)
+    return dtrain, dvalid, n_train
+
+
+def train_dual_binary_models(X, y, valid_frac=0.2, num_boost_round=500,
+                             early_stopping_rounds=30, params=None):
+    """Up / down heads (labels 2 / 0 vs rest) trained on one quantized matrix.
+
+    Rows must be in time order: the last `valid_frac` of them form the
+    early-stopping validation set. The training matrix is quantized once and
+    reused by both heads; the validation matrix shares its histogram cuts.
+    """
+    y = np.asarray(y)
+    dtrain, dvalid, n_train = _quantized_split(X, len(y), valid_frac)
+    y_train, y_valid = y[:n_train], y[n_train:]
+
+    model_up = _train_head(dtrain, dvalid, (y_train == 2).astype(int), (y_valid == 2).astype(int),
+                           num_boost_round, early_stopping_rounds, params)
+    model_down = _train_head(dtrain, dvalid, (y_train == 0).astype(int), (y_valid == 0).astype(int),
+                             num_boost_round, early_stopping_rounds, params)
     return model_up, model_down
 
-def predict_with_dual_models(model_up, model_down, X):
-    pred_up = model_up.predict(X)
-    pred_down = model_down.predict(X)
 
-    y_pred = np.full_like(pred_up, fill_value=1)  # default to neutral
-    y_pred[pred_up == 1] = 2
-    y_pred[pred_down == 1] = 0
-    return y_pred
+def train_binary_model(X, y_binary, pos_label=None, valid_frac=0.2, num_boost_round=500,
+                       early_stopping_rounds=30, params=None):
+    """Single head with the same settings (kept for one-sided experiments)."""
+    y_binary = np.asarray(y_binary).astype(int)
+    dtrain, dvalid, n_train = _quantized_split(X, len(y_binary), valid_frac)
+    return _train_head(dtrain, dvalid, y_binary[:n_train], y_binary[n_train:],
+                       num_boost_round, early_stopping_rounds, params)
+
+
+def _predict_head(booster, dmatrix):
+    best = getattr(booster, "best_iteration", None)
+    return booster.predict(dmatrix, iteration_range=(0, best + 1) if best is not None else (0, 0))
+
+
+def predict_dual(model_up, model_down, X, batch_size=None):
+    """3-class probabilities [down, neutral, up] and hard 0 / 1 / 2 labels in one pass.
+
+    Each batch is wrapped in a single DMatrix that both heads read; a head
+    fires above 0.5 and "down" wins when both fire.
+    """
+    n = X.shape[0]
+    step = batch_size or max(n, 1)
+    proba = np.empty((n, 3))
+    y_pred = np.ones(n, dtype=int)  # default to neutral
+    for start in range(0, n, step):
+        rows = slice(start, start + step)
+        dm = xgb.DMatrix(X[rows])
+        proba_up = _predict_head(model_up, dm)
+        proba_down = _predict_head(model_down, dm)
+        proba_neutral = 1 - np.maximum(proba_up, proba_down)
+
+        # Normalize to make probabilities sum to 1
+        total = proba_up + proba_down + proba_neutral
+        proba[rows] = np.column_stack([proba_down, proba_neutral, proba_up]) / total[:, None]
+        labels = y_pred[rows]
+        labels[proba_up > 0.5] = 2
+        labels[proba_down > 0.5] = 0
+    return proba, y_pred
+
+
+def predict_proba_with_dual_models(model_up, model_down, X, batch_size=None):
+    return predict_dual(model_up, model_down, X, batch_size)[0]
+
 
-def predict_proba_with_dual_models(model_up, model_down, X):
-    proba_up = model_up.predict_proba(X)[:, 1]
-    proba_down = model_down.predict_proba(X)[:, 1]
-    proba_neutral = 1 - np.maximum(proba_up, proba_down)
+def predict_with_dual_models(model_up, model_down, X, batch_size=None):
+    return predict_dual(model_up, model_down, X, batch_size)[1]
 
-    # Normalize to make probabilities sum to 1
-    total = proba_up + proba_down + proba_neutral
-    return np.vstack([
-        proba_down / total,
-        proba_neutral / total,
-        proba_up / total
-    ]).T
 
 def report_dual(model_up, model_down, X_test, y_test, y_test_continuous):
-    y_pred = predict_with_dual_models(model_up, model_down, X_test)
-    y_proba = predict_proba_with_dual_models(model_up, model_down, X_test)
+    y_proba, y_pred = predict_dual(model_up, model_down, X_test)
     scores = y_proba @ np.array([-1, 0, 1])
 
     print("\n📊 Classification Report:")
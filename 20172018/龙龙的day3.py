@@ -5,15 +5,17 @@
 
 import argparse
 import logging
-import math
+import sys
 from pathlib import Path
 from typing import Tuple, Dict
 
 import numpy as np
 import pandas as pd
-from scipy import stats
 from tqdm import tqdm
 
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))   # 根目录的共享模块
+from metrics_kernel import metrics_frame, perf_metrics as kernel_perf_metrics
+
 def setup_logging():
     logging.basicConfig(
         level=logging.INFO,
@@ -68,24 +70,12 @@ def make_long_short_weights(
 
     return w_long.fillna(0.0), w_short.fillna(0.0)
 
-# Metrics
+# Metrics —— 与根目录脚本共用 metrics_kernel
 def perf_metrics(returns, rf=0.0, periods_per_year=252):
-    ann_ret = returns.mean() * periods_per_year
-    ann_vol = returns.std() * np.sqrt(periods_per_year)
-
-    if isinstance(ann_vol, pd.Series):
-        # element-wise check
-        sharpe = (ann_ret - rf) / ann_vol
-        sharpe = sharpe.where(ann_vol > 0, np.nan)
-    else:
-        sharpe = (ann_ret - rf) / ann_vol if ann_vol > 0 else np.nan
-
-    return {
-        "annual_return": ann_ret,
-        "annual_volatility": ann_vol,
-        "sharpe_ratio": sharpe,
-        # add more metrics if needed
-    }
+    if isinstance(returns, pd.DataFrame):
+        # 多列收益：逐列一次性计算，返回 {指标: Series}
+        return metrics_frame(returns, rf, periods_per_year).to_dict(orient="series")
+    return kernel_perf_metrics(returns, rf, periods_per_year)
 
 
 # VectorBT backtest
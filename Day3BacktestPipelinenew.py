@@ -6,15 +6,18 @@ from __future__ import annotations
 
 import argparse
 import logging
-import math
 import os
 from pathlib import Path
 from typing import Tuple, Dict
 
 import numpy as np
 import pandas as pd
-from scipy import stats
-from tqdm import tqdm
+
+from build_prices_from_cleaned import trading_calendar
+from metrics_kernel import perf_metrics
+from results_store import DEFAULT_DB, ResultsStore, data_version
+from signal_aggregator import read_signals
+from sparse_signals import SparseSignals, long_short_weights
 
 # ---------------------------------------------------------------------------
 # Logging helper
@@ -27,6 +30,16 @@ def setup_logging():
         datefmt="%H:%M:%S",
     )
 
+
+def record_run(experiment: str, params: Dict, met: Dict[str, float], *inputs,
+               results_db: str | Path | None = DEFAULT_DB):
+    """Append one run to the shared results store (no-op if `results_db` is empty)."""
+    if not results_db:
+        return
+    with ResultsStore(results_db) as store:
+        store.append(experiment, params, met,
+                     data_version=data_version(*(p for p in inputs if p)))
+
 # ---------------------------------------------------------------------------
 # 0. Signal Preparation
 # ---------------------------------------------------------------------------
@@ -38,12 +51,14 @@ def generate_daily_signals(
     p_pos_col: str = "p_pos",
     p_neg_col: str = "p_neg",
     method: str = "net",
-) -> pd.DataFrame:
+    sparse: bool = False,
+) -> pd.DataFrame | SparseSignals:
     """Aggregate tweet-level predictions into **daily stock sentiment signal**.
 
     Returns
     -------
-    DataFrame indexed by [`date`, `ticker`] with single column `signal`.
+    Wide date × ticker DataFrame, or the `SparseSignals` CSR form when
+    ``sparse=True`` (no NaN-filled matrix is ever built).
     """
     df = pd.read_csv(tweet_pred_csv, parse_dates=[date_col])
     if method == "net":
@@ -53,62 +68,33 @@ def generate_daily_signals(
     else:
         raise ValueError("method must be 'net' or 'proba'")
 
-    daily = (
-        df.groupby([date_col, ticker_col])["signal"].mean().unstack(fill_value=np.nan)
-    )
-    daily.sort_index(inplace=True)
-    return daily                  # rows=date, cols=ticker (wide format)
+    daily = SparseSignals.from_long(df, date_col, ticker_col, "signal")
+    return daily if sparse else daily.to_wide()   # rows=date, cols=ticker (wide format)
 
 # ---------------------------------------------------------------------------
 # 1. Portfolio Construction helper
 # ---------------------------------------------------------------------------
 
 def make_long_short_weights(
-    signal_wide: pd.DataFrame,
+    signal_wide: pd.DataFrame | SparseSignals,
     top_n: int = 50,
     weight_scheme: str = "equal",
-) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """Create **long & short weight matrices** aligned with `signal_wide` index."""
-    w_long = signal_wide.copy(deep=False) * np.nan
-    w_short = w_long.copy(deep=False)
-
-    for dt, row in tqdm(signal_wide.iterrows(),
-                        total=len(signal_wide),
-                        desc="assign weights"):
-        s = row.dropna()
-        if s.empty:
-            continue
-        top = s.nlargest(top_n)
-        bottom = s.nsmallest(top_n)
-
-        if weight_scheme == "equal":
-            w_long.loc[dt, top.index] = 1.0 / len(top)
-            w_short.loc[dt, bottom.index] = -1.0 / len(bottom)
-        else:                      # value-weight by |signal|
-            pos_w = top.abs() / top.abs().sum()
-            neg_w = bottom.abs() / bottom.abs().sum()
-            w_long.loc[dt, pos_w.index] = pos_w
-            w_short.loc[dt, neg_w.index] = -neg_w
+) -> Tuple[pd.DataFrame, pd.DataFrame] | Tuple[SparseSignals, SparseSignals]:
+    """Create **long & short weights**; wide input → matrices aligned with
+    `signal_wide`, sparse input → sparse weights (densify only for vectorbt)."""
+    if isinstance(signal_wide, SparseSignals):
+        return long_short_weights(signal_wide, top_n, weight_scheme)
 
-    return w_long.fillna(0.0), w_short.fillna(0.0)
+    w_long, w_short = long_short_weights(SparseSignals.from_wide(signal_wide), top_n, weight_scheme)
+    return (w_long.to_wide(signal_wide.index, signal_wide.columns, fill_value=0.0),
+            w_short.to_wide(signal_wide.index, signal_wide.columns, fill_value=0.0))
 
 # ---------------------------------------------------------------------------
 # 2. Evaluation metrics
 # ---------------------------------------------------------------------------
 
-def perf_metrics(ret: pd.Series, rf: float = 0.0) -> Dict[str, float]:
-    ann_factor = 252
-    ann_ret = (1 + ret).prod() ** (ann_factor / len(ret)) - 1
-    ann_vol = ret.std(ddof=0) * math.sqrt(ann_factor)
-    sharpe = (ann_ret - rf) / ann_vol if ann_vol > 0 else np.nan
-    max_dd = ((1 + ret).cumprod().cummax() - (1 + ret).cumprod()).max()
-    t_stat, p_val = stats.ttest_1samp(ret, 0.0, nan_policy="omit")
-    return dict(ann_ret=ann_ret,
-                ann_vol=ann_vol,
-                sharpe=sharpe,
-                max_dd=max_dd,
-                t_stat=t_stat,
-                p_value=p_val)
+# `perf_metrics` 来自 metrics_kernel：所有脚本共用同一套数值指标内核
+# (年化收益：算术 ann_ret、几何 cagr（本脚本原 ann_ret 的定义）/ 波动 / Sharpe / Sortino / 回撤及时长 / t 值 / 胜率 / Calmar)
 
 # ---------------------------------------------------------------------------
 # 3A. VectorBT Pipeline
@@ -136,7 +122,7 @@ def run_vectorbt(
 
     # ---------- Load data ---------- #
     logging.info("Loading signals & prices …")
-    signals = pd.read_parquet(signals_path)
+    signals = read_signals(signals_path)
     prices = pd.read_parquet(prices_path)
 
     # 对齐交集
@@ -197,6 +183,8 @@ def run_vectorbt(
     ret = nav.pct_change().dropna()
     met = perf_metrics(ret)
     pd.DataFrame([met]).to_csv(outdir / "metrics.csv", index=False)
+    record_run("vectorbt", dict(top_n=top_n, cost_bps=cost_bps, weight_scheme=weight_scheme),
+               met, signals_path, prices_path)
 
     # ---------- Plots ---------- #
     nav.plot(title="Cumulative Net Value", figsize=(8, 4))
@@ -225,6 +213,48 @@ def run_vectorbt(
 # 3B. Zipline Algorithm
 # ---------------------------------------------------------------------------
 
+def build_target_books(
+    signal_wide: pd.DataFrame,
+    top_n: int = 50,
+) -> Dict[pd.Timestamp, Dict[str, float]]:
+    """Precompute the **per-date target book** ``{ticker: weight}``.
+
+    Each side gets ``1 / (2 * top_n)`` per name, as in the original
+    ``handle_data``; names that land in both sides (thin days) end up short.
+    Dates without any signal are left out, so the previous book is held.
+    """
+    values = signal_wide.to_numpy(dtype=float)
+    tickers = signal_wide.columns.to_numpy()
+    weight = 1.0 / (2 * top_n)
+
+    books: Dict[pd.Timestamp, Dict[str, float]] = {}
+    for dt, row in zip(signal_wide.index, values):
+        valid = np.flatnonzero(~np.isnan(row))
+        if valid.size == 0:
+            continue
+        top = valid[np.argsort(-row[valid], kind="stable")[:top_n]]
+        bottom = valid[np.argsort(row[valid], kind="stable")[:top_n]]
+        book = {tkr: +weight for tkr in tickers[top]}
+        book.update({tkr: -weight for tkr in tickers[bottom]})
+        books[_as_naive_day(dt)] = book
+    return books
+
+
+def diff_target_books(
+    prev: Dict[str, float],
+    new: Dict[str, float],
+) -> Dict[str, float]:
+    """Targets that changed between two books (dropped names → 0)."""
+    orders = {tkr: w for tkr, w in new.items() if prev.get(tkr) != w}
+    orders.update({tkr: 0.0 for tkr in prev.keys() - new.keys()})
+    return orders
+
+
+def _as_naive_day(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts).normalize()
+    return ts.tz_localize(None) if ts.tzinfo is not None else ts
+
+
 def make_zipline_algorithm(
     signals_path: str | Path,
     top_n: int = 50,
@@ -236,36 +266,31 @@ def make_zipline_algorithm(
         commission, slippage
     )
 
-    sig_df = pd.read_parquet(signals_path)      # daily wide
+    sig_df = read_signals(signals_path)         # daily wide
     tickers = sig_df.columns.tolist()
+    books = build_target_books(sig_df, top_n)   # 回测前一次性预计算
 
     def initialize(context):
-        context.top_n = top_n
-        context.signals = sig_df
+        context.books = books
+        context.current_book = {}
         context.asset_map = {tkr: symbol(tkr) for tkr in tickers}
         set_commission(commission.PerDollar(cost_bps / 10000))
         set_slippage(slippage.FixedSlippage(spread=cost_bps / 10000))
 
     def handle_data(context, data):
-        today = data.current_dt.normalize()
-        if today not in context.signals.index:
+        book = context.books.get(_as_naive_day(data.current_dt))
+        if book is None:
             return
-        row = context.signals.loc[today].dropna()
-        if row.empty:
-            return
-
-        longs = row.nlargest(context.top_n).index
-        shorts = row.nsmallest(context.top_n).index
-        weight = 1.0 / (2 * context.top_n)      # 等权
 
-        for tkr in longs:
-            order_target_percent(context.asset_map[tkr], +weight)
-        for tkr in shorts:
-            order_target_percent(context.asset_map[tkr], -weight)
-        for tkr in set(context.asset_map) - set(longs) - set(shorts):
-            order_target_percent(context.asset_map[tkr], 0)
+        # 只对目标权重发生变化的股票下单
+        orders = diff_target_books(context.current_book, book)
+        for tkr, w in orders.items():
+            order_target_percent(context.asset_map[tkr], w)
+        context.current_book = book
 
-        record(longs=len(longs), shorts=len(shorts))
+        record(longs=sum(w > 0 for w in book.values()),
+               shorts=sum(w < 0 for w in book.values()),
+               orders=len(orders))
 
     return initialize, handle_data
 
@@ -299,9 +324,127 @@ def run_zipline(
     ret = perf["portfolio_value"].pct_change().dropna()
     met = perf_metrics(ret)
     pd.DataFrame([met]).to_csv(outdir / "metrics.csv", index=False)
+    record_run("zipline", dict(top_n=top_n, cost_bps=cost_bps, start=start, end=end,
+                               capital_base=capital_base), met, signals_path)
 
     logging.info("Zipline run complete ⇒ %s", outdir)
 
+# ---------------------------------------------------------------------------
+# 3C. Local event-driven engine (offline stand-in for the zipline bundle)
+# ---------------------------------------------------------------------------
+
+def make_synthetic_prices(
+    tickers,
+    dates,
+    seed: int = 42,
+    daily_vol: float = 0.02,
+    start_price: float = 100.0,
+) -> pd.DataFrame:
+    """GBM close prices on the given calendar — replaces the `quandl` bundle."""
+    rng = np.random.default_rng(seed)
+    dates = pd.DatetimeIndex(dates)
+    log_ret = rng.normal(-0.5 * daily_vol ** 2, daily_vol,
+                         size=(len(dates), len(tickers)))
+    log_ret[0] = 0.0
+    prices = start_price * np.exp(np.cumsum(log_ret, axis=0))
+    return pd.DataFrame(prices, index=dates, columns=list(tickers))
+
+
+def run_event_driven(
+    signals_path: str | Path,
+    prices_path: str | Path | None = None,
+    top_n: int = 50,
+    cost_bps: float = 10,
+    capital_base: float = 1e6,
+    outdir: str | Path = "results_events",
+    seed: int = 42,
+) -> pd.DataFrame:
+    """Bar-by-bar replay of the zipline algorithm without zipline.
+
+    Orders are sized with the bar's close (like `order_target_percent`) and
+    filled at the next bar's close, paying `cost_bps` per traded dollar.
+    A target whose ticker has no price on the bar is retried on later bars
+    until it can be ordered. Without `prices_path` a synthetic price panel
+    is generated on business days plus the signal dates.
+    """
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    signals = read_signals(signals_path)
+    signals.index = pd.DatetimeIndex([_as_naive_day(d) for d in signals.index])
+    if prices_path is not None:
+        prices = pd.read_parquet(prices_path)
+        prices.index = pd.DatetimeIndex([_as_naive_day(d) for d in prices.index])
+        signals = signals[signals.columns.intersection(prices.columns)]
+        prices = prices[signals.columns]
+    else:
+        logging.info("No price file → synthetic prices (seed=%d)", seed)
+        # 工作日 ∪ 信号日期：周末发出的目标不会因为没有对应 bar 而被丢掉
+        calendar = trading_calendar(signals.index)
+        prices = make_synthetic_prices(signals.columns, calendar, seed=seed)
+
+    books = build_target_books(signals, top_n)
+    tickers = prices.columns.tolist()
+    col = {tkr: j for j, tkr in enumerate(tickers)}
+    px = prices.ffill().to_numpy(dtype=float)
+    fee = cost_bps / 10000
+
+    cash = float(capital_base)
+    shares = np.zeros(len(tickers))
+    pending = np.zeros(len(tickers))            # 下一根 bar 成交的股数
+    current_book: Dict[str, float] = {}       # 已发单的目标
+    target_book: Dict[str, float] = {}        # 最新信号给出的目标
+    records = []
+
+    for i, dt in enumerate(prices.index):
+        close = px[i]
+        tradable = ~np.isnan(close)
+
+        # ---- 成交上一根 bar 的挂单 ---- #
+        fill = np.where(tradable, pending, 0.0)
+        traded = np.abs(fill * np.nan_to_num(close)).sum()
+        cash -= (fill * np.nan_to_num(close)).sum() + traded * fee
+        shares += fill
+        pending = np.where(tradable, 0.0, pending)
+
+        value = cash + (shares * np.nan_to_num(close)).sum()
+
+        # ---- 仅对变化的目标发单；无价格的标的留到之后的 bar 重试 ---- #
+        n_orders = 0
+        target_book = books.get(dt, target_book)
+        for tkr, w in diff_target_books(current_book, target_book).items():
+            j = col[tkr]
+            if not tradable[j]:
+                continue
+            pending[j] = w * value / close[j] - shares[j]
+            n_orders += 1
+            if w == 0.0:
+                current_book.pop(tkr, None)
+            else:
+                current_book[tkr] = w
+
+        records.append(dict(date=dt,
+                            portfolio_value=value,
+                            cash=cash,
+                            turnover=traded,
+                            orders=n_orders,
+                            longs=sum(w > 0 for w in current_book.values()),
+                            shorts=sum(w < 0 for w in current_book.values())))
+
+    perf = pd.DataFrame(records).set_index("date")
+    perf.to_csv(outdir / "perf.csv")
+    ret = perf["portfolio_value"].pct_change().dropna()
+    met = perf_metrics(ret)
+    pd.DataFrame([met]).to_csv(outdir / "metrics.csv", index=False)
+    record_run("events", dict(top_n=top_n, cost_bps=cost_bps, capital_base=capital_base,
+                              synthetic=prices_path is None,
+                              seed=seed if prices_path is None else None),
+               met, signals_path, prices_path)
+
+    logging.info("Event-driven run complete (%d orders) ⇒ %s",
+                 int(perf["orders"].sum()), outdir)
+    return perf
+
 # ---------------------------------------------------------------------------
 # 4. CLI entry
 # ---------------------------------------------------------------------------
@@ -348,6 +491,25 @@ def build_arg_parser() -> argparse.ArgumentParser:
     p_zip.add_argument("--outdir", default="results_zip",
                        help="结果输出目录")
 
+    # ---------------- Events (offline) --------
+    p_evt = subparsers.add_parser(
+        "events", help="offline event-driven run (precomputed target books)"
+    )
+    p_evt.add_argument("--signals", default="signals.parquet",
+                       help="日度信号文件 (parquet)")
+    p_evt.add_argument("--prices", default=None,
+                       help="收盘价矩阵 (parquet)；缺省则使用合成价格")
+    p_evt.add_argument("--top_n", type=int, default=50,
+                       help="多空两侧各取前 N 只股票")
+    p_evt.add_argument("--cost_bps", type=float, default=10,
+                       help="单边交易成本，单位 bps")
+    p_evt.add_argument("--capital_base", type=float, default=1e6,
+                       help="初始资金")
+    p_evt.add_argument("--seed", type=int, default=42,
+                       help="合成价格随机种子")
+    p_evt.add_argument("--outdir", default="results_events",
+                       help="结果输出目录")
+
     # ---------- 全局默认：vectorbt + 参数缺省 ----------
     parser.set_defaults(
         mode="vectorbt",
@@ -387,8 +549,18 @@ def main():
             capital_base=args.capital_base,
             outdir=args.outdir,
         )
+    elif args.mode == "events":
+        run_event_driven(
+            signals_path=args.signals,
+            prices_path=args.prices,
+            top_n=args.top_n,
+            cost_bps=args.cost_bps,
+            capital_base=args.capital_base,
+            outdir=args.outdir,
+            seed=args.seed,
+        )
     else:          # 理论不会触发，防御
-        parser.error("Unknown mode. Choose 'vectorbt' or 'zipline'.")
+        parser.error("Unknown mode. Choose 'vectorbt', 'zipline' or 'events'.")
 
 if __name__ == "__main__":
     main()
@@ -3,12 +3,9 @@ import logging
 from pathlib import Path
 import numpy as np
 import pandas as pd
-from scipy import stats
-import matplotlib.pyplot as plt
-import seaborn as sns
-import vectorbt as vbt
-from tqdm import tqdm
-from markdown2 import markdown
+
+# scipy / matplotlib / seaborn / vectorbt / tqdm / markdown2 在用到它们的函数内导入，--help 与网格展开不付启动开销
+from signal_aggregator import read_signals
 
 def setup_logging():
     logging.basicConfig(
@@ -49,6 +46,8 @@ def make_long_short_weights(
     top_n: int = 50,
     weight_scheme: str = "equal",
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
+    from tqdm import tqdm
+
     w_long = signal_wide.copy(deep=False) * np.nan
     w_short = w_long.copy(deep=False)
 
@@ -77,6 +76,8 @@ def format_number(x, pct=False, digits=2):
         return f"{x:.{digits}%}" if pct else f"{x:.{digits}f}"
 
 def perf_metrics(returns: pd.Series, rf=0.0, periods_per_year=252) -> dict:
+    from scipy import stats
+
     if isinstance(returns, pd.DataFrame):
         assert returns.shape[1] == 1, "returns DataFrame must have only one column"
         returns = returns.squeeze()
@@ -123,10 +124,15 @@ def run_vectorbt(
     outdir: str | Path = "results_vbt",
     benchmark_ticker: str = "SPY",
 ):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+    import vectorbt as vbt
+    from markdown2 import markdown
+
     outdir = Path(outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    signals = pd.read_parquet(signals_path)
+    signals = read_signals(signals_path)
     prices = pd.read_parquet(prices_path)
 
     common_cols = signals.columns.intersection(prices.columns)
@@ -1,14 +1,18 @@
 import argparse
 import logging
 from pathlib import Path
-import numpy as np
 import pandas as pd
-from scipy import stats
-import matplotlib.pyplot as plt
-import seaborn as sns
-import vectorbt as vbt
-from tqdm import tqdm
-from markdown2 import markdown
+
+# vectorbt 在用到的函数内导入：
+# `--help` 与参数解析不再为它们付出数秒的冷启动；图由 plot_queue 在子进程中渲染
+from metrics_kernel import perf_metrics
+from plot_queue import PlotQueue, add_plot_args
+from quantile_returns import quantile_spread_stats
+from report_builder import build_grid_report, render_run
+from results_store import DEFAULT_DB, ResultsStore, data_version
+from sparse_signals import SparseSignals, long_short_weights, read_sparse_signals
+from sparse_signals import quantile_returns as sparse_quantile_returns
+from stage_timer import add_timing_args, configure_from_args, stage
 
 def setup_logging():
     logging.basicConfig(
@@ -24,7 +28,8 @@ def generate_daily_signals(
     p_pos_col: str = "p_pos",
     p_neg_col: str = "p_neg",
     method: str = "net",
-) -> pd.DataFrame:
+    sparse: bool = False,
+) -> pd.DataFrame | SparseSignals:
     df = pd.read_csv(tweet_pred_csv, parse_dates=[date_col])
 
     # 构建信号列
@@ -35,84 +40,24 @@ def generate_daily_signals(
     else:
         raise ValueError("method must be 'net' or 'proba'")
 
-    # 构建日期-股票宽表
-    daily = df.groupby([date_col, ticker_col])["signal"].mean().unstack(fill_value=np.nan)
-    daily.sort_index(inplace=True)
-
-    # 向后移动1天，防止未来信息穿越
-    daily = daily.shift(1)
+    # 日期 × 股票的稀疏信号（CSR），向后移动1天，防止未来信息穿越
+    daily = SparseSignals.from_long(df, date_col, ticker_col, "signal").shift(1)
 
-    return daily
+    # sparse=False 时保持旧接口：日期-股票宽表
+    return daily if sparse else daily.to_wide()
 
 def make_long_short_weights(
-    signal_wide: pd.DataFrame,
+    signal_wide: pd.DataFrame | SparseSignals,
     top_n: int = 50,
     weight_scheme: str = "equal",
-) -> tuple[pd.DataFrame, pd.DataFrame]:
-    w_long = signal_wide.copy(deep=False) * np.nan
-    w_short = w_long.copy(deep=False)
-
-    for dt, row in tqdm(signal_wide.iterrows(), total=len(signal_wide), desc="assign weights"):
-        s = row.dropna()
-        if s.empty:
-            continue
-        top = s.nlargest(top_n)
-        bottom = s.nsmallest(top_n)
-
-        if weight_scheme == "equal":
-            w_long.loc[dt, top.index] = 1.0 / len(top)
-            w_short.loc[dt, bottom.index] = -1.0 / len(bottom)
-        else:
-            pos_w = top.abs() / top.abs().sum()
-            neg_w = bottom.abs() / bottom.abs().sum()
-            w_long.loc[dt, pos_w.index] = pos_w
-            w_short.loc[dt, neg_w.index] = -neg_w
-
-    return w_long.fillna(0.0), w_short.fillna(0.0)
-
-def format_number(x, pct=False, digits=2):
-    if isinstance(x, (pd.Series, pd.DataFrame)):
-        return x.applymap(lambda v: f"{v:.{digits}%}" if pct else f"{v:.{digits}f}") if isinstance(x, pd.DataFrame) else x.apply(lambda v: f"{v:.{digits}%}" if pct else f"{v:.{digits}f}")
-    else:
-        return f"{x:.{digits}%}" if pct else f"{x:.{digits}f}"
-
-def perf_metrics(returns: pd.Series, rf=0.0, periods_per_year=252) -> dict:
-    if isinstance(returns, pd.DataFrame):
-        assert returns.shape[1] == 1, "returns DataFrame must have only one column"
-        returns = returns.squeeze()
-    assert isinstance(returns, pd.Series), "returns must be a pandas Series"
-    assert returns.ndim == 1, "returns must be one-dimensional"
-    assert returns.dropna().size > 1, "returns must contain more than one non-NaN value"
-
-    ann_ret = returns.mean() * periods_per_year
-    ann_vol = returns.std() * np.sqrt(periods_per_year)
-
-    sharpe = (ann_ret - rf) / ann_vol if ann_vol > 0 else np.nan
-    t_stat_val, p_value_val = stats.ttest_1samp(returns.dropna().values, 0)
-    t_stat = float(t_stat_val)
-    p_value = float(p_value_val)
-
-    nav = (1 + returns).cumprod()
-    dd = 1 - nav / nav.cummax()
-    max_dd = dd.max()
-
-    return {
-        "ann_ret": format_number(ann_ret, pct=True, digits=4),
-        "ann_vol": format_number(ann_vol, digits=2),
-        "sharpe": format_number(sharpe, digits=2),
-        "max_dd": format_number(max_dd, pct=True, digits=2),
-        "t_stat": round(t_stat, 2),
-        "p_value": round(p_value, 4),
-    }
-
-def signal_quantile_returns(signals: pd.DataFrame, prices: pd.DataFrame, n_bins: int = 5) -> pd.DataFrame:
-    quantiles = signals.apply(lambda x: pd.qcut(x, n_bins, labels=False, duplicates='drop'), axis=1)
-    forward_returns = prices.pct_change(fill_method=None).shift(-1)
-    binned_returns = {
-        f"Q{i+1}": forward_returns.where(quantiles == i).mean(axis=1)
-        for i in range(n_bins)
-    }
-    return pd.DataFrame(binned_returns)
+) -> tuple[pd.DataFrame, pd.DataFrame] | tuple[SparseSignals, SparseSignals]:
+    """Top / bottom `top_n` weights per date; sparse in → sparse out, wide in → wide (0-filled) out."""
+    if isinstance(signal_wide, SparseSignals):
+        return long_short_weights(signal_wide, top_n, weight_scheme)
+
+    w_long, w_short = long_short_weights(SparseSignals.from_wide(signal_wide), top_n, weight_scheme)
+    return (w_long.to_wide(signal_wide.index, signal_wide.columns, fill_value=0.0),
+            w_short.to_wide(signal_wide.index, signal_wide.columns, fill_value=0.0))
 
 def run_vectorbt(
     signals_path: str | Path,
@@ -122,86 +67,103 @@ def run_vectorbt(
     weight_scheme: str = "equal",
     outdir: str | Path = "results_vbt",
     benchmark_ticker: str = "SPY",
+    results_db: str | Path | None = DEFAULT_DB,
+    plots: PlotQueue | None = None,
 ):
+    import vectorbt as vbt
+
+    own_plots = plots is None
+    if own_plots:
+        plots = PlotQueue()
+
     outdir = Path(outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
-    signals = pd.read_parquet(signals_path)
-    prices = pd.read_parquet(prices_path)
-
-    common_cols = signals.columns.intersection(prices.columns)
-    signals, prices = signals[common_cols], prices[common_cols]
-    prices = prices.loc[signals.index]
-
-    w_long, w_short = make_long_short_weights(signals, top_n, weight_scheme)
-    long_entries = w_long > 0
-    long_exits = long_entries.shift(-1).fillna(False)
-    short_entries = w_short < 0
-    short_exits = short_entries.shift(-1).fillna(False)
-
-    long_size = w_long.clip(lower=0)
-    short_size = (-w_short).clip(lower=0)
-    fees = cost_bps / 10000
-
-    long_pf = vbt.Portfolio.from_signals(close=prices, entries=long_entries, exits=long_exits, size=long_size, fees=fees, freq="D", init_cash=0.5)
-    short_pf = vbt.Portfolio.from_signals(close=prices, entries=short_entries, exits=short_exits, size=short_size, fees=fees, freq="D", init_cash=0.5)
-
-    combined_nav = long_pf.value() + short_pf.value()
-    combined_nav.name = "NAV"
-    returns = combined_nav.pct_change().dropna()
-    if isinstance(returns, pd.DataFrame):
-        returns = returns.mean(axis=1)
-
-    met = perf_metrics(returns)
-    pd.DataFrame([met]).to_csv(outdir / "metrics.csv", index=False)
-
-    plt.figure(figsize=(10, 5))
-    combined_nav.plot(label="Strategy NAV", title="Combined Long-Short Portfolio NAV")
-    if benchmark_ticker in prices.columns:
-        benchmark_nav = prices[benchmark_ticker] / prices[benchmark_ticker].iloc[0]
-        benchmark_nav.plot(label=f"Benchmark ({benchmark_ticker})")
-    plt.legend()
-    plt.ylabel("Net Asset Value")
-    plt.tight_layout()
-    plt.savefig(outdir / "01_net_value.png")
-    plt.close()
-
-    drawdown = 1 - combined_nav / combined_nav.cummax()
-    plt.figure(figsize=(10, 5))
-    drawdown.plot(title="Drawdown")
-    plt.tight_layout()
-    plt.savefig(outdir / "02_drawdown.png")
-    plt.close()
-
-    latest_sig = signals.iloc[-1]
-    buckets = pd.qcut(latest_sig, 5, labels=["Q1", "Q2", "Q3", "Q4", "Q5"])
-    plt.figure(figsize=(8, 4))
-    sns.boxplot(x=buckets, y=latest_sig)
-    plt.title("Signal Distribution (Last Day)")
-    plt.tight_layout()
-    plt.savefig(outdir / "03_signal_distribution.png")
-    plt.close()
-
-    quantile_ret = signal_quantile_returns(signals, prices)
-    quantile_ret.cumsum().plot(title="Cumulative Returns by Signal Quantile", figsize=(10, 5))
-    plt.tight_layout()
-    plt.savefig(outdir / "04_quantile_returns.png")
-    plt.close()
-
-    with open(outdir / "summary.md", "w", encoding="utf-8") as f:
-        f.write("# Backtest Summary\n\n")
-        f.write("## Key Metrics\n")
-        for k, v in met.items():
-            f.write(f"- **{k}**: {v}\n")
-        f.write("\n## Charts\n")
-        for fig in ["01_net_value", "02_drawdown", "03_signal_distribution", "04_quantile_returns"]:
-            f.write(f"![{fig}](./{fig}.png)\n")
-
-    html_content = markdown((outdir / "summary.md").read_text(encoding="utf-8"))
-    with open(outdir / "summary.html", "w", encoding="utf-8") as html_file:
-        html_file.write(html_content)
-
+    with stage("load", top_n=top_n) as rec:
+        signals = read_sparse_signals(signals_path)
+        prices = pd.read_parquet(prices_path)
+
+        common_cols = signals.tickers.intersection(prices.columns)
+        signals, prices = signals.select(tickers=common_cols), prices[common_cols]
+        prices = prices.loc[signals.dates]
+        rec["rows"] = len(signals.dates)
+        rec["nnz"] = signals.nnz
+
+    with stage("weights", rows=signals.nnz, top_n=top_n):
+        w_long, w_short = make_long_short_weights(signals, top_n, weight_scheme)
+
+    with stage("simulate", rows=len(signals.dates), top_n=top_n):
+        # vectorbt 只接受矩阵：权重在这里才稠密化（信号本身始终保持稀疏）
+        w_long = w_long.to_wide(fill_value=0.0)
+        w_short = w_short.to_wide(fill_value=0.0)
+        long_entries = w_long > 0
+        long_exits = long_entries.shift(-1).fillna(False)
+        short_entries = w_short < 0
+        short_exits = short_entries.shift(-1).fillna(False)
+
+        long_size = w_long.clip(lower=0)
+        short_size = (-w_short).clip(lower=0)
+        fees = cost_bps / 10000
+
+        long_pf = vbt.Portfolio.from_signals(close=prices, entries=long_entries, exits=long_exits, size=long_size, fees=fees, freq="D", init_cash=0.5)
+        short_pf = vbt.Portfolio.from_signals(close=prices, entries=short_entries, exits=short_exits, size=short_size, fees=fees, freq="D", init_cash=0.5)
+
+        combined_nav = long_pf.value() + short_pf.value()
+        combined_nav.name = "NAV"
+        returns = combined_nav.pct_change().dropna()
+        if isinstance(returns, pd.DataFrame):
+            returns = returns.mean(axis=1)
+
+    with stage("metrics", rows=len(returns), top_n=top_n):
+        met = perf_metrics(returns)
+        pd.DataFrame([met]).to_csv(outdir / "metrics.csv", index=False)
+        params = dict(top_n=top_n, cost_bps=cost_bps, weight_scheme=weight_scheme,
+                      benchmark_ticker=benchmark_ticker)
+        if results_db:
+            with ResultsStore(results_db) as store:
+                store.append(
+                    "vectorbt",
+                    params,
+                    met,
+                    data_version=data_version(signals_path, prices_path),
+                )
+
+    with stage("plot", rows=len(signals.dates), top_n=top_n):
+        # 只生成绘图 spec；PNG 由进程池在后台渲染
+        nav_lines = ({"Strategy NAV": combined_nav} if isinstance(combined_nav, pd.Series)
+                     else {str(c): combined_nav[c] for c in combined_nav.columns})
+        if benchmark_ticker in prices.columns:
+            benchmark_nav = prices[benchmark_ticker] / prices[benchmark_ticker].iloc[0]
+            nav_lines[f"Benchmark ({benchmark_ticker})"] = benchmark_nav
+        plots.line(outdir / "01_net_value.png", nav_lines, figsize=(10, 5), legend=True,
+                   title="Combined Long-Short Portfolio NAV", ylabel="Net Asset Value")
+
+        drawdown = 1 - combined_nav / combined_nav.cummax()
+        plots.line(outdir / "02_drawdown.png", drawdown, figsize=(10, 5), title="Drawdown")
+
+        latest_sig = signals.row(-1)
+        buckets = pd.qcut(latest_sig, 5, labels=["Q1", "Q2", "Q3", "Q4", "Q5"])
+        plots.box(outdir / "03_signal_distribution.png", buckets, latest_sig,
+                  order=["Q1", "Q2", "Q3", "Q4", "Q5"], figsize=(8, 4),
+                  title="Signal Distribution (Last Day)")
+
+        quantile_ret = sparse_quantile_returns(signals, prices)
+        pd.DataFrame([quantile_spread_stats(quantile_ret)]).to_csv(outdir / "quantile_stats.csv", index=False)
+        plots.line(outdir / "04_quantile_returns.png", quantile_ret.cumsum(), figsize=(10, 5),
+                   legend=True, title="Cumulative Returns by Signal Quantile")
+
+        if own_plots:
+            plots.close()
+
+    if not results_db:
+        # 不写结果库时 report_builder 无从生成本页：直接由本次 met 渲染
+        figures = (["01_net_value.png", "02_drawdown.png", "03_signal_distribution.png",
+                    "04_quantile_returns.png"] if plots.enabled else [])
+        md, page = render_run(f"VectorBT Backtest — {outdir.name}", params, met, figures)
+        (outdir / "summary.md").write_text(md, encoding="utf-8")
+        (outdir / "summary.html").write_text(page, encoding="utf-8")
     logging.info("VectorBT run complete → %s", outdir)
+    return met
 
 def build_arg_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="Sentiment back-test runner")
@@ -212,6 +174,9 @@ def build_arg_parser() -> argparse.ArgumentParser:
     parser.add_argument("--weight_scheme", choices=["equal", "abs"], default="equal")
     parser.add_argument("--outdir", default="results_vbt")
     parser.add_argument("--benchmark_ticker", default="SPY")
+    parser.add_argument("--results_db", default=DEFAULT_DB, help="结果库 (SQLite)；传空字符串则不写入")
+    add_plot_args(parser)
+    add_timing_args(parser)
     return parser
 
 def run_grid(
@@ -227,48 +192,52 @@ def run_grid(
 
     for top_n in topn_list:
         run_dir = outdir_root / f"topn_{top_n}"
-        run_vectorbt(
+        met = run_vectorbt(
             signals_path=signals_path,
             prices_path=prices_path,
             top_n=top_n,
             outdir=run_dir,
             **kwargs
         )
-        met = pd.read_csv(run_dir / "metrics.csv")
-        met.insert(0, "top_n", top_n)
-        metrics.append(met)
+        metrics.append({"top_n": top_n, **met})
 
-    summary_df = pd.concat(metrics, ignore_index=True)
+    summary_df = pd.DataFrame(metrics)
     summary_df.to_csv(outdir_root / "summary_metrics.csv", index=False)
-
-    html = "<html><head><title>Grid Backtest Report</title></head><body>"
-    html += "<h1>Grid Backtest Summary</h1>"
-    html += summary_df.to_html(index=False)
-    html += "<h2>Individual Reports</h2><ul>"
-    for top_n in topn_list:
-        html += f"<li><a href='topn_{top_n}/summary.html'>top_n = {top_n}</a></li>"
-    html += "</ul></body></html>"
-    with open(outdir_root / "grid_summary.html", "w", encoding="utf-8") as f:
-        f.write(html)
+    # 有结果库时 summary.md / summary.html / grid_summary.html 由 report_builder 增量生成；
+    # 否则每个 run 的 summary 已在 run_vectorbt 中写出
 
 def main():
     setup_logging()
     parser = build_arg_parser()
     args = parser.parse_args()
-
-    run_grid(
-        signals_path=args.signals,
-        prices_path=args.prices,
-        topn_list=[10, 30, 50],
-        cost_bps=args.cost_bps,
-        weight_scheme=args.weight_scheme,
-        benchmark_ticker=args.benchmark_ticker,
-        outdir_root="grid_results"
-    )
+    configure_from_args(args)
+
+    # 整个网格共用一个绘图进程池：各 top_n 的图与后续回测并行渲染
+    with PlotQueue(enabled=not args.no_plots, workers=args.plot_workers) as plots:
+        run_grid(
+            signals_path=args.signals,
+            prices_path=args.prices,
+            topn_list=[10, 30, 50],
+            cost_bps=args.cost_bps,
+            weight_scheme=args.weight_scheme,
+            benchmark_ticker=args.benchmark_ticker,
+            results_db=args.results_db,
+            outdir_root="grid_results",
+            plots=plots,
+        )
+        with stage("plot", mode="render"):          # 等待后台渲染完成的剩余时间
+            plots.close()
+
+    # 图全部落盘后再出报告：只重建参数 / 指标 / 图片有变化的 section
+    if args.results_db:
+        with stage("report"):
+            build_grid_report("vectorbt", "grid_results", args.results_db, "topn_{top_n}",
+                              cost_bps=args.cost_bps, weight_scheme=args.weight_scheme,
+                              benchmark_ticker=args.benchmark_ticker)
+    else:
+        logging.info("未写入结果库 (--results_db '')：仅生成各 run 的 summary，跳过 grid_summary.html")
 
 if __name__ == "__main__":
-    import sys
-    sys.argv = ["", "--signals", "signals.parquet", "--prices", "prices.parquet"]
     main()
 
 # import argparse
@@ -5,6 +5,8 @@ import seaborn as sns
 from pathlib import Path
 from scipy.stats import ttest_1samp
 
+from bootstrap_engine import bootstrap_group_stats, default_block_length
+
 ###############################
 # 配置
 ###############################
@@ -12,6 +14,8 @@ LABEL_FILE = Path("llm_emotion_type_labeling_samples_labeled_gemini.csv")
 RET_COLUMNS = ["1_DAY_RETURN", "2_DAY_RETURN", "3_DAY_RETURN", "7_DAY_RETURN"]
 TOP_K_PLOT = 12
 MIN_SAMPLES = 15  # ⬅️ 更宽容的样本数阈值
+N_BOOT = 2000     # 块自助法重抽样次数
+SEED = 42
 OUT_DIR = Path("output")
 OUT_DIR.mkdir(exist_ok=True)
 
@@ -34,21 +38,33 @@ def explode_labels(df, ret_col):
         labels = [l.strip() for l in str(row["label"]).split(",") if l.strip()]
         for l in labels:
             records.append({
+                "DATE": row["DATE"],
                 "label": l,
                 "net_tone": row["net_tone"],
                 "fwd_ret": row["fwd_ret"]
             })
     return pd.DataFrame(records)
 
-def calc_significance(df_exp):
-    p_values = {}
-    for label, group in df_exp.groupby("label"):
-        if len(group) >= MIN_SAMPLES:
-            _, p = ttest_1samp(group["fwd_ret"], popmean=0)
-            p_values[label] = p
-        else:
-            p_values[label] = np.nan
-    return pd.Series(p_values)
+def calc_significance(df_exp, horizon=1):
+    """Block-bootstrap p-value of each label's mean return (dates resampled).
+
+    Overlapping multi-day returns are autocorrelated, so the mean block
+    length is never shorter than the holding horizon. The i.i.d. t-test
+    p-value is kept alongside for comparison.
+    """
+    counts = df_exp["label"].value_counts()
+    df_sig = df_exp[df_exp["label"].isin(counts.index[counts >= MIN_SAMPLES])]
+    mean_block = default_block_length(df_sig["DATE"].nunique(), horizon)
+    boot = bootstrap_group_stats(df_sig, "label", "DATE", "fwd_ret",
+                                 n_boot=N_BOOT, mean_block=mean_block, seed=SEED)
+    p_ttest = df_sig.groupby("label")["fwd_ret"].apply(
+        lambda x: ttest_1samp(x, popmean=0).pvalue)
+    return pd.DataFrame({
+        "p_value": boot["mean_p_boot"],
+        "p_ttest": p_ttest,
+        "sharpe_ci_low": boot["sharpe_ci_low"],
+        "sharpe_ci_high": boot["sharpe_ci_high"],
+    }).reindex(counts.index)
 
 def add_stars(pval):
     if pd.isna(pval):
@@ -84,7 +100,8 @@ def analyze_ret_window(df, ret_col):
     agg["sharpe"] = agg["meanret"] / agg["stdret"]
 
     # 显著性检验
-    agg["p_value"] = calc_significance(df_exp)
+    sig = calc_significance(df_exp, horizon=int(ret_col.split("_")[0]))
+    agg = agg.join(sig)
     agg["sig"] = agg["p_value"].apply(add_stars)
 
     # ➕ 调试输出：过滤前
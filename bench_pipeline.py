@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# bench_pipeline.py
+# Coding: UTF-8
+"""
+End-to-end pipeline benchmark (text → tone → signals → PnL)
+==========================================================
+* 按 (推文数, 股票数, 交易日数) 由 `synthetic_data.py` 生成 **合成语料**，离线运行，无需任何真实数据
+* 逐阶段计时并记录峰值内存：clean_text → CountVectorizer → select_top_k_terms → train_lda →
+  lda.transform → 日度聚合 → make_long_short_weights → run_vectorbt → IC 循环
+* 峰值 RSS 取 `/proc/self/status` 的 VmHWM，每个阶段开始前经 `/proc/self/clear_refs` 清零
+  （仅 Linux；不可写时退回进程级 ru_maxrss，数值只增不减）
+* 结果追加到 `bench_history.json`，并与相同规模的上一次运行比较，耗时超过阈值的阶段标为回归
+* 缺少依赖（nltk / vectorbt）的阶段记为 skipped，依赖它输出的阶段随之跳过，其余阶段照常运行
+
+运行示例
+--------
+```bash
+python bench_pipeline.py                                  # 默认 5k 推文 / 100 股票 / 120 天
+python bench_pipeline.py --tweets 200000 --tickers 500 --days 500 --repeat 3
+python bench_pipeline.py --only vectorize,train_lda --fail_on_regression
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pandas as pd
+
+from stage_timer import peak_rss_mb, reset_peak_rss
+from synthetic_data import RETURN_COLS, SyntheticSpec, generate, price_panel
+
+ROOT = Path(__file__).resolve().parent
+HISTORY = ROOT / "bench_history.json"
+
+# ---------------------------------------------------------------------------
+# 阶段
+# ---------------------------------------------------------------------------
+# 每个阶段: (名称, 依赖的上下文键, 函数)；函数读取 ctx 并写回自己的输出
+
+def _stage_clean_text(ctx):
+    if str(ROOT / "20172018") not in sys.path:
+        sys.path.append(str(ROOT / "20172018"))      # 追加而非前插：该目录有同名旧脚本
+    from preprocessing import clean_text
+
+    ctx["tokens"] = [clean_text(t) for t in ctx["corpus"]["TWEET"]]
+
+
+def _stage_vectorize(ctx):
+    from sklearn.feature_extraction.text import CountVectorizer
+    from day2_sestm_pipeline_delete_noise import build_stopwords
+
+    vec = CountVectorizer(min_df=3, stop_words=build_stopwords(), lowercase=True)
+    ctx["X_full"] = vec.fit_transform(ctx["corpus"]["cleaned_text"])
+    ctx["base_vec"] = vec
+
+
+def _stage_select(ctx):
+    from day2_sestm_pipeline_delete_noise import select_top_k_terms
+
+    y = (ctx["corpus"]["1_DAY_RETURN"].to_numpy() > 0).astype(int)
+    ctx["X_sel"], ctx["vec_sel"] = select_top_k_terms(ctx["X_full"], y, ctx["base_vec"], k=ctx["top_k"])
+
+
+def _stage_train_lda(ctx):
+    from day2_sestm_pipeline_delete_noise import train_lda
+
+    ctx["lda"], _ = train_lda(ctx["X_sel"])
+
+
+def _stage_lda_transform(ctx):
+    doc_topic = ctx["lda"].transform(ctx["X_sel"])
+    ctx["net_tone"] = doc_topic[:, 0] - doc_topic[:, 1]
+
+
+def _stage_daily_agg(ctx):
+    from Day3enhancednew import generate_daily_signals
+
+    corpus = ctx["corpus"]
+    preds = pd.DataFrame({"date": corpus["DATE"], "ticker": corpus["STOCK_CODE"],
+                          "p_pos": (1 + ctx["net_tone"]) / 2, "p_neg": (1 - ctx["net_tone"]) / 2})
+    path = ctx["tmp"] / "tweet_preds.csv"
+    preds.to_csv(path, index=False)
+    t0 = time.perf_counter()                      # 写 CSV 是准备工作，不计入本阶段
+    ctx["signals"] = generate_daily_signals(path, sparse=True)
+    ctx["_setup_seconds"] = t0
+
+
+def _stage_weights(ctx):
+    from Day3enhancednew import make_long_short_weights
+
+    ctx["weights"] = make_long_short_weights(ctx["signals"], top_n=ctx["top_n"])
+
+
+def _stage_vectorbt(ctx):
+    import vectorbt  # noqa: F401  — 缺失时整段跳过，而不是在写完输入文件后才失败
+    from Day3enhancednew import run_vectorbt
+    from plot_queue import PlotQueue
+
+    signals = ctx["signals"]
+    sig_path, px_path = ctx["tmp"] / "signals.parquet", ctx["tmp"] / "prices.parquet"
+    signals.to_long().to_parquet(sig_path, index=False)
+    price_panel(ctx["spec"]).to_parquet(px_path)
+    t0 = time.perf_counter()
+    run_vectorbt(sig_path, px_path, top_n=ctx["top_n"], outdir=ctx["tmp"] / "vbt",
+                 results_db=None, plots=PlotQueue(enabled=False))
+    ctx["_setup_seconds"] = t0
+
+
+def _stage_ic_loop(ctx):
+    # 与 day11_ic_and_winrate.py 相同的逐日 Spearman IC 循环
+    merged = ctx["corpus"].assign(net_tone=ctx["net_tone"])
+    ctx["ic"] = {col: merged.groupby("DATE").apply(
+                     lambda x: x["net_tone"].corr(x[col], method="spearman")).mean()
+                 for col in RETURN_COLS}
+
+
+STAGES: List[tuple[str, tuple, Callable]] = [
+    ("clean_text", ("corpus",), _stage_clean_text),
+    ("vectorize", ("corpus",), _stage_vectorize),
+    ("select_top_k", ("X_full",), _stage_select),
+    ("train_lda", ("X_sel",), _stage_train_lda),
+    ("lda_transform", ("lda",), _stage_lda_transform),
+    ("daily_agg", ("net_tone",), _stage_daily_agg),
+    ("long_short_weights", ("signals",), _stage_weights),
+    ("run_vectorbt", ("signals",), _stage_vectorbt),
+    ("ic_loop", ("net_tone",), _stage_ic_loop),
+]
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_pipeline(config: Dict, only: set[str] | None = None) -> Dict[str, Dict]:
+    """One pass over every stage; returns {stage: {status, seconds, peak_rss_mb}}."""
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+        spec = SyntheticSpec(rows=config["tweets"], tickers=config["tickers"], days=config["days"],
+                             vocab=config["vocab"], seed=config["seed"])
+        ctx = {"tmp": Path(tmp), "top_k": config["top_k"], "top_n": config["top_n"], "spec": spec}
+
+        t0 = time.perf_counter()
+        ctx["corpus"] = generate(spec)
+        results["generate"] = {"status": "ok", "seconds": time.perf_counter() - t0,
+                               "peak_rss_mb": peak_rss_mb()}
+
+        for name, needs, fn in STAGES:
+            missing = [k for k in needs if k not in ctx]
+            if missing:
+                results[name] = {"status": f"skipped (no {', '.join(missing)})"}
+                continue
+            # --only 之外的阶段照常运行（下游需要其输出），只是不计入结果
+            reset_peak_rss()
+            ctx.pop("_setup_seconds", None)
+            t0 = time.perf_counter()
+            try:
+                fn(ctx)
+            except ImportError as e:
+                results[name] = {"status": f"skipped ({e.name or e})"}
+                continue
+            except Exception as e:                  # 单阶段失败不影响其余阶段
+                logging.exception("阶段 %s 失败", name)
+                results[name] = {"status": f"error ({type(e).__name__}: {e})"}
+                continue
+            seconds = time.perf_counter() - ctx.pop("_setup_seconds", t0)
+            if only is None or name in only:
+                results[name] = {"status": "ok", "seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+        if "ic_loop" in results and "ic" in ctx:
+            # 合成数据埋入了 tone → 收益的关系：IC 明显为正说明整条流水线把信号带到了末端
+            results["ic_loop"]["ic_1d"] = round(float(ctx["ic"]["1_DAY_RETURN"]), 4)
+    return results
+
+
+def aggregate(runs: List[Dict[str, Dict]]) -> Dict[str, Dict]:
+    """Median seconds / max peak RSS over repeats."""
+    out = {}
+    for name in runs[0]:
+        ok = [r[name] for r in runs if r.get(name, {}).get("status") == "ok"]
+        if not ok:
+            out[name] = runs[0][name]
+            continue
+        out[name] = {"status": "ok",
+                     "seconds": round(statistics.median(r["seconds"] for r in ok), 4),
+                     "peak_rss_mb": round(max(r["peak_rss_mb"] for r in ok), 1),
+                     **{k: v for k, v in ok[0].items() if k not in ("status", "seconds", "peak_rss_mb")}}
+    return out
+
+# ---------------------------------------------------------------------------
+# History
+# ---------------------------------------------------------------------------
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def load_history(path: Path = HISTORY) -> List[Dict]:
+    return json.loads(path.read_text()) if path.exists() else []
+
+
+def find_baseline(history: List[Dict], config: Dict) -> Dict | None:
+    """Most recent earlier run with the same data sizes."""
+    return next((h for h in reversed(history) if h["config"] == config), None)
+
+
+def regressions(current: Dict, baseline: Dict | None, tolerance: float, min_seconds: float = 0.05):
+    """[(stage, old, new)] for stages slower than `tolerance` × baseline."""
+    if baseline is None:
+        return []
+    out = []
+    for name, cur in current.items():
+        old = baseline["stages"].get(name, {})
+        if cur.get("status") != "ok" or old.get("status") != "ok":
+            continue
+        if cur["seconds"] > max(old["seconds"] * tolerance, min_seconds):
+            out.append((name, old["seconds"], cur["seconds"]))
+    return out
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    ap = argparse.ArgumentParser(description="Per-stage time / peak RSS of the text-to-PnL pipeline")
+    ap.add_argument("--tweets", type=int, default=5000)
+    ap.add_argument("--tickers", type=int, default=100)
+    ap.add_argument("--days", type=int, default=120)
+    ap.add_argument("--vocab", type=int, default=20000, help="合成词表大小（Zipf 分布）")
+    ap.add_argument("--top_k", type=int, default=5000)
+    ap.add_argument("--top_n", type=int, default=50)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--repeat", type=int, default=1, help="重复次数：耗时取中位数，内存取最大值")
+    ap.add_argument("--only", default=None, help="只记录这些阶段（逗号分隔）；上游阶段仍会运行")
+    ap.add_argument("--history", default=str(HISTORY))
+    ap.add_argument("--no_save", action="store_true", help="不写入历史文件")
+    ap.add_argument("--tolerance", type=float, default=1.25, help="耗时 > 基线 × tolerance 记为回归")
+    ap.add_argument("--fail_on_regression", action="store_true", help="出现回归时以退出码 1 结束")
+    args = ap.parse_args()
+
+    config = {k: getattr(args, k) for k in ("tweets", "tickers", "days", "vocab", "top_k", "top_n", "seed")}
+    only = set(args.only.split(",")) if args.only else None
+    stages = aggregate([run_pipeline(config, only) for _ in range(args.repeat)])
+
+    history_path = Path(args.history)
+    history = load_history(history_path)
+    baseline = find_baseline(history, config)
+    slow = regressions(stages, baseline, args.tolerance)
+
+    print(f"{'stage':<20}{'seconds':>10}{'peak MB':>10}{'baseline':>10}  status")
+    for name, r in stages.items():
+        old = (baseline or {}).get("stages", {}).get(name, {}).get("seconds")
+        print(f"{name:<20}{r.get('seconds', float('nan')):>10.3f}{r.get('peak_rss_mb', float('nan')):>10.1f}"
+              f"{old if old is not None else float('nan'):>10.3f}  {r['status']}"
+              + (f"  IC(1D)={r['ic_1d']:.4f}" if "ic_1d" in r else ""))
+    for name, old, new in slow:
+        logging.warning("回归: %s %.3fs → %.3fs (×%.2f)", name, old, new, new / old)
+
+    if not args.no_save:
+        history.append({
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "config": config,
+            "repeat": args.repeat,
+            "stages": stages,
+        })
+        history_path.write_text(json.dumps(history, indent=1))
+        logging.info("结果已追加到 %s（共 %d 条）", history_path, len(history))
+
+    if slow and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
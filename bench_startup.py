@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+# bench_startup.py
+# Coding: UTF-8
+"""
+Cold-start benchmark for the command-line entry points
+======================================================
+* 每条命令在全新子进程中运行 `--help`（或仅导入模块）N 次，报告中位数 / 最小墙钟时间
+* 附带 `python -X importtime` 解析：列出累计导入耗时最多的顶层模块，定位拖慢启动的依赖
+* 缺少依赖而失败的命令照常列出（status=error），不影响其余命令
+
+运行示例
+--------
+```bash
+python bench_startup.py                   # 全部命令，各 5 次
+python bench_startup.py --repeat 10 --json startup.json
+python bench_startup.py --only Day3enhancednew.py
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent
+
+# (名称, 工作目录, 参数) —— 工作目录决定同目录模块的导入路径
+COMMANDS = [
+    ("Day3enhancednew.py --help", ".", ["Day3enhancednew.py", "--help"]),
+    ("Day3BacktestPipelinenew.py --help", ".", ["Day3BacktestPipelinenew.py", "--help"]),
+    ("day2_sestm_pipeline_delete_noise.py --help", ".", ["day2_sestm_pipeline_delete_noise.py", "--help"]),
+    ("walk_forward_sestm.py --help", ".", ["walk_forward_sestm.py", "--help"]),
+    ("signal_aggregator.py --help", ".", ["signal_aggregator.py", "--help"]),
+    ("tone_service.py --help", ".", ["tone_service.py", "--help"]),
+    ("import tone_model + load_models", ".", ["-c", "from tone_model import load_models; load_models('models')"]),
+    ("20172018/per_ticker_trainer.py --help", "20172018", ["per_ticker_trainer.py", "--help"]),
+    ("20172018: import preprocessing", "20172018", ["-c", "import preprocessing"]),
+    ("20172018: import align", "20172018", ["-c", "import align"]),
+]
+
+
+def time_command(args, cwd, repeat):
+    """Wall-clock seconds of up to `repeat` fresh interpreter runs, plus the first error line."""
+    times, err = [], None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, *args], cwd=ROOT / cwd,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        times.append(time.perf_counter() - t0)
+        if proc.returncode != 0:
+            err = (proc.stderr.strip().splitlines() or ["exit %d" % proc.returncode])[-1]
+            break
+    return times, err
+
+
+def top_imports(args, cwd, n=5):
+    """Top-level modules with the largest cumulative import time (ms)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", *args], cwd=ROOT / cwd,
+                          stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    totals = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name[1:]
+        if not name.startswith(" "):                # 未缩进 = 顶层导入
+            totals[name.strip()] = int(cumulative) / 1000
+    return sorted(totals.items(), key=lambda kv: -kv[1])[:n]
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Cold-start time per command")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--only", default=None, help="只测名称包含该子串的命令")
+    ap.add_argument("--json", default=None, help="结果另存为 JSON")
+    args = ap.parse_args()
+
+    rows = []
+    for name, cwd, cmd in COMMANDS:
+        if args.only and args.only not in name:
+            continue
+        times, err = time_command(cmd, cwd, args.repeat)
+        row = {
+            "command": name,
+            "status": "error" if err else "ok",
+            "median_s": round(statistics.median(times), 3),
+            "min_s": round(min(times), 3),
+            "top_imports_ms": [] if err else [[m, round(ms, 1)] for m, ms in top_imports(cmd, cwd)],
+        }
+        if err:
+            row["error"] = err
+        rows.append(row)
+
+        detail = err or ", ".join(f"{m} {ms:.0f}ms" for m, ms in row["top_imports_ms"][:3])
+        print(f"{name:<45} {row['median_s']:>7.3f}s  (min {row['min_s']:.3f}s)  {detail}")
+
+    if args.json:
+        Path(args.json).write_text(json.dumps({"python": sys.version.split()[0], "repeat": args.repeat,
+                                               "results": rows}, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,192 @@
 #!/usr/bin/env python
 # build_prices_from_cleaned.py
-import pandas as pd
+# Coding: UTF-8
+"""
+Price panel builder
+===================
+* 推文级 CSV 分块读取，只取 日期 / 股票 / 收盘价 三列
+* 同一 (日期, 股票) 多行 → **排序取最后一条**（稳定排序后每段取末尾，等价于 `pivot_table(aggfunc="last")`）
+* 行索引对齐到完整的 **工作日日历**（并保留有推文的周末日期，信号日期总能在价格表中找到），
+  缺口按行向前填充，最多 `--ffill_limit` 行（停牌太久的保持 NaN）
+* 输出 float32：`prices.parquet`（默认）或 `.npy` memmap（旁边写 `.labels.json`），`load_prices()` 统一读取
+* `--update`：只处理晚于现有面板最后日期的行，拼接到面板末尾；去重后的原始观测保存在
+  `<out>.obs.parquet`，用于让跨批次的前向填充与一次性全量构建逐位一致（迟到的旧日期行会被忽略）
+
+运行示例
+--------
+```bash
+python build_prices_from_cleaned.py                                   # → prices.parquet
+python build_prices_from_cleaned.py --out prices.npy --ffill_limit 3  # float32 memmap
+python build_prices_from_cleaned.py --csv new_rows.csv --update       # 追加新日期
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+from pathlib import Path
+
 import numpy as np
+import pandas as pd
+
+CSV_FILE   = "filter_2017_cleaned_aligned_data.csv"   # ← 你的原始文件
+DATE_COL   = "DATE"                       # 日期列
+TICKER_COL = "STOCK_CODE"                 # 股票代码列
+PRICE_COL  = "LAST_PRICE"                 # 收盘价列
+OUT_PQ     = "prices.parquet"             # 输出路径
+FFILL_LIMIT = 5                           # 最多向前填充的交易日数
+DTYPE = np.float32
+
+# ---------------------------------------------------------------------------
+# 去重内核
+# ---------------------------------------------------------------------------
+
+def last_per_key(obs: pd.DataFrame) -> pd.DataFrame:
+    """Keep the last row (input order) of every (date, ticker); NaN prices never win."""
+    obs = obs[obs[PRICE_COL].notna()]
+    d, _ = pd.factorize(obs[DATE_COL])
+    t, tickers = pd.factorize(obs[TICKER_COL])
+    key = d.astype(np.int64) * max(len(tickers), 1) + t
+    order = np.argsort(key, kind="stable")
+    ks = key[order]
+    last = order[np.append(ks[1:] != ks[:-1], True)] if len(ks) else order
+    return obs.iloc[np.sort(last)].reset_index(drop=True)
+
+
+def read_observations(csv_path: str | Path = CSV_FILE, after: pd.Timestamp | None = None,
+                      chunksize: int = 200_000) -> pd.DataFrame:
+    """Deduplicated (date, ticker, price) rows, streamed chunk by chunk (later chunks win)."""
+    parts = []
+    for chunk in pd.read_csv(csv_path, usecols=[DATE_COL, TICKER_COL, PRICE_COL],
+                             parse_dates=[DATE_COL], chunksize=chunksize):
+        if after is not None:
+            chunk = chunk[chunk[DATE_COL] > after]
+        parts.append(last_per_key(chunk))
+    if not parts:
+        return pd.DataFrame(columns=[DATE_COL, TICKER_COL, PRICE_COL])
+    return last_per_key(pd.concat(parts, ignore_index=True))
+
+# ---------------------------------------------------------------------------
+# 日历与面板
+# ---------------------------------------------------------------------------
+
+def trading_calendar(dates, start=None) -> pd.DatetimeIndex:
+    """Business days spanning `dates` (from `start` if given) plus any observed non-business day."""
+    dates = pd.DatetimeIndex(dates).normalize().unique()
+    if dates.empty:
+        return pd.DatetimeIndex([], name=DATE_COL)
+    first = dates.min() if start is None else min(pd.Timestamp(start), dates.min())
+    return pd.bdate_range(first, dates.max()).union(dates).rename(DATE_COL)
+
+
+def build_panel(obs: pd.DataFrame, calendar: pd.DatetimeIndex | None = None,
+                ffill_limit: int = FFILL_LIMIT) -> pd.DataFrame:
+    """Long observations → calendar × ticker float32 panel with limited forward fill."""
+    if calendar is None:
+        calendar = trading_calendar(obs[DATE_COL])
+    rows = calendar.get_indexer(pd.DatetimeIndex(obs[DATE_COL]).normalize())
+    cols, tickers = pd.factorize(obs[TICKER_COL], sort=True)
+    keep = rows >= 0
+    values = np.full((len(calendar), len(tickers)), np.nan, dtype=DTYPE)
+    values[rows[keep], cols[keep]] = obs[PRICE_COL].to_numpy(dtype=DTYPE)[keep]
+    panel = pd.DataFrame(values, index=calendar, columns=pd.Index(tickers, name=None))
+    if ffill_limit > 0:
+        panel = panel.ffill(limit=ffill_limit)
+    return panel.dropna(axis=1, how="all")
+
+# ---------------------------------------------------------------------------
+# 读写
+# ---------------------------------------------------------------------------
+
+def _obs_path(out: Path) -> Path:
+    return out.with_name(out.stem + ".obs.parquet")
+
+
+def _labels_path(out: Path) -> Path:
+    return out.with_name(out.stem + ".labels.json")
+
+
+def write_panel(panel: pd.DataFrame, out: str | Path) -> Path:
+    """float32 Parquet, or an `.npy` memmap + labels sidecar when `out` ends in .npy."""
+    out = Path(out)
+    panel = panel.astype(DTYPE)
+    if out.suffix == ".npy":
+        mm = np.lib.format.open_memmap(out, mode="w+", dtype=DTYPE, shape=panel.shape)
+        mm[:] = panel.to_numpy()
+        mm.flush()
+        del mm
+        _labels_path(out).write_text(json.dumps({
+            "dates": [d.strftime("%Y-%m-%d") for d in panel.index],
+            "tickers": [str(t) for t in panel.columns]}))
+    else:
+        panel.to_parquet(out)
+    return out
+
+
+def load_prices(path: str | Path = OUT_PQ) -> pd.DataFrame:
+    """Read a panel written by `write_panel` (memmap-backed for .npy)."""
+    path = Path(path)
+    if path.suffix != ".npy":
+        return pd.read_parquet(path)
+    labels = json.loads(_labels_path(path).read_text())
+    return pd.DataFrame(np.load(path, mmap_mode="r"), copy=False,
+                        index=pd.DatetimeIndex(labels["dates"], name=DATE_COL), columns=labels["tickers"])
+
+# ---------------------------------------------------------------------------
+# 全量 / 增量
+# ---------------------------------------------------------------------------
+
+def build(csv_path=CSV_FILE, out=OUT_PQ, ffill_limit: int = FFILL_LIMIT) -> pd.DataFrame:
+    out = Path(out)
+    obs = read_observations(csv_path)
+    panel = build_panel(obs, ffill_limit=ffill_limit)
+    write_panel(panel, out)
+    obs.to_parquet(_obs_path(out), index=False)
+    return panel
+
+
+def update(csv_path=CSV_FILE, out=OUT_PQ, ffill_limit: int = FFILL_LIMIT) -> pd.DataFrame:
+    """Append dates newer than the existing panel; same result as a full rebuild."""
+    out = Path(out)
+    if not out.exists() or not _obs_path(out).exists():
+        logging.info("%s 不存在，改为全量构建", out)
+        return build(csv_path, out, ffill_limit)
+
+    panel = load_prices(out)
+    old_obs = pd.read_parquet(_obs_path(out))
+    last_day = panel.index[-1]
+    new_obs = read_observations(csv_path, after=last_day)
+    if new_obs.empty:
+        logging.info("没有晚于 %s 的新数据", last_day.date())
+        return panel
+
+    # 只重算尾部：前 ffill_limit 行作为填充的来源，新日期行才写回
+    context = panel.index[-ffill_limit:] if ffill_limit > 0 else panel.index[:0]
+    calendar = context.union(trading_calendar(new_obs[DATE_COL], start=last_day)).rename(DATE_COL)
+    tail_obs = pd.concat([old_obs[old_obs[DATE_COL] >= calendar[0]], new_obs], ignore_index=True)
+    tail = build_panel(tail_obs, calendar, ffill_limit)
+    tail = tail[tail.index > last_day]
+
+    columns = panel.columns.union(tail.columns)
+    panel = pd.concat([panel.reindex(columns=columns), tail.reindex(columns=columns)]).astype(DTYPE)
+    write_panel(panel, out)
+    pd.concat([old_obs, new_obs], ignore_index=True).to_parquet(_obs_path(out), index=False)
+    logging.info("追加 %d 个日期（%s → %s）", len(tail), tail.index[0].date(), tail.index[-1].date())
+    return panel
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    ap = argparse.ArgumentParser(description="Tweet-level CSV → calendar-aligned float32 price panel")
+    ap.add_argument("--csv", default=CSV_FILE)
+    ap.add_argument("--out", default=OUT_PQ, help=".parquet（默认）或 .npy（float32 memmap）")
+    ap.add_argument("--ffill_limit", type=int, default=FFILL_LIMIT, help="最多向前填充的行数，0 = 不填充")
+    ap.add_argument("--update", action="store_true", help="只追加晚于现有面板的日期")
+    args = ap.parse_args()
 
-CSV_FILE  = "filter_2017_cleaned_aligned_data.csv"   # ← 你的原始文件
-DATE_COL  = "DATE"                       # 日期列
-TICKER_COL= "STOCK_CODE"                 # 股票代码列
-PRICE_COL = "LAST_PRICE"                 # 收盘价列
-OUT_PQ    = "prices.csv"             # 输出路径
-
-# 1) 读取并选取需要的列
-df = pd.read_csv(CSV_FILE, usecols=[DATE_COL, TICKER_COL, PRICE_COL],
-                 parse_dates=[DATE_COL])
-
-# 2) 透视成 行=日期×列=ticker 的矩阵
-price_mat = (
-    df.pivot_table(index=DATE_COL,
-                   columns=TICKER_COL,
-                   values=PRICE_COL,
-                   aggfunc="last")        # 同日多行取最后价；也可用 mean
-    .sort_index()
-    .astype(float)
-)
-
-# 3) 可选：剔除全空列 / 填充极少量缺口
-price_mat.dropna(axis=1, how="all", inplace=True)
-# price_mat.to_parquet(OUT_PQ)
-price_mat.to_csv(OUT_PQ, index=True)
-
-print(f"✅ 生成 prices.csv  → {OUT_PQ}  shape={price_mat.shape}")
+    fn = update if args.update else build
+    price_mat = fn(args.csv, args.out, args.ffill_limit)
+    print(f"✅ 生成价格面板 → {args.out}  shape={price_mat.shape}")
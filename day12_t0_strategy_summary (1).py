@@ -1,120 +1,146 @@
 
+import argparse
+
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import statsmodels.api as sm
-
-# === 加载数据 ===
-signal_df = pd.read_csv("tweet_level_preds.csv")
-price_df = pd.read_csv("filter_2017_cleaned_aligned_data.csv")
-
-signal_df["DATE"] = pd.to_datetime(signal_df["DATE"])
-price_df["DATE"] = pd.to_datetime(price_df["DATE"])
-
-# 合并数据
-merged = pd.merge(signal_df, price_df, on=["DATE", "STOCK_CODE"], how="inner")
-merged = merged[(merged["DATE"] <= "2017-12-31")]
-
-# 设置预测信号
-merged["pred_up"] = (merged["net_tone"] > 0).astype(int)
-
-return_columns = ["1_DAY_RETURN", "2_DAY_RETURN", "3_DAY_RETURN", "7_DAY_RETURN"]
-results = []
-
-for col in return_columns:
-    horizon = col.replace("_DAY_RETURN", "D")
-
-    # 计算每日多空收益
-    daily_returns = []
-    turnover_list = []
-
-    for date, group in merged.groupby("DATE"):
-        group = group.dropna(subset=[col])
-        top_long = group.nlargest(10, "net_tone")
-        top_short = group.nsmallest(10, "net_tone")
-
-        long_ret = top_long[col].mean()
-        short_ret = top_short[col].mean()
-        ls_ret = long_ret - short_ret
-        turnover = len(set(top_long["STOCK_CODE"]).union(set(top_short["STOCK_CODE"])))
-
-        daily_returns.append({"DATE": date, "LS": ls_ret})
-        turnover_list.append(turnover)
-
-    df = pd.DataFrame(daily_returns).sort_values("DATE")
-    df["cum_return"] = (1 + df["LS"]).cumprod()
-    df["Month"] = df["DATE"].dt.to_period("M")
-
-    # Sharpe Ratio
-    sharpe = df["LS"].mean() / df["LS"].std() * (252 ** 0.5)
-
-    # IC
-    ic = merged["net_tone"].corr(merged[col], method="spearman")
-
-    # Win Rate
-    merged[f"actual_up_{col}"] = (merged[col] > 0).astype(int)
-    merged[f"correct_{col}"] = (merged["pred_up"] == merged[f"actual_up_{col}"]).astype(int)
-    win_rate = merged[f"correct_{col}"].mean()
-
-    # Turnover
-    avg_turnover = np.mean(turnover_list)
-
-    # Alpha / R2 via CAPM-style regression: LS vs Market
-    # 用市场平均作为 proxy
-    merged_daily = merged.groupby("DATE")[col].mean().rename("MKT").reset_index()
-    df = df.merge(merged_daily, on="DATE", how="left")
-    df = df.dropna()
-    X = sm.add_constant(df["MKT"])
-    model = sm.OLS(df["LS"], X).fit()
-    alpha = model.params["const"]
-    r2 = model.rsquared
-
-    # Append summary
-    results.append({
-        "Horizon": horizon,
-        "Sharpe Ratio": sharpe,
-        "IC": ic,
-        "Win Rate": win_rate,
-        "Avg Turnover": avg_turnover,
-        "Alpha": alpha,
-        "R2": r2,
-        "Cumulative Return": df["cum_return"].iloc[-1] - 1
-    })
-
-    # 绘图
-    plt.figure(figsize=(10, 4))
-    plt.plot(df["DATE"], df["cum_return"])
-    plt.title(f"Cumulative LS Return ({horizon})")
-    plt.xlabel("Date")
-    plt.ylabel("Cumulative Return")
-    plt.grid()
-    plt.tight_layout()
-    plt.savefig(f"cumulative_return_{horizon}.png")
-    plt.close()
-
-# 保存汇总表
-result_df = pd.DataFrame(results)
-result_df.to_csv("t0_strategy_summary_extended.csv", index=False)
-
-# 可视化：关键指标图
-plt.figure(figsize=(10, 5))
-sns.barplot(data=result_df, x="Horizon", y="Sharpe Ratio", color="skyblue")
-plt.title("Sharpe Ratio across Horizons")
-plt.tight_layout()
-plt.savefig("sharpe_across_horizon.png")
-plt.close()
-
-plt.figure(figsize=(10, 5))
-sns.barplot(data=result_df, x="Horizon", y="IC", color="salmon")
-plt.title("Spearman IC across Horizons")
-plt.tight_layout()
-plt.savefig("ic_across_horizon.png")
-plt.close()
-
-plt.figure(figsize=(10, 5))
-sns.barplot(data=result_df, x="Horizon", y="Win Rate", color="lightgreen")
-plt.title("Win Rate across Horizons")
-plt.tight_layout()
-plt.savefig("winrate_across_horizon.png")
-plt.close()
+
+from bootstrap_engine import bootstrap_mean, bootstrap_sharpe, default_block_length
+from hit_rates import hit_rates_frame
+from plot_queue import PlotQueue, add_plot_args
+from results_store import ResultsStore, data_version
+
+N_BOOT = 5000       # 块自助法重抽样次数
+SEED = 42
+
+
+def main():
+    ap = argparse.ArgumentParser(description="T+0 long-short strategy summary by horizon")
+    add_plot_args(ap)
+    args = ap.parse_args()
+    import statsmodels.api as sm                        # 解析参数后再导入：--help 不付 statsmodels 的启动开销
+    plots = PlotQueue(enabled=not args.no_plots, workers=args.plot_workers)
+
+    # === 加载数据 ===
+    signal_df = pd.read_csv("tweet_level_preds.csv")
+    price_df = pd.read_csv("filter_2017_cleaned_aligned_data.csv")
+
+    signal_df["DATE"] = pd.to_datetime(signal_df["DATE"])
+    price_df["DATE"] = pd.to_datetime(price_df["DATE"])
+
+    # 合并数据
+    merged = pd.merge(signal_df, price_df, on=["DATE", "STOCK_CODE"], how="inner")
+    merged = merged[(merged["DATE"] <= "2017-12-31")]
+
+    return_columns = ["1_DAY_RETURN", "2_DAY_RETURN", "3_DAY_RETURN", "7_DAY_RETURN"]
+    results = []
+
+    # 胜率（net_tone > 0 判涨）：所有持有期一次算完，不往 merged 里加列
+    win_rates = hit_rates_frame(merged, "net_tone", return_columns,
+                                date_col=None, ticker_col=None).overall["hit_rate"]
+
+    for col in return_columns:
+        horizon = col.replace("_DAY_RETURN", "D")
+
+        # 计算每日多空收益
+        daily_returns = []
+        turnover_list = []
+
+        for date, group in merged.groupby("DATE"):
+            group = group.dropna(subset=[col])
+            top_long = group.nlargest(10, "net_tone")
+            top_short = group.nsmallest(10, "net_tone")
+
+            long_ret = top_long[col].mean()
+            short_ret = top_short[col].mean()
+            ls_ret = long_ret - short_ret
+            turnover = len(set(top_long["STOCK_CODE"]).union(set(top_short["STOCK_CODE"])))
+
+            daily_returns.append({"DATE": date, "LS": ls_ret})
+            turnover_list.append(turnover)
+
+        df = pd.DataFrame(daily_returns).sort_values("DATE")
+        df["cum_return"] = (1 + df["LS"]).cumprod()
+        df["Month"] = df["DATE"].dt.to_period("M")
+
+        # Sharpe Ratio
+        sharpe = df["LS"].mean() / df["LS"].std() * (252 ** 0.5)
+
+        # IC
+        ic = merged["net_tone"].corr(merged[col], method="spearman")
+
+        # 块自助法显著性：持有期重叠 → 块长不短于持有期天数
+        daily_ic = merged.dropna(subset=[col]).groupby("DATE").apply(
+            lambda g: g["net_tone"].corr(g[col], method="spearman"))
+        mean_block = default_block_length(len(df), int(col.split("_")[0]))
+        sharpe_boot = bootstrap_sharpe(df["LS"], n_boot=N_BOOT, mean_block=mean_block, seed=SEED).iloc[0]
+        ic_boot = bootstrap_mean(daily_ic, n_boot=N_BOOT, mean_block=mean_block, seed=SEED).iloc[0]
+
+        # Win Rate
+        win_rate = win_rates[(0.0, col)]
+
+        # Turnover
+        avg_turnover = np.mean(turnover_list)
+
+        # Alpha / R2 via CAPM-style regression: LS vs Market
+        # 用市场平均作为 proxy
+        merged_daily = merged.groupby("DATE")[col].mean().rename("MKT").reset_index()
+        df = df.merge(merged_daily, on="DATE", how="left")
+        df = df.dropna()
+        X = sm.add_constant(df["MKT"])
+        model = sm.OLS(df["LS"], X).fit()
+        alpha = model.params["const"]
+        r2 = model.rsquared
+
+        # Append summary
+        results.append({
+            "Horizon": horizon,
+            "Sharpe Ratio": sharpe,
+            "Sharpe CI Low": sharpe_boot["ci_low"],
+            "Sharpe CI High": sharpe_boot["ci_high"],
+            "Sharpe p (boot)": sharpe_boot["p_boot"],
+            "IC": ic,
+            "Daily IC": ic_boot["estimate"],
+            "Daily IC p (boot)": ic_boot["p_boot"],
+            "Win Rate": win_rate,
+            "Avg Turnover": avg_turnover,
+            "Alpha": alpha,
+            "R2": r2,
+            "Cumulative Return": df["cum_return"].iloc[-1] - 1
+        })
+
+        # 绘图（进程池中渲染，不阻塞下一个持有期的计算）
+        plots.line(f"cumulative_return_{horizon}.png", {"": (df["DATE"], df["cum_return"])},
+                   title=f"Cumulative LS Return ({horizon})", xlabel="Date",
+                   ylabel="Cumulative Return", grid=True)
+
+    # 保存汇总表
+    result_df = pd.DataFrame(results)
+    result_df.to_csv("t0_strategy_summary_extended.csv", index=False)
+
+    with ResultsStore() as store:
+        store.append_many(
+            "t0_horizon",
+            [({"horizon": r["Horizon"], "top_n": 10, "period": "truncated_20171231"},
+              {"sharpe": r["Sharpe Ratio"], "sharpe_p_boot": r["Sharpe p (boot)"],
+               "ic": r["IC"], "ic_daily": r["Daily IC"], "ic_p_boot": r["Daily IC p (boot)"],
+               "win_rate": r["Win Rate"],
+               "avg_turnover": r["Avg Turnover"], "alpha": r["Alpha"], "r2": r["R2"],
+               "cum_ret": r["Cumulative Return"]})
+             for r in results],
+            data_version=data_version("tweet_level_preds.csv", "filter_2017_cleaned_aligned_data.csv"),
+        )
+
+    # 可视化：关键指标图
+    for metric, color, fname, title in [
+        ("Sharpe Ratio", "skyblue", "sharpe_across_horizon.png", "Sharpe Ratio across Horizons"),
+        ("IC", "salmon", "ic_across_horizon.png", "Spearman IC across Horizons"),
+        ("Win Rate", "lightgreen", "winrate_across_horizon.png", "Win Rate across Horizons"),
+    ]:
+        plots.bar(fname, result_df["Horizon"], result_df[metric], color=color, title=title,
+                  xlabel="Horizon", ylabel=metric, figsize=(10, 5))
+
+    plots.close()
+
+
+if __name__ == "__main__":
+    main()
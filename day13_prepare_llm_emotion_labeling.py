@@ -1,24 +1,235 @@
+#!/usr/bin/env python
+# day13_prepare_llm_emotion_labeling.py
+# Coding: UTF-8
+"""
+Extreme-signal samples for LLM emotion labeling
+===============================================
+* 分块流式读取（CSV `chunksize` / Parquet 文件或分片目录 `to_batches`），内存只与候选池大小有关
+* 每侧（正向 / 负向）维护一个候选池：每个分层（全局 / 日期 / 股票）只留前 k 个 **不重复** 文本；
+  新块先用池中第 k 名的阈值整体过滤，绝大多数行在这一步就被丢弃
+* 去重：文本归一化（小写、去 RT 前缀 / @提及 / 链接 / 标点）后哈希，同一哈希只保留信号最极端的一条，
+  转推和复制粘贴不再占用标注预算（流式阶段在分层内去重，结束时再跨分层去重一次）
+* 全局选取用 `np.argpartition`；分层时只对过滤后的候选做一次 (分层, 信号) 排序
+* 文本哈希是最贵的一步：只对每个分层信号最强的 m 行计算，不够 k 个不重复文本时 m 翻倍
 
+运行示例
+--------
+```bash
+python day13_prepare_llm_emotion_labeling.py                        # 全局 top / bottom 100，同原脚本
+python day13_prepare_llm_emotion_labeling.py --per date --k 5       # 每个交易日各 5 条
+python day13_prepare_llm_emotion_labeling.py --input preds.parquet --k 50000
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
 import pandas as pd
 
-# 加载 signal 数据
-df = pd.read_csv("tweet_level_preds.csv")
-df["DATE"] = pd.to_datetime(df["DATE"])
+INPUT = "tweet_level_preds.csv"
+OUTPUT = "llm_emotion_type_labeling_samples.csv"
+SIGNAL_COL = "net_tone"
+TEXT_COL = "TWEET"
+STRATA = {"none": None, "date": "DATE", "ticker": "STOCK_CODE"}
 
 # 只保留必要列
-df = df[["DATE", "STOCK_CODE", "TEXT_COL", "net_tone", "TWEET","LAST_PRICE_COL", "1_DAY_RETURN", "2_DAY_RETURN", "3_DAY_RETURN", "7_DAY_RETURN"]]
-df = df.dropna(subset=["TWEET", "net_tone"])
-
-# 选择 top-K 正向信号和 bottom-K 负向信号
-top_k = 100
-top_positive = df.sort_values("net_tone", ascending=False).head(top_k).copy()
-top_negative = df.sort_values("net_tone", ascending=True).head(top_k).copy()
-
-# 添加空列供手动/LLM 填写情绪类型标签
-top_positive["label"] = ""
-top_negative["label"] = ""
-
-# 合并导出
-combined = pd.concat([top_positive, top_negative], ignore_index=True)
-combined.to_csv("llm_emotion_type_labeling_samples.csv", index=False)
-print("✅ 已导出待标注样本文件：llm_emotion_type_labeling_samples.csv")
+KEEP_COLS = ["DATE", "STOCK_CODE", "TEXT_COL", "net_tone", "TWEET", "LAST_PRICE_COL",
+             "1_DAY_RETURN", "2_DAY_RETURN", "3_DAY_RETURN", "7_DAY_RETURN"]
+
+_NORMALIZE = [
+    (r"^\s*rt\s+@\w+:?", " "),       # 转推前缀
+    (r"https?://\S+", " "),          # 链接
+    (r"[@$#]\w+", " "),               # @提及 / $代码 / #话题
+    (r"[^a-z0-9 ]+", " "),            # 标点、表情、截断省略号
+    (r"\s+", " "),
+]
+
+# ---------------------------------------------------------------------------
+# 读取 & 归一化哈希
+# ---------------------------------------------------------------------------
+
+def iter_chunks(path: str | Path, columns: list[str], chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Stream `columns` from a CSV, a Parquet file or a Parquet part directory."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_rows)
+        return
+    import pyarrow.dataset as ds
+
+    for batch in ds.dataset(path, format="parquet").to_batches(columns=columns, batch_size=chunk_rows):
+        yield batch.to_pandas()
+
+
+def text_hashes(text: pd.Series) -> np.ndarray:
+    """uint64 hash of the normalized text (retweets / copies collapse to one value)."""
+    norm = text.astype(str).str.lower()
+    for pattern, repl in _NORMALIZE:
+        norm = norm.str.replace(pattern, repl, regex=True)
+    return pd.util.hash_array(norm.str.strip().to_numpy(dtype=object))
+
+# ---------------------------------------------------------------------------
+# 分层 top-k
+# ---------------------------------------------------------------------------
+
+def top_k_positions(score: np.ndarray, groups: np.ndarray | None, k: int) -> np.ndarray:
+    """Positions of the k highest `score` per group (ties → earlier position), best first."""
+    if groups is None:
+        if len(score) > k:
+            part = np.argpartition(-score, k - 1)[:k]
+            # argpartition 不保证并列时的先后：把与第 k 名同分的行按位置补齐
+            kth = score[part].min()
+            above = np.flatnonzero(score > kth)
+            tied = np.flatnonzero(score == kth)[:k - len(above)]
+            part = np.concatenate([above, tied])
+        else:
+            part = np.arange(len(score))
+        return part[np.lexsort((part, -score[part]))]
+    order = np.lexsort((np.arange(len(score)), -score, groups))
+    g = groups[order]
+    start = np.r_[True, g[1:] != g[:-1]]
+    rank = np.arange(len(g)) - np.maximum.accumulate(np.where(start, np.arange(len(g)), 0))
+    return order[rank < k]
+
+
+def _dedup(key: np.ndarray, score: np.ndarray, groups: np.ndarray | None) -> np.ndarray:
+    """Sorted positions keeping the most extreme (then earliest) row per text hash [per group]."""
+    best = np.lexsort((np.arange(len(score)), -score))
+    dup = (pd.Series(key[best]).duplicated() if groups is None
+           else pd.DataFrame({"g": groups[best], "h": key[best]}).duplicated())
+    return np.sort(best[~dup.to_numpy()])
+
+
+class ExtremePool:
+    """Running top-k distinct texts per stratum for one side of the signal.
+
+    Duplicates are collapsed within a stratum while streaming (so the pool
+    never depends on chunk boundaries) and across strata once at the end;
+    a stratum can therefore finish with fewer than k rows when its texts
+    are more extreme elsewhere.
+    """
+
+    def __init__(self, k: int, sign: float, stratum: str | None, dedup: bool = True):
+        self.k, self.sign, self.stratum, self.dedup = k, sign, stratum, dedup
+        self.pool: pd.DataFrame | None = None
+        self.seen = 0
+
+    def _thresholds(self, keys: pd.Series) -> np.ndarray:
+        """Score a new row must reach to enter (−inf while a stratum has < k rows)."""
+        if self.pool is None:
+            return np.full(len(keys), -np.inf)
+        score = self.sign * self.pool[SIGNAL_COL]
+        if self.stratum is None:
+            kth = score.min() if len(score) >= self.k else -np.inf
+            return np.full(len(keys), kth)
+        by = score.groupby(self.pool[self.stratum].to_numpy())
+        kth = by.min().where(by.size() >= self.k, -np.inf)
+        return keys.map(kth).fillna(-np.inf).to_numpy()
+
+    def update(self, chunk: pd.DataFrame) -> None:
+        keys = chunk[self.stratum] if self.stratum else pd.Series(0, index=chunk.index)
+        score = self.sign * chunk[SIGNAL_COL].to_numpy(dtype=float)
+        enter = score >= self._thresholds(keys)
+        cand = chunk[enter].copy()
+        cand["_row"] = np.flatnonzero(enter) + self.seen
+        self.seen += len(chunk)
+        if cand.empty:
+            return
+
+        # 池中行号都早于新块 → merged 按行号有序，位置先后即行号先后
+        merged = cand if self.pool is None else pd.concat([self.pool, cand], ignore_index=True)
+        score = self.sign * merged[SIGNAL_COL].to_numpy(dtype=float)
+        groups = pd.factorize(merged[self.stratum], sort=True)[0] if self.stratum else None
+        if self.dedup:
+            pool_hashes = None if self.pool is None else self.pool["_hash"].to_numpy()
+            keep = self._select(merged, score, groups, pool_hashes)
+        else:
+            keep = top_k_positions(score, groups, self.k)
+        self.pool = merged.iloc[np.sort(keep)].reset_index(drop=True)
+
+    def _select(self, merged: pd.DataFrame, score: np.ndarray, groups: np.ndarray | None,
+                pool_hashes: np.ndarray | None) -> np.ndarray:
+        """Top-k distinct texts per group, hashing only the best `m` rows per group.
+
+        Rows outside a group's best `m` can only matter when those `m` hold
+        fewer than k distinct texts, so `m` doubles until every group either
+        has k distinct texts or is fully hashed.
+        """
+        hashes = np.zeros(len(merged), dtype=np.uint64)
+        known = np.zeros(len(merged), dtype=bool)
+        if pool_hashes is not None:                     # 池中的行（merged 的前几行）已有哈希
+            hashes[:len(pool_hashes)] = pool_hashes
+            known[:len(pool_hashes)] = True
+        g = np.zeros(len(merged), dtype=np.int64) if groups is None else groups
+        sizes = np.bincount(g)
+        m = 2 * self.k
+        while True:
+            top = top_k_positions(score, groups, m)
+            todo = top[~known[top]]
+            if len(todo):
+                hashes[todo] = text_hashes(merged[TEXT_COL].iloc[todo])
+                known[todo] = True
+            top = np.sort(top)
+            distinct = _dedup(hashes[top], score[top], None if groups is None else groups[top])
+            kept = top[distinct]
+            enough = (np.bincount(g[kept], minlength=len(sizes)) >= self.k) | (np.minimum(sizes, m) == sizes)
+            if enough.all():
+                break
+            m *= 2
+        merged["_hash"] = hashes                        # 只有已计算的行会进入池
+        sub = top_k_positions(score[kept], None if groups is None else groups[kept], self.k)
+        return kept[sub]
+
+    def result(self) -> pd.DataFrame:
+        if self.pool is None:
+            return pd.DataFrame(columns=KEEP_COLS)
+        out = self.pool
+        if self.dedup and self.stratum:                 # 跨分层的同一文本只留最极端的一条
+            score = self.sign * out[SIGNAL_COL].to_numpy(dtype=float)
+            out = out.iloc[_dedup(out["_hash"].to_numpy(), score, None)]
+        sort_cols = ([self.stratum] if self.stratum else []) + [SIGNAL_COL, "_row"]
+        ascending = ([True] if self.stratum else []) + [self.sign < 0, True]
+        out = out.sort_values(sort_cols, ascending=ascending, kind="stable")
+        return out.drop(columns=[c for c in ("_row", "_hash") if c in out]).reset_index(drop=True)
+
+
+def select_extremes(path: str | Path = INPUT, k: int = 100, per: str = "none", dedup: bool = True,
+                    chunk_rows: int = 1_000_000) -> pd.DataFrame:
+    """Top-k positive and bottom-k negative tweets per stratum, one streaming pass."""
+    stratum = STRATA[per]
+    pools = [ExtremePool(k, 1.0, stratum, dedup), ExtremePool(k, -1.0, stratum, dedup)]
+    for chunk in iter_chunks(path, KEEP_COLS, chunk_rows):
+        chunk = chunk[KEEP_COLS].dropna(subset=[TEXT_COL, SIGNAL_COL])
+        chunk["DATE"] = pd.to_datetime(chunk["DATE"])
+        for pool in pools:
+            pool.update(chunk)
+    top_positive, top_negative = (p.result() for p in pools)
+    return pd.concat([top_positive, top_negative], ignore_index=True)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    ap = argparse.ArgumentParser(description="Extreme net_tone tweets → LLM emotion labeling sheet")
+    ap.add_argument("--input", default=INPUT, help="tweet 级预测：.csv / .parquet / 分片目录")
+    ap.add_argument("--output", default=OUTPUT)
+    ap.add_argument("--k", type=int, default=100, help="每个分层、每一侧的样本数")
+    ap.add_argument("--per", choices=list(STRATA), default="none", help="分层：全局 / 每日 / 每只股票")
+    ap.add_argument("--no_dedup", action="store_true", help="不做归一化文本去重")
+    ap.add_argument("--chunk_rows", type=int, default=1_000_000)
+    args = ap.parse_args()
+
+    combined = select_extremes(args.input, args.k, args.per, not args.no_dedup, args.chunk_rows)
+
+    # 添加空列供手动/LLM 填写情绪类型标签
+    combined["label"] = ""
+    combined.to_csv(args.output, index=False)
+    print(f"✅ 已导出待标注样本文件：{args.output}（{len(combined)} 行）")
+
+
+if __name__ == "__main__":
+    main()
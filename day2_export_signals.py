@@ -1,6 +1,11 @@
 # day2_export_signals.py
 from pathlib import Path
-import pandas as pd, numpy as np, pickle
+import pandas as pd
+
+from signal_aggregator import write_signals
+from sparse_signals import SparseSignals
+from stage_timer import stage
+from tone_model import load_models, score_texts
 
 DATA_CSV      = "filter_2017_cleaned_aligned_data.csv"
 TEXT_COL      = "cleaned_text"
@@ -11,6 +16,7 @@ ONE_DAY_RETURN_COL = "1_DAY_RETURN"
 TWO_DAY_RETURN_COL = "2_DAY_RETURN"
 THREE_DAY_RETURN_COL = "3_DAY_RETURN"
 SEVEN_DAY_RETURN_COL = "7_DAY_RETURN"
+DUP_COUNT_COL = "DUP_COUNT"            # align 阶段按 (STOCK, DATE) 近似去重后的簇大小（旧数据没有该列）
 
 
 
@@ -18,19 +24,21 @@ MODEL_DIR     = Path("models")
 OUT_TWEET_CSV = "tweet_level_preds.csv"
 OUT_SIGNAL_PQ = "signals.parquet"
 
+# 设置 STAGE_LOG=timings.jsonl 即记录各阶段耗时 / 内存
 # ---------- 载入模型 ----------
-vec = pickle.load(open(MODEL_DIR / "vectorizer.pkl", "rb"))
-lda = pickle.load(open(MODEL_DIR / "lda_model.pkl", "rb"))
-clf = pickle.load(open(MODEL_DIR / "logreg.pkl",   "rb"))
+with stage("load", what="models"):
+    models = load_models(MODEL_DIR)
 
 # ---------- 推文级预测 ----------
-df = pd.read_csv(DATA_CSV, parse_dates=[DATE_COL])
-X  = vec.transform(df[TEXT_COL])
-doc_topic = lda.transform(X)
+with stage("load", what="data") as rec:
+    df = pd.read_csv(DATA_CSV, parse_dates=[DATE_COL])
+    rec["rows"] = len(df)
+with stage("classify", rows=len(df), mode="score"):
+    scores = score_texts(models, df[TEXT_COL])
 
-p_pos = clf.predict_proba(doc_topic)[:, 1]
-p_neg = 1 - p_pos
-net_tone = doc_topic[:, 0] - doc_topic[:, 1]
+p_pos = scores["p_pos"]
+p_neg = scores["p_neg"]
+net_tone = scores["net_tone"]
 text = df[TEXT_COL].astype(str)  # 确保文本列为字符串类型
 tweet = df["TWEET"].astype(str)
 
@@ -45,17 +53,18 @@ tweet_preds[TWO_DAY_RETURN_COL] = df[TWO_DAY_RETURN_COL]
 tweet_preds[THREE_DAY_RETURN_COL] = df[THREE_DAY_RETURN_COL]
 tweet_preds[SEVEN_DAY_RETURN_COL] = df[SEVEN_DAY_RETURN_COL]
 tweet_preds["TWEET"] = tweet.astype(str)  # 确保推文列为字符串类型
+weight_col = DUP_COUNT_COL if DUP_COUNT_COL in df else None
+if weight_col:
+    tweet_preds[weight_col] = df[weight_col]
 
 tweet_preds.to_csv(OUT_TWEET_CSV, index=False)
 
 # ---------- 日度信号 ----------
-daily = (
-    tweet_preds
-    .groupby([DATE_COL, TICKER_COL])["net_tone"]
-    .mean()
-    .unstack(fill_value=np.nan)
-)
-daily.sort_index(inplace=True)
-daily.to_parquet(OUT_SIGNAL_PQ)
-
-print("✅ 导出完成：", OUT_SIGNAL_PQ, daily.shape)
+# 长表 (DATE, TICKER, SIGNAL)：只存有推文的 (日期, 股票)，不再写几乎全是 NaN 的宽表；
+# read_signals() 仍可还原宽表，read_sparse_signals() 直接得到 CSR；有 DUP_COUNT 时按簇大小加权
+# signals.parquet 可能已被 SignalAggregator 转成分片目录：经 write_signals 写入（目录时替换历史分片）
+with stage("aggregate", rows=len(tweet_preds)):
+    daily = SparseSignals.from_long(tweet_preds, DATE_COL, TICKER_COL, "net_tone", weight_col)
+    write_signals(daily.to_long(), OUT_SIGNAL_PQ)
+
+print("✅ 导出完成：", OUT_SIGNAL_PQ, daily)
@@ -4,11 +4,13 @@
 Day 2 – SESTM 最小复现流水线 v5  (clean‑stopwords edition)
 ========================================================
 * χ² / MI 词筛选 → 2‑Topic LDA → Logistic 分类
-* **进度监控** : logging + tqdm 进度条
+* **进度监控** : logging + stage_timer 阶段日志
 * **断点续跑** : 如已检测到 models/*.pkl 且类型正确，自动跳过训练
 * **健壮性**   : 自动检测坏模型（例如旧版本存下来的 ndarray），若不合法自动重训
 * **可视化**   : 词云 & 情感分布，--visualize / --no_visualize 开关
 * **停用词**   : 内置三类停用词 ①平台/口语噪声 ②可选品牌主题词 ③英文默认停用词
+* **哈希特征** : `--hash_bits 20` 用 HashingVectorizer 代替 CountVectorizer（无词表、单遍、`--n_jobs` 并行），
+  top‑k 选桶后由 hashed_features.HashedTermSelector 反查词名（词云 / 词典照常输出）
 
 运行示例
 --------
@@ -19,6 +21,7 @@ python day2_sestm_pipeline_clean.py \
     --text_col cleaned_text \
     --return_col 1_DAY_RETURN \
     --remove_brand_words   # 若希望同时去掉品牌/主题词
+python day2_sestm_pipeline_delete_noise.py --hash_bits 20 --n_jobs 4 --force_retrain
 ```
 """
 
@@ -35,20 +38,29 @@ from typing import List, Tuple, Set
 import numpy as np
 import pandas as pd
 from sklearn.feature_selection import chi2, mutual_info_classif
-from sklearn.feature_extraction.text import CountVectorizer, ENGLISH_STOP_WORDS
+from sklearn.feature_extraction.text import CountVectorizer, ENGLISH_STOP_WORDS, HashingVectorizer
 from sklearn.decomposition import LatentDirichletAllocation
 from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.metrics import roc_auc_score, accuracy_score
-from tqdm import tqdm
-import seaborn as sns
 
-# 可选可视化依赖
-try:
-    from wordcloud import WordCloud
-    import matplotlib.pyplot as plt
-except ImportError:
-    WordCloud = None  # type: ignore
+from hashed_features import HashedTermSelector, document_frequency, hashing_vectorizer, transform_parallel
+from lean_model import export_lean
+from stage_timer import add_timing_args, configure_from_args, stage
+
+
+def _plotting():
+    """(WordCloud, plt, sns) on first use; None when the optional deps are missing.
+
+    可视化依赖只在 --visualize 时导入，训练 / 加载路径不再为 matplotlib + seaborn 付启动开销。
+    """
+    try:
+        from wordcloud import WordCloud
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+    except ImportError:
+        return None
+    return WordCloud, plt, sns
 
 # ---------------------------------------------------------------------------
 # 停用词配置
@@ -122,15 +134,29 @@ def load_dataset(path: str, text_col: str, label_col: str | None = None, return_
 # 特征工程
 # ---------------------------------------------------------------------------
 
-def select_top_k_terms(X, y, vectorizer: CountVectorizer, k: int = 5000, method: str = "chi2") -> Tuple[np.ndarray, CountVectorizer]:
-    """根据 χ² 或互信息打分，截取 top‑k 词。返回稀疏矩阵及新 vectorizer（仅包含 top‑k 词）"""
+def select_top_k_terms(X, y, vectorizer: CountVectorizer | HashingVectorizer, k: int = 5000, method: str = "chi2",
+                       texts: List[str] | None = None, min_df: int = 1) -> Tuple[np.ndarray, CountVectorizer]:
+    """根据 χ² 或互信息打分，截取 top‑k 词。返回稀疏矩阵及新 vectorizer（仅包含 top‑k 词）
+
+    哈希模式（vectorizer 为 HashingVectorizer）：只给文档频数 ≥ min_df 的桶打分，返回
+    HashedTermSelector，并用 `texts` 流式建立选中桶的反查词表。
+    """
+    hashed = isinstance(vectorizer, HashingVectorizer)
+    if hashed and texts is None:
+        raise ValueError("哈希模式需要 texts 来建立反查词表")
+    # 哈希列大多是空桶：先按文档频数筛掉（相当于 CountVectorizer 的 min_df）
+    cols = np.flatnonzero(document_frequency(X) >= max(min_df, 1)) if hashed else None
+    X_scored = X[:, cols] if hashed else X
     if method == "chi2":
-        scores, _ = chi2(X, y)
+        scores, _ = chi2(X_scored, y)
     else:
-        scores = mutual_info_classif(X, y, discrete_features=True)
+        scores = mutual_info_classif(X_scored, y, discrete_features=True)
 
     # 取分数最高的 k 维
     top_idx = np.argsort(scores)[-k:]
+    if hashed:
+        top_idx = cols[top_idx]
+        return X[:, top_idx], HashedTermSelector(vectorizer, top_idx).fit(texts)
     # 获取所有特征词
     all_features = vectorizer.get_feature_names_out()
     # 选择 top‑k 词汇构建新的词汇表
@@ -194,7 +220,7 @@ def load_pickle(path: Path):
 # 可视化 Topic 0: E-commerce & Promotion Keywords / Topic 1: Politics & Social Discourse
 # ---------------------------------------------------------------------------
 
-def save_wordcloud_dict(lda: LatentDirichletAllocation, vec: CountVectorizer, outdir: Path, topn: int = 50):
+def save_wordcloud_dict(lda: LatentDirichletAllocation, vec: CountVectorizer | HashedTermSelector, outdir: Path, topn: int = 50):
     """保存每个主题的词云数据为 JSON 词典"""
     ensure_dir(outdir)
     terms = np.array(vec.get_feature_names_out())
@@ -219,10 +245,12 @@ def save_wordcloud_dict(lda: LatentDirichletAllocation, vec: CountVectorizer, ou
     return all_topics_dict
 
 
-def generate_wordclouds(lda: LatentDirichletAllocation, vec: CountVectorizer, outdir: Path, topn: int = 50):
-    if WordCloud is None:
+def generate_wordclouds(lda: LatentDirichletAllocation, vec: CountVectorizer | HashedTermSelector, outdir: Path, topn: int = 50):
+    libs = _plotting()
+    if libs is None:
         logging.warning("wordcloud 库未安装，跳过词云绘制。")
         return
+    WordCloud, plt, _ = libs
     ensure_dir(outdir)
     terms = np.array(vec.get_feature_names_out())
     for k in range(lda.n_components):
@@ -239,8 +267,10 @@ def generate_wordclouds(lda: LatentDirichletAllocation, vec: CountVectorizer, ou
 
 
 def plot_tone_distribution(net_tone: np.ndarray, labels: np.ndarray, outdir: Path):
-    if WordCloud is None:
+    libs = _plotting()
+    if libs is None:
         return
+    _, plt, sns = libs
     ensure_dir(outdir)
     plt.figure(figsize=(6, 4))
     for lab, name in zip([1, 0], ["Up", "Down"]):
@@ -275,7 +305,12 @@ def main():
         action="store_true",
         help="若指定，将品牌 / 主题词也加入停用词表，只保留纯情感信号",
     )
+    ap.add_argument("--hash_bits", type=int, default=None,
+                    help="哈希特征位数（如 20 → 2^20 列）；不设则用 CountVectorizer 词表")
+    ap.add_argument("--n_jobs", type=int, default=1, help="向量化并行进程数（-1 = 全部核）")
+    add_timing_args(ap)
     args = ap.parse_args()
+    configure_from_args(args)
 
     model_dir = Path(args.model_dir)
     vec_pkl = model_dir / "vectorizer.pkl"
@@ -294,16 +329,22 @@ def main():
         except Exception as e:
             logging.warning(f"加载旧模型失败: {e}. 将重新训练…")
         else:
-            df = load_dataset(args.data, args.text_col, args.label_col, args.return_col)
-            X_transformed = vectorizer.transform(df["text"])
-            doc_topic = lda.transform(X_transformed)
+            with stage("load") as rec:
+                df = load_dataset(args.data, args.text_col, args.label_col, args.return_col)
+                rec["rows"] = len(df)
+            with stage("vectorize", rows=len(df)):
+                X_transformed = transform_parallel(vectorizer, df["text"], n_jobs=args.n_jobs)
+            with stage("lda", rows=len(df), mode="transform"):
+                doc_topic = lda.transform(X_transformed)
             net_tone = doc_topic[:, 0] - doc_topic[:, 1]
-            auc = roc_auc_score(df["label"], clf.predict_proba(doc_topic)[:, 1])
+            with stage("classify", rows=len(df), mode="predict"):
+                auc = roc_auc_score(df["label"], clf.predict_proba(doc_topic)[:, 1])
             logging.info(f"整体 AUC = {auc:.3f}")
             if args.visualize:
-                generate_wordclouds(lda, vectorizer, Path(args.fig_dir))
-                save_wordcloud_dict(lda, vectorizer, Path(args.fig_dir))
-                plot_tone_distribution(net_tone, df["label"].values, Path(args.fig_dir))
+                with stage("plot"):
+                    generate_wordclouds(lda, vectorizer, Path(args.fig_dir))
+                    save_wordcloud_dict(lda, vectorizer, Path(args.fig_dir))
+                    plot_tone_distribution(net_tone, df["label"].values, Path(args.fig_dir))
             return
 
     # ---------------- 开始重新训练 ---------------- #
@@ -311,40 +352,54 @@ def main():
     ensure_dir(model_dir)
 
     # 数据加载
-    df = load_dataset(args.data, args.text_col, args.label_col, args.return_col)
+    with stage("load") as rec:
+        df = load_dataset(args.data, args.text_col, args.label_col, args.return_col)
+        rec["rows"] = len(df)
     texts = df["text"].tolist()
     y = df["label"].values
 
     # 向量化
     logging.info("→ 文本向量化 …")
-    custom_stop = build_stopwords(args.remove_brand_words)
-    base_vec = CountVectorizer(min_df=3, stop_words=custom_stop, lowercase=True)
-    X_full = base_vec.fit_transform(texts)
+    with stage("vectorize", rows=len(texts), hash_bits=args.hash_bits) as rec:
+        custom_stop = build_stopwords(args.remove_brand_words)
+        if args.hash_bits:
+            base_vec = hashing_vectorizer(args.hash_bits, stop_words=custom_stop)
+            X_full = transform_parallel(base_vec, texts, n_jobs=args.n_jobs)
+        else:
+            base_vec = CountVectorizer(min_df=3, stop_words=custom_stop, lowercase=True)
+            X_full = base_vec.fit_transform(texts)
+        rec["vocab"] = X_full.shape[1]
 
     # 词筛选
     logging.info("→ 词项筛选 (top‑%d) …", args.top_k)
-    X_sel, vec_sel = select_top_k_terms(X_full, y, base_vec, k=args.top_k, method=args.method)
+    with stage("select", rows=len(texts), top_k=args.top_k, method=args.method):
+        X_sel, vec_sel = select_top_k_terms(X_full, y, base_vec, k=args.top_k, method=args.method,
+                                            texts=texts, min_df=3)
 
     # LDA
-    lda, doc_topic = train_lda(X_sel)
+    with stage("lda", rows=len(texts), mode="fit"):
+        lda, doc_topic = train_lda(X_sel)
 
     # 分类器
     logging.info("→ 训练 Logistic 分类器 …")
-    clf, auc, acc = train_classifier(doc_topic, y)
+    with stage("classify", rows=len(texts), mode="fit"):
+        clf, auc, acc = train_classifier(doc_topic, y)
     logging.info(f"验证 AUC = {auc:.3f} | Accuracy = {acc:.3f}")
 
     # 保存
     save_pickle(vec_sel, vec_pkl)
     save_pickle(lda, lda_pkl)
     save_pickle(clf, clf_pkl)
+    export_lean(vec_sel, lda, clf, model_dir / "lean")     # 推理侧免 sklearn 的数组格式
     logging.info(f"✔ 模型已保存到 {model_dir}")
 
     # 可视化
     if args.visualize:
-        generate_wordclouds(lda, vec_sel, Path(args.fig_dir))
-        save_wordcloud_dict(lda, vec_sel, Path(args.fig_dir))
-        net_tone = doc_topic[:, 0] - doc_topic[:, 1]
-        plot_tone_distribution(net_tone, y, Path(args.fig_dir))
+        with stage("plot"):
+            generate_wordclouds(lda, vec_sel, Path(args.fig_dir))
+            save_wordcloud_dict(lda, vec_sel, Path(args.fig_dir))
+            net_tone = doc_topic[:, 0] - doc_topic[:, 1]
+            plot_tone_distribution(net_tone, y, Path(args.fig_dir))
 
 
 if __name__ == "__main__":
@@ -1,7 +1,13 @@
 
+import argparse
+
 import pandas as pd
 import matplotlib.pyplot as plt
 
+ap = argparse.ArgumentParser(description="Daily top-N long-short backtest")
+ap.add_argument("--top_n", type=int, default=30, help="每天做多 / 做空的股票数")
+args = ap.parse_args()
+
 # 读取数据
 signal_df = pd.read_csv("tweet_level_preds.csv")
 price_df = pd.read_csv("filter_2017_cleaned_aligned_data.csv")
@@ -13,7 +19,7 @@ merged = pd.merge(signal_df, price_df, on=["DATE", "STOCK_CODE"], how="inner")
 merged["DATE"] = pd.to_datetime(merged["DATE"])
 
 # 设定每天选前N个long（看涨）+ N个short（看跌）
-N = 30
+N = args.top_n
 daily_returns = []
 
 # 按天循环构建组合
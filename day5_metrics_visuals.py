@@ -3,18 +3,25 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from metrics_kernel import perf_metrics
+
 # 读取策略结果
 df = pd.read_csv("day4_result.csv")
 df["DATE"] = pd.to_datetime(df["DATE"])
 
 # ==== 1. Summary metrics ====
+met = perf_metrics(df["LS"])
 summary = {
     "Total Days": len(df),
-    "Mean Daily Return": df["LS"].mean(),
-    "Std Dev of Return": df["LS"].std(),
-    "Sharpe Ratio": df["LS"].mean() / df["LS"].std() * (252**0.5),
-    "Cumulative Return": df["Cumulative_LS"].iloc[-1] - 1,
-    "Max Drawdown": (df["Cumulative_LS"] / df["Cumulative_LS"].cummax() - 1).min()
+    "Mean Daily Return": met["mean_ret"],
+    "Std Dev of Return": met["ann_vol"] / (252**0.5),
+    "Sharpe Ratio": met["sharpe"],
+    "Sortino Ratio": met["sortino"],
+    "Cumulative Return": met["cum_ret"],
+    "Max Drawdown": -met["max_dd"],          # 保持原表的负号约定
+    "Max Drawdown Days": met["max_dd_duration"],
+    "Hit Rate": met["hit_rate"],
+    "Calmar Ratio": met["calmar"],
 }
 summary_df = pd.DataFrame.from_dict(summary, orient="index", columns=["Value"])
 summary_df.to_csv("summary_metrics.csv")
@@ -2,6 +2,9 @@
 import pandas as pd
 import matplotlib.pyplot as plt
 
+from metrics_kernel import metrics_frame
+from results_store import ResultsStore, data_version
+
 # 读取数据
 signal_df = pd.read_csv("tweet_level_preds.csv")
 price_df = pd.read_csv("filter_2017_cleaned_aligned_data.csv")
@@ -51,17 +54,22 @@ plt.savefig("compare_topN_returns_truncated20171231.png")
 plt.show()
 
 # 生成 summary 表格（截尾版）
-summary = []
-for N, df in results.items():
-    sharpe = df["LS"].mean() / df["LS"].std() * (252 ** 0.5)
-    max_dd = (df["Cumulative_LS"] / df["Cumulative_LS"].cummax() - 1).min()
-    summary.append({
-        "Top_N": N,
-        "Mean Daily Return": df["LS"].mean(),
-        "Sharpe Ratio": sharpe,
-        "Max Drawdown": max_dd,
-        "Cumulative Return": df["Cumulative_LS"].iloc[-1] - 1
-    })
-
-summary_df = pd.DataFrame(summary)
+ls_table = pd.DataFrame({N: df.set_index("DATE")["LS"] for N, df in results.items()})
+met = metrics_frame(ls_table)            # 所有 N 一次算完
+summary_df = pd.DataFrame({
+    "Top_N": met.index,
+    "Mean Daily Return": met["mean_ret"].values,
+    "Sharpe Ratio": met["sharpe"].values,
+    "Max Drawdown": -met["max_dd"].values,   # 保持原表的负号约定
+    "Cumulative Return": met["cum_ret"].values,
+})
 summary_df.to_csv("topN_strategy_summary_truncated20171231.csv", index=False)
+
+# 写入结果库，供对比 / 报告脚本查询
+with ResultsStore() as store:
+    store.append_many(
+        "topN_daily_ls",
+        [({"top_n": int(N), "period": "truncated_20171231", "horizon": "1_DAY_RETURN"}, row.to_dict())
+         for N, row in met.iterrows()],
+        data_version=data_version("tweet_level_preds.csv", "filter_2017_cleaned_aligned_data.csv"),
+    )
@@ -3,14 +3,16 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-# ==== 1. 加载 summary 文件 ====
-full = pd.read_csv("topN_strategy_summary.csv")
-trunc = pd.read_csv("topN_strategy_summary_truncated20171231.csv")
-
-full["Source"] = "Full Period"
-trunc["Source"] = "Truncated"
-
-combined = pd.concat([full, trunc])
+from results_store import ResultsStore
+
+# ==== 1. 从结果库读取 day6 的两组 Top-N 结果 ====
+with ResultsStore() as store:
+    combined = store.query("topN_daily_ls", latest_version=True)
+combined = combined[combined["period"].isin(["full", "truncated_20171231"])]
+combined = combined.rename(columns={
+    "top_n": "Top_N", "sharpe": "Sharpe Ratio", "cum_ret": "Cumulative Return"})
+combined["Max Drawdown"] = -combined["max_dd"]
+combined["Source"] = combined["period"].map({"full": "Full Period", "truncated_20171231": "Truncated"})
 
 # ==== 2. 横向对比图 ====
 metrics = ["Sharpe Ratio", "Max Drawdown", "Cumulative Return"]
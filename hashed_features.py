@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# hashed_features.py
+# Coding: UTF-8
+"""
+Hashed term features (hashing trick)
+====================================
+* `hashing_vectorizer(bits)`：sklearn HashingVectorizer，2^bits 列、原始词频、不翻转符号，分词与
+  CountVectorizer 相同；**没有词表、不需要 fit**，一遍 transform 即可，可流式、可多进程
+* `transform_parallel` / `iter_transform`：按块多进程 transform（joblib）/ 流式逐块产出稀疏矩阵
+* `document_frequency`：每个桶的文档频数，哈希模式下代替 CountVectorizer 的 `min_df`
+* `HashedTermSelector`：select_top_k_terms 选出的 k 个桶 + 反查表
+  - `transform` 与训练时的列完全一致（哈希后取选中的桶），可直接喂给 LDA
+  - `fit(texts)` 流式扫一遍训练语料，只为选中的桶记录落入的词及词频：每块取唯一 token，
+    一次哈希 transform 得到桶号，内存 ~ k × 每桶碰撞词数
+  - `get_feature_names_out` 取每个桶最高频的词（词云 / top terms 报告），`vocabulary_` 供
+    lean_model.export_lean 导出（多个碰撞词指向同一列）
+
+注意：lean 格式按词表查词——训练语料里没出现过、但恰好哈希进选中桶的新词，pickle 版会计入，
+lean 版不会（每个新词的概率约 k / 2^bits）。因此导出的 meta.json 带 `hashed: true`，
+tone_model.load_models 默认回退到 pickle，`lean=True` 才强制使用。
+
+示例
+----
+```python
+vec = hashing_vectorizer(20, stop_words=build_stopwords())
+X = transform_parallel(vec, texts, n_jobs=4)
+X_sel, vec_sel = select_top_k_terms(X, y, vec, k=5000, texts=texts, min_df=3)
+vec_sel.get_feature_names_out()[:10]
+```
+"""
+
+from __future__ import annotations
+
+from collections import Counter
+from typing import Iterable, Iterator, Sequence
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.base import clone
+from sklearn.feature_extraction.text import HashingVectorizer
+
+DEFAULT_BITS = 20
+CHUNK_SIZE = 50_000
+
+# ---------------------------------------------------------------------------
+# 向量化
+# ---------------------------------------------------------------------------
+
+def hashing_vectorizer(bits: int = DEFAULT_BITS, stop_words=None, lowercase: bool = True) -> HashingVectorizer:
+    """Count-valued hashing vectorizer with 2**bits columns (no vocabulary, no fit)."""
+    return HashingVectorizer(n_features=2 ** bits, alternate_sign=False, norm=None,
+                             stop_words=stop_words, lowercase=lowercase)
+
+
+def _chunks(texts: Sequence[str], chunk_size: int) -> Iterator[Sequence[str]]:
+    for lo in range(0, len(texts), chunk_size):
+        yield texts[lo:lo + chunk_size]
+
+
+def iter_transform(vectorizer, chunks: Iterable[Sequence[str]]) -> Iterator[sp.csr_matrix]:
+    """Transform a stream of text chunks one at a time (e.g. `pd.read_csv(chunksize=…)`)."""
+    for chunk in chunks:
+        yield vectorizer.transform(chunk)
+
+
+def transform_parallel(vectorizer, texts: Sequence[str], n_jobs: int = 1,
+                       chunk_size: int = CHUNK_SIZE) -> sp.csr_matrix:
+    """`vectorizer.transform(texts)` split into chunks over `n_jobs` processes."""
+    texts = list(texts)
+    if n_jobs == 1 or len(texts) <= chunk_size:
+        return vectorizer.transform(texts)
+    from joblib import Parallel, delayed
+
+    parts = Parallel(n_jobs=n_jobs)(delayed(vectorizer.transform)(c) for c in _chunks(texts, chunk_size))
+    return sp.vstack(parts, format="csr")
+
+
+def document_frequency(X) -> np.ndarray:
+    """Number of documents with a non-zero count in each column."""
+    X = sp.csr_matrix(X)
+    X.sum_duplicates()
+    return np.bincount(X.indices, minlength=X.shape[1])
+
+# ---------------------------------------------------------------------------
+# 反查表
+# ---------------------------------------------------------------------------
+
+def _whole_term(term: str) -> list[str]:
+    return [term]
+
+
+def term_buckets(vectorizer: HashingVectorizer, terms: Sequence[str]) -> np.ndarray:
+    """Bucket of each already-analyzed term (same hash as `vectorizer.transform`)."""
+    hasher = clone(vectorizer).set_params(analyzer=_whole_term)
+    return hasher.transform(terms).indices
+
+
+class HashedTermSelector:
+    """Selected hash buckets of a HashingVectorizer, with a bucket → term inverse map."""
+
+    def __init__(self, vectorizer: HashingVectorizer, buckets: Sequence[int]):
+        self.vectorizer = vectorizer
+        self.buckets = np.asarray(buckets, dtype=np.int64)
+        self.term_counts_: dict[str, int] = {}
+        self.vocabulary_: dict[str, int] = {}
+        self.feature_names_ = np.array([f"#{b}" for b in self.buckets], dtype=object)
+
+    def fit(self, texts: Iterable[str], chunk_size: int = CHUNK_SIZE) -> "HashedTermSelector":
+        """One streaming pass over the training texts to name the selected buckets."""
+        column = np.full(self.vectorizer.n_features, -1, dtype=np.int64)
+        column[self.buckets] = np.arange(len(self.buckets))
+        analyze = self.vectorizer.build_analyzer()
+        counts: Counter = Counter()
+        texts = list(texts)
+        for chunk in _chunks(texts, chunk_size):
+            tokens = Counter(t for doc in chunk for t in analyze(doc))
+            if not tokens:
+                continue
+            terms = list(tokens)
+            hit = column[term_buckets(self.vectorizer, terms)] >= 0
+            counts.update({t: tokens[t] for t, h in zip(terms, hit) if h})
+
+        self.term_counts_ = dict(counts)
+        if counts:
+            terms = list(counts)
+            self.vocabulary_ = dict(zip(terms, column[term_buckets(self.vectorizer, terms)].tolist()))
+        # 每个桶取最高频的词命名（同频取字典序最小）
+        best: dict[int, tuple[int, str]] = {}
+        for term, col in self.vocabulary_.items():
+            cand = (-counts[term], term)
+            if col not in best or cand < best[col]:
+                best[col] = cand
+        for col, (_, term) in best.items():
+            self.feature_names_[col] = term
+        return self
+
+    def transform(self, texts) -> sp.csr_matrix:
+        return self.vectorizer.transform(texts)[:, self.buckets]
+
+    def get_feature_names_out(self) -> np.ndarray:
+        return self.feature_names_.copy()
+
+    def bucket_terms(self, col: int) -> list[tuple[str, int]]:
+        """All training terms hashed into selected column `col`, most frequent first."""
+        terms = [t for t, c in self.vocabulary_.items() if c == col]
+        return sorted(((t, self.term_counts_[t]) for t in terms), key=lambda tc: (-tc[1], tc[0]))
+
+    def get_params(self, deep: bool = False) -> dict:
+        """Tokenizer settings of the underlying vectorizer (read by lean_model.export_lean)."""
+        return self.vectorizer.get_params(deep=deep)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+# hit_rates.py
+# Coding: UTF-8
+"""
+Vectorized hit-rate (win-rate) engine
+=====================================
+* 一次符号比较得到 (样本 × 阈值 × 持有期) 的命中数组，不往源 DataFrame 里加 `actual_up_*` / `correct_*` 列
+* 阈值 t：信号 > t 判涨、信号 ≤ -t 判跌，其余不出手（t = 0 时与原脚本 `net_tone > 0` 的判定相同）
+* 全样本 / 逐日 / 逐股票胜率：组编号只 factorize 一次，每个 (阈值, 持有期) 列一次 `bincount`；
+  不跳过 NaN 时出手次数只与阈值有关，按阈值计数后复用到各持有期
+* 默认与原脚本一致：收益为 NaN 的行按“未上涨”计入；`skipna=True` 则不计入分母
+
+示例
+----
+```python
+hr = hit_rates_frame(merged, "net_tone", ["1_DAY_RETURN", "7_DAY_RETURN"], thresholds=[0, 0.1, 0.2])
+hr.overall                      # (threshold, horizon) → hit_rate / n_called / coverage
+hr.daily[(0.0, "1_DAY_RETURN")] # 逐日胜率
+```
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Sequence
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------
+# 命中数组
+# ---------------------------------------------------------------------------
+
+def hit_arrays(
+    signal: np.ndarray,
+    returns: np.ndarray,
+    thresholds: Sequence[float] = (0.0,),
+    skipna: bool = False,
+) -> tuple[np.ndarray, np.ndarray]:
+    """(hits, called), both shaped (n, T·H): threshold-major, horizon-minor columns."""
+    s = np.asarray(signal, dtype=float)[:, None]
+    r = np.asarray(returns, dtype=float).reshape(len(s), -1)
+    thr = np.asarray(thresholds, dtype=float)[None, :]
+
+    pred_up = s > thr                                   # (n, T)
+    called = pred_up | (s <= -thr)
+    actual_up = r > 0                                   # NaN → False（未上涨）
+
+    hits = called[:, :, None] & (pred_up[:, :, None] == actual_up[:, None, :])
+    called = np.broadcast_to(called[:, :, None], hits.shape)
+    if skipna:
+        called = called & ~np.isnan(r)[:, None, :]
+        hits &= called
+    n = len(s)
+    return hits.reshape(n, -1), called.reshape(n, -1)
+
+
+def grouped_sums(groups, *arrays: np.ndarray) -> tuple[pd.Index, list[np.ndarray]]:
+    """Per-group column sums of 2-D arrays (group codes factorized once, one `bincount` per column)."""
+    codes, labels = pd.factorize(pd.Series(groups), sort=True)
+    sums = [np.stack([np.bincount(codes, weights=a[:, j], minlength=len(labels)) for j in range(a.shape[1])],
+                     axis=1) if a.shape[1] else np.zeros((len(labels), 0)) for a in arrays]
+    return pd.Index(labels), sums
+
+# ---------------------------------------------------------------------------
+# 汇总
+# ---------------------------------------------------------------------------
+
+@dataclass
+class HitRates:
+    """Hit rates per (threshold, horizon) column."""
+
+    overall: pd.DataFrame          # index (threshold, horizon): hit_rate, n_hits, n_called, coverage
+    daily: pd.DataFrame | None     # date × (threshold, horizon)
+    by_ticker: pd.DataFrame | None # ticker × (threshold, horizon)
+
+    def summary(self, threshold: float = 0.0) -> pd.DataFrame:
+        """`winrate_summary.csv` layout (Horizon, WinRate) for one threshold."""
+        rows = self.overall.xs(threshold, level="threshold")["hit_rate"]
+        return pd.DataFrame({"Horizon": rows.index, "WinRate": rows.to_numpy()})
+
+
+def _rates(hits: np.ndarray, called: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return hits / called
+
+
+def hit_rates(
+    signal,
+    returns,
+    horizons: Sequence[str],
+    thresholds: Sequence[float] = (0.0,),
+    dates=None,
+    tickers=None,
+    skipna: bool = False,
+) -> HitRates:
+    """Overall, daily (if `dates`) and per-ticker (if `tickers`) hit rates."""
+    thresholds = [float(t) for t in thresholds]
+    hits, called = hit_arrays(signal, returns, thresholds, skipna)
+    columns = pd.MultiIndex.from_product([thresholds, list(horizons)], names=["threshold", "horizon"])
+
+    n_hits, n_called = hits.sum(axis=0), called.sum(axis=0)
+    overall = pd.DataFrame({"hit_rate": _rates(n_hits, n_called), "n_hits": n_hits,
+                            "n_called": n_called, "coverage": n_called / max(len(hits), 1)},
+                           index=columns)
+
+    n_h = len(horizons)
+
+    def grouped(labels):
+        if labels is None:
+            return None
+        if skipna:
+            index, (h, c) = grouped_sums(labels, hits, called)
+        else:                                           # 同一阈值下各持有期的出手次数相同
+            index, (h, c) = grouped_sums(labels, hits, called[:, ::n_h])
+            c = np.repeat(c, n_h, axis=1)
+        return pd.DataFrame(_rates(h, c), index=index, columns=columns)
+
+    return HitRates(overall, grouped(dates), grouped(tickers))
+
+
+def hit_rates_frame(
+    df: pd.DataFrame,
+    signal_col: str,
+    return_cols: Sequence[str],
+    thresholds: Sequence[float] = (0.0,),
+    date_col: str | None = "DATE",
+    ticker_col: str | None = "STOCK_CODE",
+    skipna: bool = False,
+) -> HitRates:
+    """`hit_rates` on DataFrame columns; `df` is only read."""
+    return hit_rates(
+        df[signal_col].to_numpy(dtype=float),
+        df[list(return_cols)].to_numpy(dtype=float),
+        return_cols,
+        thresholds,
+        dates=df[date_col].to_numpy() if date_col else None,
+        tickers=df[ticker_col].to_numpy() if ticker_col else None,
+        skipna=skipna,
+    )
@@ -1,11 +1,13 @@
-import pandas as pd
 import matplotlib.pyplot as plt
 
-# === 替换为你的文件名 ===
-summary_file = "topN_strategy_summary.csv"
+from results_store import ResultsStore
 
-# === 读取数据 ===
-df = pd.read_csv(summary_file)
+# === 从结果库读取 day6 全样本 Top-N 结果 ===
+with ResultsStore() as store:
+    df = store.query("topN_daily_ls", period="full", latest_version=True)
+df = df.sort_values("top_n").rename(columns={
+    "top_n": "Top_N", "sharpe": "Sharpe Ratio", "cum_ret": "Cumulative Return"})
+df["Max Drawdown"] = -df["max_dd"]
 
 # === 提取各列 ===
 N = df["Top_N"]
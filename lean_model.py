@@ -0,0 +1,219 @@
+#!/usr/bin/env python
+# lean_model.py
+# Coding: UTF-8
+"""
+Lean SESTM model format
+=======================
+* 用纯数组替代 pickle 的 sklearn 对象：推理时 **不导入 sklearn**，按 mmap 载入
+* 目录布局（默认 `models/lean/`）
+
+```
+meta.json                       分词参数、LDA 超参、logistic 类别、hashed（是否来自哈希特征）
+vocab.npy                       排序后的词表（'<U' 定长字符串），np.searchsorted 查词
+vocab_col.npy                   排序词 → 原 CountVectorizer 列号
+components.npy                  LDA components_ (n_topics, n_terms)
+exp_dirichlet_component.npy     LDA exp(E[log beta])，E-step 直接使用
+logreg_coef.npy / logreg_intercept.npy
+```
+
+* `LeanToneModel.score(texts)` 与 tone_model.score_texts 输出一致（p_pos / p_neg / net_tone）
+  —— E-step 对整批文档向量化迭代，收敛判据、digamma 近似均与 sklearn 相同
+* 哈希特征（hashed_features.HashedTermSelector）导出时 `hashed: true`：lean 只认训练语料里见过的
+  词，与 pickle 版不完全一致，tone_model.load_models 默认不选用
+
+转换已有 pickle
+---------------
+```bash
+python lean_model.py --model_dir models          # → models/lean/
+```
+"""
+
+from __future__ import annotations
+
+import json
+import re
+from pathlib import Path
+from typing import Dict, Sequence
+
+import numpy as np
+
+LEAN_FORMAT_VERSION = 1
+EULER = 0.577215664901532860606512090082402431
+
+# ---------------------------------------------------------------------------
+# 导出（需要已解封的 sklearn 对象，但本模块不导入 sklearn）
+# ---------------------------------------------------------------------------
+
+def export_lean(vectorizer, lda, clf, out_dir: str | Path) -> Path:
+    """Write the vectorizer / LDA / logistic stack as plain arrays."""
+    params = vectorizer.get_params()
+    if (params["analyzer"] != "word" or tuple(params["ngram_range"]) != (1, 1)
+            or params["tokenizer"] is not None or params["preprocessor"] is not None
+            or params["strip_accents"] is not None):
+        raise ValueError("lean format only supports unigram word analyzers with the default "
+                         "preprocessor / tokenizer")
+    if len(getattr(clf, "classes_", ())) != 2:
+        raise ValueError("lean format only supports a binary logistic classifier")
+
+    vocab = getattr(vectorizer, "vocabulary_", None) or params["vocabulary"]
+    terms = np.array(sorted(vocab))
+    cols = np.array([vocab[t] for t in terms], dtype=np.int32)
+
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    np.save(out_dir / "vocab.npy", terms)
+    np.save(out_dir / "vocab_col.npy", cols)
+    np.save(out_dir / "components.npy", np.asarray(lda.components_, dtype=np.float64))
+    np.save(out_dir / "exp_dirichlet_component.npy",
+            np.asarray(lda.exp_dirichlet_component_, dtype=np.float64))
+    np.save(out_dir / "logreg_coef.npy", np.asarray(clf.coef_, dtype=np.float64).ravel())
+    np.save(out_dir / "logreg_intercept.npy", np.asarray(clf.intercept_, dtype=np.float64))
+
+    meta = {
+        "format_version": LEAN_FORMAT_VERSION,
+        "lowercase": bool(params["lowercase"]),
+        "binary": bool(params.get("binary", False)),     # CountVectorizer(binary=True)：出现即记 1
+        "token_pattern": params["token_pattern"],
+        "n_terms": int(len(terms)),
+        "n_topics": int(lda.components_.shape[0]),
+        "doc_topic_prior": float(lda.doc_topic_prior_),
+        "max_doc_update_iter": int(lda.max_doc_update_iter),
+        "mean_change_tol": float(lda.mean_change_tol),
+        "classes": [c.item() if hasattr(c, "item") else c for c in clf.classes_],
+        # HashedTermSelector：未见过的新词可能哈希进选中的桶，lean 版查不到 → 只是近似
+        "hashed": hasattr(vectorizer, "buckets"),
+    }
+    (out_dir / "meta.json").write_text(json.dumps(meta, indent=2))
+    return out_dir
+
+# ---------------------------------------------------------------------------
+# 推理
+# ---------------------------------------------------------------------------
+
+def _psi(x: np.ndarray) -> np.ndarray:
+    """Digamma for positive arguments (same approximation as sklearn's LDA)."""
+    x = np.array(x, dtype=np.float64)
+    result = np.zeros_like(x)
+    tiny = x <= 1e-6
+    for _ in range(6):                      # psi(x+1) = psi(x) + 1/x，把 x 推到 ≥ 6
+        small = (x < 6) & ~tiny
+        result[small] -= 1.0 / x[small]
+        x[small] += 1
+    r = 1.0 / x
+    result += np.log(x) - 0.5 * r
+    r = r * r
+    result -= r * ((1. / 12.) - r * ((1. / 120.) - r * (1. / 252.)))
+    with np.errstate(divide="ignore"):
+        result[tiny] = -EULER - 1.0 / x[tiny]
+    return result
+
+
+class LeanToneModel:
+    """Array-only tone scorer loaded from an `export_lean` directory."""
+
+    def __init__(self, model_dir: str | Path, mmap: bool = True):
+        model_dir = Path(model_dir)
+        self.meta = json.loads((model_dir / "meta.json").read_text())
+        if self.meta.get("format_version") != LEAN_FORMAT_VERSION:
+            raise ValueError(f"unsupported lean model version: {self.meta.get('format_version')}")
+        mode = "r" if mmap else None
+        load = lambda name: np.load(model_dir / name, mmap_mode=mode)  # noqa: E731
+        self.vocab = load("vocab.npy")
+        self.vocab_col = load("vocab_col.npy")
+        self.components = load("components.npy")
+        self.exp_topic_word = load("exp_dirichlet_component.npy")
+        self.coef = load("logreg_coef.npy")
+        self.intercept = float(load("logreg_intercept.npy")[0])
+        self._token_re = re.compile(self.meta["token_pattern"])
+
+    # ---------------- 分词 → 稀疏计数 ---------------- #
+    def count_matrix(self, texts: Sequence[str]):
+        """CSR pieces (indptr, cols, counts) of the document-term count matrix."""
+        lower = self.meta["lowercase"]
+        tokens, lengths = [], np.empty(len(texts), dtype=np.int64)
+        for i, t in enumerate(texts):
+            toks = self._token_re.findall(t.lower() if lower else t)
+            tokens.extend(toks)
+            lengths[i] = len(toks)
+        doc = np.repeat(np.arange(len(texts)), lengths)
+        tok = np.array(tokens, dtype=str) if tokens else np.empty(0, dtype=self.vocab.dtype)
+
+        pos = np.searchsorted(self.vocab, tok)
+        pos[pos == len(self.vocab)] = 0
+        hit = self.vocab[pos] == tok
+        doc, col = doc[hit], np.asarray(self.vocab_col)[pos[hit]]
+
+        # (doc, col) 去重计数；按 doc 有序即为 CSR
+        n_terms = self.meta["n_terms"]
+        key, counts = np.unique(doc * n_terms + col, return_counts=True)
+        doc, col = key // n_terms, key % n_terms
+        indptr = np.zeros(len(texts) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(doc, minlength=len(texts)), out=indptr[1:])
+        if self.meta.get("binary", False):
+            counts = np.ones_like(counts)
+        return indptr, col, counts.astype(np.float64)
+
+    # ---------------- LDA E-step ---------------- #
+    def doc_topic(self, texts: Sequence[str]) -> np.ndarray:
+        """Normalized document-topic distribution (== LDA.transform)."""
+        indptr, col, cnt = self.count_matrix(texts)
+        n_docs, n_topics = len(texts), self.meta["n_topics"]
+        prior = self.meta["doc_topic_prior"]
+        tol, max_iter = self.meta["mean_change_tol"], self.meta["max_doc_update_iter"]
+        eps = np.finfo(np.float64).eps
+
+        doc = np.repeat(np.arange(n_docs), np.diff(indptr))
+        W = np.asarray(self.exp_topic_word)[:, col]                 # (K, nnz)
+        gamma = np.ones((n_docs, n_topics))
+        exp_theta = np.exp(_psi(gamma) - _psi(gamma.sum(1))[:, None])
+
+        # 与 sklearn 逐文档循环等价：每篇文档独立判断收敛，收敛后冻结
+        active = np.arange(n_docs)
+        for _ in range(max_iter):
+            if active.size == 0:
+                break
+            nz = np.isin(doc, active) if active.size < n_docs else slice(None)
+            d, w, c = doc[nz], W[:, nz], cnt[nz]
+            norm_phi = np.einsum("kn,nk->n", w, exp_theta[d]) + eps
+            ratio = c / norm_phi
+            acc = np.zeros((n_docs, n_topics))
+            for k in range(n_topics):
+                acc[:, k] = np.bincount(d, weights=ratio * w[k], minlength=n_docs)
+            new = exp_theta[active] * acc[active] + prior
+            exp_theta[active] = np.exp(_psi(new) - _psi(new.sum(1))[:, None])
+            change = np.abs(new - gamma[active]).mean(1)
+            gamma[active] = new
+            active = active[change >= tol]
+
+        return gamma / gamma.sum(1, keepdims=True)
+
+    # ---------------- 打分 ---------------- #
+    def score(self, texts: Sequence[str]) -> Dict[str, np.ndarray]:
+        """p_pos / p_neg / net_tone, same contract as tone_model.score_texts."""
+        texts = [str(t) for t in texts]
+        theta = self.doc_topic(texts)
+        p_pos = 1.0 / (1.0 + np.exp(-(theta @ self.coef + self.intercept)))
+        return {
+            "p_pos": p_pos,
+            "p_neg": 1 - p_pos,
+            "net_tone": theta[:, 0] - theta[:, 1],
+        }
+
+
+def load_lean(model_dir: str | Path = "models/lean", mmap: bool = True) -> LeanToneModel:
+    return LeanToneModel(model_dir, mmap=mmap)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tone_model import load_models
+
+    ap = argparse.ArgumentParser(description="Convert pickled SESTM models to the lean array format")
+    ap.add_argument("--model_dir", default="models")
+    ap.add_argument("--out_dir", default=None, help="默认 <model_dir>/lean")
+    args = ap.parse_args()
+
+    models = load_models(args.model_dir, lean=False)
+    out = export_lean(*models, args.out_dir or Path(args.model_dir) / "lean")
+    print(f"✔ lean 模型已写入 {out}")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# metrics_kernel.py
+# Coding: UTF-8
+"""
+Single-pass performance metrics kernel
+======================================
+* 输入为一条或多条收益序列：形状 (T,) 或 (n_series, T)，缺失值用 NaN
+* 一次向量化计算全部指标，返回 **数值**（格式化只在报告层做，见 `format_metrics`）
+* 各脚本（Day3 / day5 / day6 / day9 …）统一调用本模块，不再各自手算 Sharpe / 回撤
+"""
+
+from __future__ import annotations
+
+import math
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+METRIC_NAMES = (
+    "ann_ret", "cagr", "ann_vol", "sharpe", "sortino", "max_dd", "max_dd_duration",
+    "t_stat", "p_value", "hit_rate", "calmar", "cum_ret", "mean_ret", "n_obs",
+)
+
+# ---------------------------------------------------------------------------
+# Kernel
+# ---------------------------------------------------------------------------
+
+def compute_metrics(
+    returns,
+    rf: float = 0.0,
+    periods_per_year: int = 252,
+) -> Dict[str, np.ndarray]:
+    """Metrics for every row of a 2-D return array in one vectorized pass.
+
+    Conventions
+    -----------
+    * `ann_ret` is the arithmetic mean return × `periods_per_year` (the
+      scripts' original definition); `cagr` is the geometric annual return
+      and feeds `calmar`. `sharpe` / `sortino` / `t_stat` use the arithmetic
+      mean of per-period excess returns (`rf` is annual).
+    * `max_dd` is a positive fraction of the running NAV peak and
+      `max_dd_duration` counts periods spent below that peak.
+    * NaN entries are skipped for moments and held flat for the NAV path.
+    """
+    r = np.asarray(returns, dtype=float)
+    squeeze = r.ndim == 1
+    r = np.atleast_2d(r)
+    T = r.shape[1]
+
+    valid = ~np.isnan(r)
+    n = valid.sum(axis=1)
+    r0 = np.where(valid, r, 0.0)
+    rf_p = rf / periods_per_year
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = r0.sum(axis=1) / n
+        dev = np.where(valid, r - mean[:, None], 0.0)
+        std = np.sqrt((dev ** 2).sum(axis=1) / (n - 1))
+        down = np.where(valid, np.minimum(r - rf_p, 0.0), 0.0)
+        down_dev = np.sqrt((down ** 2).sum(axis=1) / n)
+
+        log_nav = np.cumsum(np.log1p(r0), axis=1)
+        cum_ret = np.expm1(log_nav[:, -1]) if T else np.full(len(r), np.nan)
+        ann_ret = mean * periods_per_year
+        cagr = np.expm1(log_nav[:, -1] * periods_per_year / n) if T else cum_ret
+        ann_vol = std * math.sqrt(periods_per_year)
+        sharpe = (mean - rf_p) / std * math.sqrt(periods_per_year)
+        sortino = (mean - rf_p) / down_dev * math.sqrt(periods_per_year)
+        t_stat = mean / (std / np.sqrt(n))
+        hit_rate = (r0 > 0).sum(axis=1) / n
+
+        # 回撤：在 log 空间求峰值，避免再做一次 cumprod
+        peak = np.maximum.accumulate(log_nav, axis=1)
+        dd = -np.expm1(log_nav - peak)
+        max_dd = dd.max(axis=1) if T else np.full(len(r), np.nan)
+        idx = np.arange(T)
+        last_peak = np.maximum.accumulate(np.where(dd <= 0, idx, -1), axis=1)
+        max_dd_duration = (idx - last_peak).max(axis=1) if T else np.zeros(len(r))
+        calmar = cagr / max_dd
+
+    p_value = _two_sided_p(t_stat, n - 1)
+
+    out = dict(
+        ann_ret=ann_ret, cagr=cagr, ann_vol=ann_vol, sharpe=sharpe, sortino=sortino,
+        max_dd=max_dd, max_dd_duration=max_dd_duration.astype(float),
+        t_stat=t_stat, p_value=p_value, hit_rate=hit_rate, calmar=calmar,
+        cum_ret=cum_ret, mean_ret=mean, n_obs=n.astype(float),
+    )
+    for k, v in out.items():                        # 零方差 → NaN 而非 ±inf
+        out[k] = np.where(np.isfinite(v), v, np.nan)
+    if squeeze:
+        return {k: float(v[0]) for k, v in out.items()}
+    return out
+
+
+def _two_sided_p(t_stat: np.ndarray, dof: np.ndarray) -> np.ndarray:
+    from scipy import stats                         # 仅在需要 p 值时加载
+
+    with np.errstate(invalid="ignore"):
+        return 2 * stats.t.sf(np.abs(t_stat), np.where(dof > 0, dof, np.nan))
+
+# ---------------------------------------------------------------------------
+# pandas front-ends
+# ---------------------------------------------------------------------------
+
+def perf_metrics(
+    returns: pd.Series,
+    rf: float = 0.0,
+    periods_per_year: int = 252,
+) -> Dict[str, float]:
+    """Numeric metrics for a single return series."""
+    if isinstance(returns, pd.DataFrame):
+        assert returns.shape[1] == 1, "returns DataFrame must have only one column"
+        returns = returns.squeeze(axis=1)
+    return compute_metrics(np.asarray(returns, dtype=float), rf, periods_per_year)
+
+
+def metrics_frame(
+    returns: pd.DataFrame,
+    rf: float = 0.0,
+    periods_per_year: int = 252,
+) -> pd.DataFrame:
+    """One metrics row per column of a (date × strategy) return table."""
+    met = compute_metrics(returns.to_numpy(dtype=float).T, rf, periods_per_year)
+    return pd.DataFrame(met, index=returns.columns)
+
+# ---------------------------------------------------------------------------
+# Reporting edge
+# ---------------------------------------------------------------------------
+
+_PCT_METRICS = {"ann_ret", "cagr", "max_dd", "hit_rate", "cum_ret", "mean_ret"}
+
+
+def format_metrics(met: Dict[str, float], digits: int = 2) -> Dict[str, str]:
+    """String version of a metrics dict for Markdown / HTML reports."""
+    out = {}
+    for k, v in met.items():
+        if v is None or (isinstance(v, float) and math.isnan(v)):
+            out[k] = "n/a"
+        elif k in _PCT_METRICS:
+            out[k] = f"{v:.{digits}%}"
+        elif k in {"n_obs", "max_dd_duration"}:
+            out[k] = f"{int(v)}"
+        elif k == "p_value":
+            out[k] = f"{v:.4f}"
+        else:
+            out[k] = f"{v:.{digits}f}"
+    return out
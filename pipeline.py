@@ -0,0 +1,355 @@
+#!/usr/bin/env python
+# pipeline.py
+# Coding: UTF-8
+"""
+Dependency-aware runner for the dayN scripts
+============================================
+* 每个脚本声明为一个 `Step`：输入文件、输出文件（可用通配符）、参数、以及经结果库等非文件途径的依赖（after）
+* 依赖图由“谁产出了我的输入”自动推出；互不依赖的分支在线程池中 **并行** 运行（各自是独立子进程）
+* **内容哈希缓存**（`.pipeline_cache.json`）：步骤键 = 脚本源码 + 参数 + 输入文件内容 + after 上游键；
+  键不变且输出未被改动 → 跳过。上游重跑但输出字节不变时，下游同样跳过（early cutoff）
+* `--param top_n=20` 只改变声明了 top_n 的步骤的键 → 只重跑它及其下游
+* 每步的 stdout / stderr 写入 `.pipeline_logs/<step>.log`；子进程使用 Agg 后端，`plt.show()` 不阻塞
+
+不在图中的步骤：`20172018/align.py` / `preprocessing.py` 需要未随仓库提供的原始数据集；
+day13 的 Gemini / HuggingFace 标注需要联网与人工复核 —— 它们的产物
+（`filter_2017_cleaned_aligned_data.csv`、`llm_emotion_type_labeling_samples_labeled_gemini.csv`）作为源文件。
+
+运行示例
+--------
+```bash
+python pipeline.py --list                      # 步骤、依赖、是否需要重跑
+python pipeline.py -j 4                        # 全部目标
+python pipeline.py day5_metrics --param top_n=20
+python pipeline.py --dry_run --force train
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import glob
+import hashlib
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List
+
+ROOT = Path(__file__).resolve().parent
+CACHE_FILE = ROOT / ".pipeline_cache.json"
+LOG_DIR = ROOT / ".pipeline_logs"
+
+# ---------------------------------------------------------------------------
+# Steps
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Step:
+    name: str
+    script: str
+    inputs: tuple = ()
+    outputs: tuple = ()
+    params: Dict[str, object] = field(default_factory=dict)   # 默认值；以 --<name> <value> 传给脚本
+    args: tuple = ()                                          # 固定参数
+    after: tuple = ()                                         # 非文件依赖（如共享的 results.sqlite）
+    code: tuple = ()                                          # 额外纳入哈希的本地模块
+
+    def command(self, overrides: Dict[str, object]) -> List[str]:
+        cmd = [sys.executable, str(ROOT / self.script), *self.args]
+        for k, v in self.resolved(overrides).items():
+            cmd += [f"--{k}", str(v)]
+        return cmd
+
+    def resolved(self, overrides: Dict[str, object]) -> Dict[str, object]:
+        return {k: overrides.get(k, v) for k, v in self.params.items()}
+
+
+ALIGNED = "filter_2017_cleaned_aligned_data.csv"
+PREDS = "tweet_level_preds.csv"
+LABELED = "llm_emotion_type_labeling_samples_labeled_gemini.csv"
+
+STEPS: List[Step] = [
+    Step("train", "day2_sestm_pipeline_delete_noise.py", inputs=(ALIGNED,),
+         outputs=("models/vectorizer.pkl", "models/lda_model.pkl", "models/logreg.pkl", "models/lean/*"),
+         params={"top_k": 5000, "method": "chi2"}, args=("--force_retrain", "--no_visualize"),
+         code=("lean_model.py", "hashed_features.py")),
+    Step("export_signals", "day2_export_signals.py", inputs=(ALIGNED, "models/lean/*"),
+         outputs=(PREDS, "signals.parquet"), code=("tone_model.py", "lean_model.py", "sparse_signals.py")),
+    Step("build_prices", "build_prices_from_cleaned.py", inputs=(ALIGNED,),
+         outputs=("prices.parquet", "prices.obs.parquet")),
+    Step("backtest_vbt", "Day3enhancednew.py", inputs=("signals.parquet", "prices.parquet"),
+         outputs=("grid_results/summary_metrics.csv",), args=("--no-plots",),
+         code=("metrics_kernel.py", "quantile_returns.py", "signal_aggregator.py", "sparse_signals.py",
+               "report_builder.py")),
+    Step("day4_backtest", "day4_simple_backtest.py", inputs=(PREDS, ALIGNED),
+         outputs=("day4_result.csv", "day4_strategy_performance.png"), params={"top_n": 30}),
+    Step("day5_metrics", "day5_metrics_visuals.py", inputs=("day4_result.csv",),
+         outputs=("summary_metrics.csv", "drawdown_plot.png"), code=("metrics_kernel.py",)),
+    Step("day6_topn", "day6_compare_topN.py", inputs=(PREDS, ALIGNED),
+         outputs=("topN_strategy_summary.csv", "compare_topN_returns.png"), code=("metrics_kernel.py",)),
+    Step("day6_topn_truncated", "day6_compare_topN_truncated.py", inputs=(PREDS, ALIGNED),
+         outputs=("topN_strategy_summary_truncated20171231.csv", "compare_topN_returns_truncated20171231.png"),
+         code=("metrics_kernel.py",)),
+    Step("day7_full_vs_truncated", "day7_compare_full_vs_truncated.py", inputs=(PREDS, ALIGNED),
+         outputs=("worst_stocks_post20171231.png", "compare_*_full_vs_truncated.png"),
+         after=("day6_topn", "day6_topn_truncated")),
+    Step("day8_diagnostics", "day8_strategy_diagnostics.py", inputs=(PREDS, ALIGNED),
+         outputs=("diagnostics_log.txt", "signal_distribution.png", "signal_count_timeseries.png")),
+    Step("day9_filtered", "day9_filtered_backtest (1).py", inputs=(PREDS, ALIGNED),
+         outputs=("topN_strategy_summary_filtered_truncated_day9.csv",), code=("metrics_kernel.py",)),
+    Step("day10_diagnostics", "day10_advanced_strategy_analysis.py", inputs=(PREDS, ALIGNED),
+         outputs=("monthly_sharpe_table.csv", "monthly_sharpe.png", "topN_stock_frequency.png")),
+    Step("day11_ic", "day11_ic_and_winrate.py", inputs=(PREDS, ALIGNED),
+         outputs=("ic_summary.csv", "winrate_summary.csv", "winrate_grid.csv", "winrate_by_ticker.csv"),
+         args=("--no-plots",), code=("hit_rates.py",)),
+    Step("day12_t0", "day12_t0_strategy_summary (1).py", inputs=(PREDS, ALIGNED),
+         outputs=("t0_strategy_summary_extended.csv",), args=("--no-plots",),
+         code=("bootstrap_engine.py", "hit_rates.py")),
+    Step("day13_prepare", "day13_prepare_llm_emotion_labeling.py", inputs=(PREDS,),
+         outputs=("llm_emotion_type_labeling_samples.csv",)),
+    Step("emotion_factors", "emotion_factor_analysis.py", inputs=(LABELED,),
+         outputs=("output/factor_summary_*.csv",), args=("--no-plots",), code=("bootstrap_engine.py",)),
+    Step("alpha_radar", "alpha_radar_analysis.py", inputs=(LABELED,),
+         outputs=("metrics_by_label.csv", "alpha_radar.png")),
+    Step("alpha_radar_significance", "alpha_radar_analysis_significance.py", inputs=(LABELED,),
+         outputs=("output/metrics_by_label_*.csv", "output/tone_quantiles_*.csv"),
+         code=("bootstrap_engine.py",)),
+    Step("latex_multihorizon", "Latex_multihorizon.py", inputs=("output/metrics_by_label_*.csv",),
+         outputs=("merged_latex_table2.tex",)),
+    Step("latex_topn_combined", "latex_strategy_combined_topN.py",
+         inputs=(PREDS, ALIGNED, "topN_strategy_summary.csv"), outputs=("strategy_combined_topN.pdf",)),
+    Step("latex_topn_sensitivity", "latex_compare_topn_sensitivity_plot.py",
+         outputs=("topN_sensitivity_plot.png",), after=("day6_topn",)),
+]
+
+# ---------------------------------------------------------------------------
+# 哈希
+# ---------------------------------------------------------------------------
+
+class FileHashes:
+    """sha1 per file, re-read only when (mtime_ns, size) changes; globs expand to sorted matches."""
+
+    def __init__(self, cached: Dict[str, list]):
+        self.cached = cached
+
+    def file(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path.relative_to(ROOT))
+        hit = self.cached.get(key)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        h = hashlib.sha1()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        self.cached[key] = [st.st_mtime_ns, st.st_size, h.hexdigest()]
+        return h.hexdigest()
+
+    def pattern(self, pattern: str) -> Dict[str, str] | None:
+        """{relative path: hash} for a file or glob; None when nothing matches."""
+        matches = sorted(p for p in map(Path, glob.glob(str(ROOT / pattern))) if p.is_file())
+        if not matches:
+            return None
+        return {str(p.relative_to(ROOT)): self.file(p) for p in matches}
+
+
+def _digest(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+# ---------------------------------------------------------------------------
+# Graph
+# ---------------------------------------------------------------------------
+
+class Pipeline:
+    def __init__(self, steps: Iterable[Step], overrides: Dict[str, object] | None = None,
+                 cache_path: Path = CACHE_FILE):
+        self.steps = {s.name: s for s in steps}
+        self.overrides = overrides or {}
+        self.cache_path = cache_path
+        cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+        self.cache = {"steps": cache.get("steps", {}), "files": cache.get("files", {})}
+        self.hashes = FileHashes(self.cache["files"])
+        self.deps = self._dependencies()
+
+    def _dependencies(self) -> Dict[str, List[str]]:
+        producer = {}
+        for s in self.steps.values():
+            for out in s.outputs:
+                producer[out] = s.name
+        deps = {}
+        for s in self.steps.values():
+            found = [producer[i] for i in s.inputs if i in producer and producer[i] != s.name]
+            deps[s.name] = list(dict.fromkeys([*found, *s.after]))
+            unknown = [d for d in deps[s.name] if d not in self.steps]
+            if unknown:
+                raise KeyError(f"{s.name}: unknown dependency {unknown}")
+        return deps
+
+    def closure(self, targets: Iterable[str]) -> List[str]:
+        """Targets plus everything upstream, in topological order."""
+        order, seen = [], set()
+
+        def visit(name, path=()):
+            if name in path:
+                raise ValueError(f"cycle: {' → '.join((*path, name))}")
+            if name in seen:
+                return
+            for dep in self.deps[name]:
+                visit(dep, (*path, name))
+            seen.add(name)
+            order.append(name)
+
+        for t in targets:
+            if t not in self.steps:
+                raise KeyError(f"unknown step {t!r}")
+            visit(t)
+        return order
+
+    # ---------------- 缓存 ---------------- #
+    def key(self, name: str) -> str | None:
+        """Content key of a step, or None when an input is missing."""
+        s = self.steps[name]
+        inputs = {}
+        for pattern in s.inputs:
+            found = self.hashes.pattern(pattern)
+            if found is None:
+                return None
+            inputs.update(found)
+        code = {c: self.hashes.pattern(c) for c in (s.script, *s.code)}
+        upstream = {d: self.cache["steps"].get(d, {}).get("key") for d in s.after}
+        return _digest({"code": code, "args": s.args, "params": s.resolved(self.overrides),
+                        "inputs": inputs, "after": upstream})
+
+    def is_fresh(self, name: str, key: str | None) -> bool:
+        rec = self.cache["steps"].get(name)
+        if key is None or rec is None or rec["key"] != key:
+            return False
+        for pattern in self.steps[name].outputs:           # 输出被删除 / 手工改动也算过期
+            if self.hashes.pattern(pattern) != rec["outputs"].get(pattern):
+                return False
+        return True
+
+    def record(self, name: str, key: str, seconds: float):
+        outputs = {p: self.hashes.pattern(p) for p in self.steps[name].outputs}
+        self.cache["steps"][name] = {"key": key, "outputs": outputs, "seconds": round(seconds, 2),
+                                     "finished": time.strftime("%Y-%m-%dT%H:%M:%S")}
+
+    def save(self):
+        tmp = self.cache_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.cache, indent=1))
+        os.replace(tmp, self.cache_path)
+
+    # ---------------- 执行 ---------------- #
+    def _execute(self, name: str) -> tuple[int, float]:
+        LOG_DIR.mkdir(exist_ok=True)
+        env = {**os.environ, "MPLBACKEND": "Agg"}
+        logging.info("▶ %s", name)
+        t0 = time.perf_counter()
+        with open(LOG_DIR / f"{name}.log", "w", encoding="utf-8") as log:
+            rc = subprocess.run(self.steps[name].command(self.overrides), cwd=ROOT, env=env,
+                                stdout=log, stderr=subprocess.STDOUT).returncode
+        return rc, time.perf_counter() - t0
+
+    def run(self, targets: Iterable[str], jobs: int = 1, force: Iterable[str] = (),
+            dry_run: bool = False) -> Dict[str, str]:
+        """Run stale steps in dependency order; returns {step: status}."""
+        order = self.closure(targets)
+        force = set(force)
+        status: Dict[str, str] = {}
+        pending = list(order)
+        running: Dict[Future, tuple[str, str]] = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+            while pending or running:
+                for name in list(pending):
+                    deps = self.deps[name]
+                    if any(status.get(d) in ("failed", "blocked") for d in deps):
+                        status[name] = "blocked"
+                        pending.remove(name)
+                        logging.warning("✗ %s：上游失败，跳过", name)
+                        continue
+                    if not all(d in status for d in deps):
+                        continue
+                    pending.remove(name)
+                    if dry_run and any(status[d] == "would run" for d in deps):
+                        status[name] = "would run"            # 上游输出未知 → 保守地视为过期
+                        continue
+                    key = self.key(name)
+                    if key is None:
+                        status[name] = "failed"
+                        missing = [p for p in self.steps[name].inputs if self.hashes.pattern(p) is None]
+                        logging.error("✗ %s：缺少输入 %s", name, missing)
+                    elif name not in force and self.is_fresh(name, key):
+                        status[name] = "cached"
+                        logging.info("· %s：缓存命中", name)
+                    elif dry_run:
+                        status[name] = "would run"
+                    else:
+                        running[pool.submit(self._execute, name)] = (name, key)
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name, key = running.pop(fut)
+                    rc, seconds = fut.result()
+                    missing = [p for p in self.steps[name].outputs if self.hashes.pattern(p) is None]
+                    if rc != 0 or missing:
+                        status[name] = "failed"
+                        self.cache["steps"].pop(name, None)
+                        logging.error("✗ %s（%.1fs）：%s，日志 %s", name, seconds,
+                                      f"exit {rc}" if rc else f"未生成 {missing}", LOG_DIR / f"{name}.log")
+                    else:
+                        status[name] = "ran"
+                        self.record(name, key, seconds)
+                        logging.info("✔ %s（%.1fs）", name, seconds)
+                    self.save()
+        if not dry_run:
+            self.save()
+        return status
+
+
+def _parse_param(text: str):
+    key, _, value = text.partition("=")
+    for cast in (int, float):
+        try:
+            return key, cast(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    ap = argparse.ArgumentParser(description="Run the dayN scripts as a cached dependency graph")
+    ap.add_argument("targets", nargs="*", help="目标步骤（默认全部）；自动包含上游")
+    ap.add_argument("-j", "--jobs", type=int, default=min(4, os.cpu_count() or 1), help="并行步骤数")
+    ap.add_argument("--param", action="append", default=[], help="覆盖步骤参数，如 top_n=20，可重复")
+    ap.add_argument("--force", action="append", default=[], help="无视缓存重跑该步骤（下游按内容哈希决定）")
+    ap.add_argument("--dry_run", action="store_true", help="只列出将要运行的步骤")
+    ap.add_argument("--list", action="store_true", help="列出步骤、依赖与缓存状态")
+    args = ap.parse_args()
+
+    pipe = Pipeline(STEPS, dict(_parse_param(p) for p in args.param))
+    targets = args.targets or list(pipe.steps)
+    if args.list:
+        for name in pipe.closure(targets):
+            fresh = pipe.is_fresh(name, pipe.key(name))
+            print(f"{name:<28}{'cached' if fresh else 'stale':<8}← {', '.join(pipe.deps[name]) or '-'}")
+        return
+
+    status = pipe.run(targets, jobs=args.jobs, force=args.force, dry_run=args.dry_run)
+    counts = {s: sum(v == s for v in status.values()) for s in dict.fromkeys(status.values())}
+    print(json.dumps({"status": status, "counts": counts}, ensure_ascii=False, indent=1))
+    if any(v in ("failed", "blocked") for v in status.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# plot_queue.py
+# Coding: UTF-8
+"""
+Deferred figure queue
+=====================
+* 计算代码只生成轻量的 `PlotSpec`（图类型 + NumPy 数据 + 标题等选项），不触碰 matplotlib
+* `PlotQueue` 把 spec 交给进程池，用 Agg 后端 **与计算并行** 渲染 PNG；`close()` 等待全部落盘
+* `enabled=False`（脚本的 `--no-plots`）时所有绘图调用都是空操作 —— 批量扫描不再被图片 I/O 拖慢
+* `workers=0`：不开进程，计算结束后在本进程串行渲染（调试 / 受限环境）
+
+示例
+----
+```python
+with PlotQueue(enabled=not args.no_plots) as plots:
+    plots.line("daily_ic.png", {"IC": daily_ic}, title="Daily IC", grid=True)
+    plots.hist("ret.png", returns, bins=30, kde=True)
+    plots.bar("sharpe.png", labels, sharpe, orient="h")
+```
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# ---------------------------------------------------------------------------
+# Spec
+# ---------------------------------------------------------------------------
+
+@dataclass
+class PlotSpec:
+    kind: str                       # "line" / "hist" / "bar" / "box"
+    path: str
+    data: Dict[str, object]
+    opts: Dict[str, object] = field(default_factory=dict)
+
+
+def _x_values(index) -> np.ndarray:
+    """Index → plain array matplotlib can place (Period → Timestamp)."""
+    if isinstance(index, pd.PeriodIndex):
+        index = index.to_timestamp()
+    return np.asarray(index)
+
+
+def _series_data(series) -> Dict[str, tuple]:
+    """{label: Series} / DataFrame / Series → {label: (x, y)} of NumPy arrays."""
+    if isinstance(series, pd.DataFrame):
+        series = {str(c): series[c] for c in series.columns}
+    elif isinstance(series, pd.Series):
+        series = {str(series.name or ""): series}
+    out = {}
+    for label, s in series.items():
+        if isinstance(s, tuple):
+            out[label] = (np.asarray(s[0]), np.asarray(s[1], dtype=float))
+        else:
+            out[label] = (_x_values(s.index), s.to_numpy(dtype=float))
+    return out
+
+# ---------------------------------------------------------------------------
+# 渲染（子进程内执行）
+# ---------------------------------------------------------------------------
+
+_RENDERERS: Dict[str, Callable] = {}
+
+
+def renderer(kind: str):
+    def register(fn):
+        _RENDERERS[kind] = fn
+        return fn
+    return register
+
+
+def _seaborn():
+    try:
+        import seaborn as sns
+    except ImportError:             # seaborn 缺失时退回纯 matplotlib
+        return None
+    return sns
+
+
+@renderer("line")
+def _render_line(ax, data, opts):
+    for label, (x, y) in data["series"].items():
+        ax.plot(x, y, label=label or None)
+    if opts.get("hline") is not None:
+        ax.axhline(opts["hline"], color="black", linestyle="--")
+    if opts.get("legend", len(data["series"]) > 1):
+        ax.legend()
+
+
+@renderer("hist")
+def _render_hist(ax, data, opts):
+    values, bins = data["values"], opts.get("bins", 30)
+    sns = _seaborn()
+    if sns is not None:
+        sns.histplot(values, kde=opts.get("kde", False), bins=bins, ax=ax)
+        return
+    counts, edges, _ = ax.hist(values, bins=bins)
+    if opts.get("kde") and len(values) > 1:
+        from scipy.stats import gaussian_kde
+
+        grid = np.linspace(edges[0], edges[-1], 200)
+        ax.plot(grid, gaussian_kde(values)(grid) * len(values) * (edges[1] - edges[0]))
+    ax.set_ylabel("Count")
+
+
+@renderer("bar")
+def _render_bar(ax, data, opts):
+    labels, values = data["labels"], data["values"]
+    horizontal = opts.get("orient", "v") == "h"
+    sns = _seaborn()
+    if sns is not None:
+        kw = {"x": values, "y": labels} if horizontal else {"x": labels, "y": values}
+        if opts.get("color"):
+            kw["color"] = opts["color"]
+        sns.barplot(ax=ax, order=list(labels), **kw)
+        return
+    pos = np.arange(len(labels))
+    if horizontal:
+        ax.barh(pos, values, color=opts.get("color"))
+        ax.set_yticks(pos, labels)
+        ax.invert_yaxis()                       # 与 seaborn 一致：第一个类别在最上方
+    else:
+        ax.bar(pos, values, color=opts.get("color"))
+        ax.set_xticks(pos, labels)
+
+
+@renderer("box")
+def _render_box(ax, data, opts):
+    groups, values = data["groups"], data["values"]
+    order = data.get("order") or sorted(pd.unique(groups))
+    sns = _seaborn()
+    if sns is not None:
+        sns.boxplot(x=groups, y=values, order=order, ax=ax)
+        return
+    ax.boxplot([values[groups == g] for g in order])
+    ax.set_xticks(np.arange(1, len(order) + 1), order)      # boxplot 的 labels 参数各版本不一致
+
+
+def render(spec: PlotSpec) -> str:
+    """Draw one spec to its PNG with the Agg backend; returns the path."""
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    opts = spec.opts
+    fig, ax = plt.subplots(figsize=opts.get("figsize", (10, 4)))
+    try:
+        _RENDERERS[spec.kind](ax, spec.data, opts)
+        for key, setter in (("title", ax.set_title), ("xlabel", ax.set_xlabel),
+                            ("ylabel", ax.set_ylabel)):
+            if opts.get(key) is not None:
+                setter(opts[key])
+        if opts.get("grid"):
+            ax.grid()
+        fig.tight_layout()
+        Path(spec.path).parent.mkdir(parents=True, exist_ok=True)
+        fig.savefig(spec.path, dpi=opts.get("dpi", 100))
+    finally:
+        plt.close(fig)
+    return spec.path
+
+
+def _init_worker():
+    os.environ["MPLBACKEND"] = "Agg"
+
+# ---------------------------------------------------------------------------
+# Queue
+# ---------------------------------------------------------------------------
+
+class PlotQueue:
+    """Collect plot specs and render them in a process pool.
+
+    Specs are submitted as soon as they are added, so figures are drawn while
+    the caller keeps computing; `close()` waits for the pool and logs any
+    figure that failed without aborting the others.
+    """
+
+    def __init__(self, enabled: bool = True, workers: int | None = None):
+        self.enabled = enabled
+        self.workers = min(4, os.cpu_count() or 1) if workers is None else workers
+        self._pool: ProcessPoolExecutor | None = None
+        self._pending: List[PlotSpec] = []
+        self._futures: List[tuple[PlotSpec, Future]] = []
+        self.written: List[str] = []
+        self.failed: List[str] = []
+
+    # ---------------- 提交 ---------------- #
+    def submit(self, spec: PlotSpec) -> None:
+        if not self.enabled:
+            return
+        if spec.kind not in _RENDERERS:
+            raise ValueError(f"unknown plot kind: {spec.kind}")
+        if self.workers <= 0:
+            self._pending.append(spec)
+            return
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        self._futures.append((spec, self._pool.submit(render, spec)))
+
+    def line(self, path, series, **opts) -> None:
+        """Line chart; `series` is a Series, a DataFrame or {label: Series | (x, y)}."""
+        if self.enabled:
+            self.submit(PlotSpec("line", str(path), {"series": _series_data(series)}, opts))
+
+    def hist(self, path, values, **opts) -> None:
+        if self.enabled:
+            values = np.asarray(values, dtype=float)
+            self.submit(PlotSpec("hist", str(path), {"values": values[~np.isnan(values)]}, opts))
+
+    def bar(self, path, labels, values, **opts) -> None:
+        if self.enabled:
+            self.submit(PlotSpec("bar", str(path), {"labels": [str(l) for l in labels],
+                                                    "values": np.asarray(values, dtype=float)}, opts))
+
+    def box(self, path, groups, values, order=None, **opts) -> None:
+        if self.enabled:
+            groups = np.asarray(groups, dtype=object)
+            values = np.asarray(values, dtype=float)
+            keep = ~pd.isna(groups) & ~np.isnan(values)
+            self.submit(PlotSpec("box", str(path), {"groups": groups[keep], "values": values[keep],
+                                                    "order": list(order) if order is not None else None},
+                                 opts))
+
+    # ---------------- 收尾 ---------------- #
+    def close(self) -> List[str]:
+        """Wait for every figure; returns the written paths."""
+        for spec in self._pending:
+            self._record(spec, lambda s=spec: render(s))
+        self._pending.clear()
+        for spec, fut in self._futures:
+            self._record(spec, fut.result)
+        self._futures.clear()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        return self.written
+
+    def _record(self, spec: PlotSpec, get: Callable[[], str]):
+        try:
+            self.written.append(get())
+        except Exception as e:                 # 单张图失败不影响其余图与计算结果
+            logging.warning("绘图失败 %s: %s", spec.path, e)
+            self.failed.append(spec.path)
+
+    def __enter__(self) -> "PlotQueue":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+
+def add_plot_args(parser) -> None:
+    """`--no-plots` / `--plot_workers` shared by the analysis scripts."""
+    parser.add_argument("--no-plots", dest="no_plots", action="store_true",
+                        help="跳过所有绘图（批量扫描用）")
+    parser.add_argument("--plot_workers", type=int, default=None,
+                        help="绘图进程数（默认 min(4, CPU)；0 = 计算结束后本进程串行渲染）")
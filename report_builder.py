@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# report_builder.py
+# Coding: UTF-8
+"""
+Incremental grid report builder
+===============================
+* 报告只从 **结果库**（results_store）和已渲染的图片生成 —— 重新出报告不必重跑回测
+* 报告拆成若干 section：总览表 + 每个网格点一页（`<run_dir>/summary.md|html`）
+* 每个 section 的输入（参数、指标、图片内容）计算内容哈希，与 `.report_cache.json` 比对，
+  只重建哈希变化的 section；未变化的直接复用缓存片段
+* 图片哈希按 (mtime_ns, size) 缓存，文件未变时不重读
+
+运行示例
+--------
+```bash
+python report_builder.py --experiment vectorbt --out grid_results \\
+       --filter cost_bps=10 --filter weight_scheme=equal
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import html
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+
+from metrics_kernel import format_metrics
+from results_store import DEFAULT_DB, ResultsStore
+
+TEMPLATE_VERSION = 1                 # 改动版式时 +1 → 全部 section 重建
+CACHE_FILE = ".report_cache.json"
+FRAGMENT_DIR = ".report_cache"
+
+# ---------------------------------------------------------------------------
+# 哈希
+# ---------------------------------------------------------------------------
+
+def _digest(obj) -> str:
+    return hashlib.sha1(json.dumps(obj, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _FigureHashes:
+    """Content hash per figure, re-read only when (mtime_ns, size) changes."""
+
+    def __init__(self, cached: Dict[str, list]):
+        self.cached = cached
+
+    def __call__(self, path: Path) -> str:
+        st = path.stat()
+        key = str(path)
+        hit = self.cached.get(key)
+        if hit and hit[0] == st.st_mtime_ns and hit[1] == st.st_size:
+            return hit[2]
+        digest = hashlib.sha1(path.read_bytes()).hexdigest()
+        self.cached[key] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+# ---------------------------------------------------------------------------
+# 渲染
+# ---------------------------------------------------------------------------
+
+def _page(title: str, body: str) -> str:
+    return (f"<html><head><meta charset='utf-8'><title>{html.escape(title)}</title></head>"
+            f"<body>{body}</body></html>")
+
+
+def render_run(title: str, params: Dict, metrics: Dict[str, float], figures: List[str]):
+    """(markdown, html) for one grid point."""
+    fmt = format_metrics(metrics)
+    md = [f"# {title}\n", "## Parameters"]
+    md += [f"- **{k}**: {v}" for k, v in params.items()]
+    md += ["", "## Key Metrics"]
+    md += [f"- **{k}**: {v}" for k, v in fmt.items()]
+    if figures:
+        md += ["", "## Charts"]
+        md += [f"![{Path(f).stem}](./{f})" for f in figures]
+
+    items = lambda d: "".join(f"<li><b>{html.escape(str(k))}</b>: {html.escape(str(v))}</li>"  # noqa: E731
+                              for k, v in d.items())
+    body = (f"<h1>{html.escape(title)}</h1><h2>Parameters</h2><ul>{items(params)}</ul>"
+            f"<h2>Key Metrics</h2><ul>{items(fmt)}</ul>")
+    if figures:
+        body += "<h2>Charts</h2>" + "".join(
+            f"<p><img src='./{html.escape(f)}' alt='{html.escape(Path(f).stem)}'></p>" for f in figures)
+    return "\n".join(md) + "\n", _page(title, body)
+
+
+def render_overview(table: pd.DataFrame, title: str) -> str:
+    return f"<h1>{html.escape(title)}</h1>" + table.to_html(index=False, escape=True)
+
+# ---------------------------------------------------------------------------
+# Builder
+# ---------------------------------------------------------------------------
+
+def build_grid_report(
+    experiment: str = "vectorbt",
+    out_root: str | Path = "grid_results",
+    results_db: str | Path = DEFAULT_DB,
+    run_dir: str = "topn_{top_n}",
+    title: str = "Grid Backtest Summary",
+    **param_filters,
+) -> Dict[str, object]:
+    """Render `<out_root>/grid_summary.html` and each run page from the store.
+
+    `run_dir` is formatted with each run's parameters to locate its figures
+    and page; `param_filters` are passed to `ResultsStore.query` (latest data
+    version only). Returns which sections were rebuilt.
+    """
+    t0 = time.perf_counter()
+    out_root = Path(out_root)
+    out_root.mkdir(parents=True, exist_ok=True)
+    frag_dir = out_root / FRAGMENT_DIR
+    frag_dir.mkdir(exist_ok=True)
+
+    with ResultsStore(results_db) as store:
+        runs = store.query(experiment, latest_version=True, **param_filters)
+        param_cols = [c for c in store.names("param") if c in runs.columns]
+        metric_cols = [c for c in store.names("metric") if c in runs.columns]
+
+    cache_path = out_root / CACHE_FILE
+    cache = json.loads(cache_path.read_text()) if cache_path.exists() else {}
+    if cache.get("template") != TEMPLATE_VERSION:
+        cache = {"template": TEMPLATE_VERSION, "sections": {}, "figures": {}}
+    fig_hash = _FigureHashes(cache["figures"])
+    sections, rebuilt = {}, []
+
+    # ---------------- 每个网格点一页 ---------------- #
+    overview_rows, links = [], []
+    for _, row in runs.iterrows():
+        params = {c: _param_text(row[c]) for c in param_cols if pd.notna(row[c])}
+        metrics = {c: row[c] for c in metric_cols if pd.notna(row[c])}
+        rel = run_dir.format(**params)
+        page_dir = out_root / rel
+        figures = sorted(p.name for p in page_dir.glob("*.png")) if page_dir.is_dir() else []
+
+        section_id = rel.replace("/", "__")
+        digest = _digest({"params": params, "metrics": metrics,
+                          "figures": {f: fig_hash(page_dir / f) for f in figures}})
+        sections[section_id] = digest
+        if cache["sections"].get(section_id) != digest or not (page_dir / "summary.html").exists():
+            md, page = render_run(f"{title} — {rel}", params, metrics, figures)
+            page_dir.mkdir(parents=True, exist_ok=True)
+            (page_dir / "summary.md").write_text(md, encoding="utf-8")
+            (page_dir / "summary.html").write_text(page, encoding="utf-8")
+            rebuilt.append(section_id)
+
+        overview_rows.append({**params, **format_metrics(metrics)})
+        links.append(f"<li><a href='{html.escape(rel)}/summary.html'>{html.escape(rel)}</a></li>")
+
+    # ---------------- 总览表 ---------------- #
+    overview = pd.DataFrame(overview_rows)
+    overview_digest = _digest(overview_rows)
+    frag = frag_dir / "overview.html"
+    if cache["sections"].get("overview") != overview_digest or not frag.exists():
+        frag.write_text(render_overview(overview, title), encoding="utf-8")
+        rebuilt.append("overview")
+    sections["overview"] = overview_digest
+
+    index = _page(title, frag.read_text(encoding="utf-8")
+                  + "<h2>Individual Reports</h2><ul>" + "".join(links) + "</ul>")
+    index_path = out_root / "grid_summary.html"
+    if not index_path.exists() or index_path.read_text(encoding="utf-8") != index:
+        index_path.write_text(index, encoding="utf-8")
+
+    cache["sections"] = sections                # 已删除的网格点随之移出缓存
+    cache_path.write_text(json.dumps(cache, indent=1))
+    stats = {"runs": len(runs), "rebuilt": rebuilt, "reused": len(sections) - len(rebuilt),
+             "seconds": round(time.perf_counter() - t0, 3)}
+    logging.info("报告 %s：重建 %d / %d 个 section（%.3fs）", index_path,
+                 len(rebuilt), len(sections), stats["seconds"])
+    return stats
+
+
+def _param_text(v):
+    """Plain Python value; integral floats (10.0 from a NULL-padded column) become ints."""
+    v = v.item() if hasattr(v, "item") else v
+    if isinstance(v, float) and v.is_integer():
+        return int(v)
+    return v
+
+
+def _parse_filter(text: str):
+    key, _, value = text.partition("=")
+    for cast in (int, float):
+        try:
+            return key, cast(value)
+        except ValueError:
+            pass
+    return key, value
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    ap = argparse.ArgumentParser(description="Rebuild grid reports from the results store")
+    ap.add_argument("--experiment", default="vectorbt")
+    ap.add_argument("--out", default="grid_results")
+    ap.add_argument("--results_db", default=DEFAULT_DB)
+    ap.add_argument("--run_dir", default="topn_{top_n}", help="网格点子目录模板（按参数格式化）")
+    ap.add_argument("--filter", action="append", default=[], help="参数过滤，如 cost_bps=10，可重复")
+    args = ap.parse_args()
+
+    stats = build_grid_report(args.experiment, args.out, args.results_db, args.run_dir,
+                              **dict(_parse_filter(f) for f in args.filter))
+    print(json.dumps(stats, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# results_store.py
+# Coding: UTF-8
+"""
+Columnar results store for back-test runs
+=========================================
+* 单个 SQLite 文件 (`results.sqlite`)，无需额外依赖
+* 每次回测按 (experiment, 参数, 数据版本) 生成唯一 run_key，重复运行覆盖旧结果
+* 参数与指标都是宽表里的真实列（首次出现时自动加列）→ 万级参数组合的查询仍为毫秒级
+* 对比 / 报告脚本直接 `query()`，不再按文件名拼接各个 CSV
+* 写入在 `BEGIN IMMEDIATE` 事务内完成（含自动加列），多进程并行写同一个库是安全的；
+  `python results_store.py --stress 8` 用 8 个进程同时写一个新库做自检
+
+示例
+----
+```python
+store = ResultsStore()
+store.append("topN_daily_ls", {"top_n": 10, "period": "full"}, met,
+             data_version=data_version("tweet_level_preds.csv"))
+df = store.query("topN_daily_ls", period="full", latest_version=True)
+```
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Tuple
+
+import pandas as pd
+
+DEFAULT_DB = "results.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_key      TEXT PRIMARY KEY,
+    experiment   TEXT NOT NULL,
+    data_version TEXT NOT NULL,
+    params       TEXT NOT NULL,
+    created_at   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_exp ON runs (experiment, data_version, created_at);
+"""
+_PARAM, _METRIC = "param.", "metric."
+
+# ---------------------------------------------------------------------------
+# Keys & versions
+# ---------------------------------------------------------------------------
+
+def data_version(*paths: str | Path, chunk_size: int = 1 << 20) -> str:
+    """Short content hash of the input files (missing files hash as such)."""
+    h = hashlib.sha1()
+    for p in paths:
+        p = Path(p)
+        h.update(p.name.encode())
+        if not p.exists():
+            h.update(b"<missing>")
+            continue
+        with open(p, "rb") as f:
+            for block in iter(lambda: f.read(chunk_size), b""):
+                h.update(block)
+    return h.hexdigest()[:12]
+
+
+def _canonical(params: Dict) -> str:
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def run_key(experiment: str, params: Dict, version: str) -> str:
+    return hashlib.sha1(f"{experiment}|{version}|{_canonical(params)}".encode()).hexdigest()
+
+
+def _as_float(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(v) else v
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+class ResultsStore:
+    """Upsert-by-run_key store; parameters and metrics are real columns.
+
+    新参数 / 新指标第一次出现时自动 `ALTER TABLE ADD COLUMN`，
+    查询就是对一张宽表的单次 SELECT，不需要 JSON 解析或长表透视。
+    """
+
+    def __init__(self, path: str | Path = DEFAULT_DB):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")     # 并行回测同时写入
+        self.conn.executescript(_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _columns(self) -> set[str]:
+        return {row[1] for row in self.conn.execute("PRAGMA table_info(runs)")}
+
+    def _ensure_columns(self, names: Iterable[str]):
+        """Add missing columns; call inside a `BEGIN IMMEDIATE` transaction (see `append_many`)."""
+        existing = self._columns()
+        for name in dict.fromkeys(names):
+            if name not in existing:
+                decl = "REAL" if name.startswith(_METRIC) else ""
+                self.conn.execute(f"ALTER TABLE runs ADD COLUMN {_quote(name)} {decl}")
+
+    # ---------------- 写入 ---------------- #
+    def append(
+        self,
+        experiment: str,
+        params: Dict,
+        metrics: Dict[str, float],
+        data_version: str = "",
+    ) -> str:
+        return self.append_many(experiment, [(params, metrics)], data_version)[0]
+
+    def append_many(
+        self,
+        experiment: str,
+        rows: Iterable[Tuple[Dict, Dict[str, float]]],
+        data_version: str = "",
+    ) -> list[str]:
+        """Write many runs in one transaction (a whole sweep at once)."""
+        now = time.time()
+        records = []
+        for params, metrics in rows:
+            params = {str(k): _as_param(v) for k, v in params.items()}
+            rec = {
+                "run_key": run_key(experiment, params, data_version),
+                "experiment": experiment,
+                "data_version": data_version,
+                "params": _canonical(params),
+                "created_at": now,
+            }
+            rec.update({_PARAM + k: v for k, v in params.items()})
+            rec.update({_METRIC + str(k): _as_float(v) for k, v in metrics.items()})
+            records.append(rec)
+        if not records:
+            return []
+
+        with self.conn:
+            # 先拿写锁再读列：否则两个进程都看到列缺失，后 ALTER 的一个报 duplicate column name
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._ensure_columns(k for rec in records for k in rec)
+            # 同一批次的列集合可能不同 → 按列集合分组 executemany
+            groups: Dict[tuple, list] = {}
+            for rec in records:
+                groups.setdefault(tuple(rec), []).append(tuple(rec.values()))
+            for cols, values in groups.items():
+                self.conn.executemany(
+                    f"INSERT OR REPLACE INTO runs ({', '.join(map(_quote, cols))}) "
+                    f"VALUES ({', '.join('?' * len(cols))})", values)
+        return [rec["run_key"] for rec in records]
+
+    # ---------------- 查询 ---------------- #
+    def query(
+        self,
+        experiment: str | None = None,
+        data_version: str | None = None,
+        latest_version: bool = False,
+        **param_filters,
+    ) -> pd.DataFrame:
+        """One row per run: parameters and metrics as columns.
+
+        `param_filters` match parameter values, e.g. ``top_n=10``. With
+        `latest_version=True` only the most recently written data version of
+        each experiment is returned.
+        """
+        where, args = [], []
+        if experiment is not None:
+            where.append("experiment = ?")
+            args.append(experiment)
+        if data_version is not None:
+            where.append("data_version = ?")
+            args.append(data_version)
+        if latest_version:
+            where.append(
+                "(experiment, data_version) IN (SELECT experiment, data_version FROM "
+                "(SELECT experiment, data_version, MAX(created_at) FROM runs GROUP BY experiment))")
+        columns = self._columns()
+        for name, value in param_filters.items():
+            if _PARAM + name not in columns:
+                raise KeyError(f"unknown parameter {name!r}")
+            where.append(f"{_quote(_PARAM + name)} = ?")
+            args.append(_as_param(value))
+        clause = f"WHERE {' AND '.join(where)}" if where else ""
+
+        df = pd.read_sql_query(f"SELECT * FROM runs {clause} ORDER BY created_at",
+                               self.conn, params=args)
+        df = df.drop(columns="params").dropna(axis=1, how="all")
+        return df.rename(columns=lambda c: c.split(".", 1)[1]
+                         if c.startswith((_PARAM, _METRIC)) else c)
+
+    def names(self, kind: str = "metric") -> list[str]:
+        """Parameter (`kind="param"`) or metric names known to the store."""
+        prefix = {"param": _PARAM, "metric": _METRIC}[kind]
+        return sorted(c[len(prefix):] for c in self._columns() if c.startswith(prefix))
+
+    def experiments(self) -> pd.DataFrame:
+        return pd.read_sql_query(
+            "SELECT experiment, data_version, COUNT(*) AS n_runs, MAX(created_at) AS last_run "
+            "FROM runs GROUP BY experiment, data_version ORDER BY last_run DESC", self.conn)
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _as_param(v):
+    if hasattr(v, "item") and getattr(v, "ndim", 1) == 0:     # numpy 标量
+        v = v.item()
+    if isinstance(v, (bool, int, float, str)) or v is None:
+        return v
+    return json.dumps(v, default=str)
+
+
+# ---------------------------------------------------------------------------
+# 多进程写入自检
+# ---------------------------------------------------------------------------
+
+def _stress_worker(args: Tuple[str, int, int]) -> int:
+    path, worker, n_runs = args
+    with ResultsStore(path) as store:
+        for i in range(n_runs):
+            # 每个进程都带上新参数 / 新指标 → 并发触发自动加列
+            store.append("stress", {"worker": worker, "i": i, "top_n": i % 5, f"p{i % 3}": i},
+                         {"sharpe": i / 10, f"m{worker % 4}": float(worker)})
+    return n_runs
+
+
+def stress_test(path: str | Path, processes: int = 8, n_runs: int = 20) -> int:
+    """Append from `processes` concurrent processes; raises on any failed write."""
+    from multiprocessing import Pool
+
+    with Pool(processes) as pool:
+        written = sum(pool.map(_stress_worker, [(str(path), w, n_runs) for w in range(processes)]))
+    with ResultsStore(path) as store:
+        stored = len(store.query("stress"))
+    if stored != written:
+        raise RuntimeError(f"wrote {written} runs but the store holds {stored}")
+    return stored
+
+
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+
+    ap = argparse.ArgumentParser(description="Results store: list experiments or run a concurrency self-check")
+    ap.add_argument("--db", default=DEFAULT_DB)
+    ap.add_argument("--stress", type=int, default=0, metavar="N", help="N 个进程同时写一个临时新库")
+    args = ap.parse_args()
+
+    if args.stress:
+        with tempfile.TemporaryDirectory() as tmp:
+            n = stress_test(Path(tmp) / "stress.sqlite", args.stress)
+        print(f"✅ {args.stress} 个进程并发写入 {n} 条，无丢失")
+    else:
+        with ResultsStore(args.db) as store:
+            print(store.experiments().to_string(index=False))
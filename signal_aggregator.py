@@ -0,0 +1,320 @@
+#!/usr/bin/env python
+# signal_aggregator.py
+# Coding: UTF-8
+"""
+Incremental daily signal aggregator
+===================================
+* 按 (日期, 股票) 维护 running sum / count —— NumPy 二维数组 + 股票→列号字典，
+  新推文到达只做一次 `np.add.at`，不再对全历史 `groupby().mean().unstack()`
+* `current_row()` 随时发布当日（或任一未收盘日期）的信号行
+* 收盘日期以 **单日分片** 追加到信号数据集目录：`signals.parquet/part-YYYY-MM-DD.parquet`
+  Parquet 文件无法原地追加，因此历史分片一经写入不再改动；
+  分片为长表 (DATE, TICKER, SIGNAL)：各分片 schema 一致，整个目录一次 `read_table` 读完
+* `read_signals()` 读取目录（或单文件：长表 / 旧版宽表）并还原为日期 × 股票宽表；
+  不需要宽表时用 `sparse_signals.read_sparse_signals()`
+* 全量重建（day2_export_signals）经 `write_signals()` 发布：单文件直接替换，已是目录则替换历史分片
+
+示例
+----
+```python
+agg = SignalAggregator("signals.parquet")
+agg.update(batch["DATE"], batch["STOCK_CODE"], batch["net_tone"])   # 流式批次
+today = agg.current_row()                                            # 当日信号
+agg.close_day("2017-03-31")                                         # 追加一个分片
+```
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+PART_PREFIX = "part-"
+HISTORY_PART = f"{PART_PREFIX}0000-history.parquet"
+DATE_COL, TICKER_COL, VALUE_COL = "DATE", "TICKER", "SIGNAL"
+
+# ---------------------------------------------------------------------------
+# Aggregator
+# ---------------------------------------------------------------------------
+
+class SignalAggregator:
+    """Running mean of tweet scores per (date, ticker) for the open days.
+
+    Only days that have not been closed are held in memory (normally just
+    today); closing a day writes its row to the dataset and frees it.
+    Scores arriving for an already closed day are counted in
+    `late_dropped` and ignored, so published history never changes.
+    """
+
+    def __init__(self, path: str | Path | None = "signals.parquet",
+                 auto_close: bool = False, capacity: int = 256):
+        self.path = Path(path) if path else None
+        self.auto_close = auto_close
+        self.tickers: Dict[str, int] = {}
+        self.rows: Dict[pd.Timestamp, int] = {}
+        self._sum = np.zeros((4, capacity))
+        self._cnt = np.zeros((4, capacity))            # 权重和（无权重时即条数）
+        self._free_rows: list[int] = list(range(3, -1, -1))
+        self.closed_through: pd.Timestamp | None = self._last_written_day()
+        self.late_dropped = 0
+
+    # ---------------- 存储容量 ---------------- #
+    def _ticker_ids(self, tickers: np.ndarray) -> np.ndarray:
+        codes, uniques = pd.factorize(tickers)
+        ids = np.empty(len(uniques), dtype=np.int64)
+        for i, t in enumerate(uniques):
+            ids[i] = self.tickers.setdefault(t, len(self.tickers))
+        if len(self.tickers) > self._sum.shape[1]:
+            self._grow(cols=max(2 * self._sum.shape[1], len(self.tickers)))
+        return ids[codes]
+
+    def _row_for(self, day: pd.Timestamp) -> int:
+        if day not in self.rows:
+            if not self._free_rows:
+                n = self._sum.shape[0]
+                self._grow(rows=2 * n)
+                self._free_rows = list(range(2 * n - 1, n - 1, -1))
+            self.rows[day] = self._free_rows.pop()
+        return self.rows[day]
+
+    def _grow(self, rows: int | None = None, cols: int | None = None):
+        r, c = rows or self._sum.shape[0], cols or self._sum.shape[1]
+        for name in ("_sum", "_cnt"):
+            old = getattr(self, name)
+            new = np.zeros((r, c), dtype=old.dtype)
+            new[:old.shape[0], :old.shape[1]] = old
+            setattr(self, name, new)
+
+    # ---------------- 更新 ---------------- #
+    def update(self, dates: Iterable, tickers: Iterable, values: Iterable,
+               weights: Iterable | None = None) -> "SignalAggregator":
+        """Add a batch of scored tweets (vectorized; any batch size).
+
+        `weights` (e.g. near_dedup's `DUP_COUNT`) make the running mean a
+        weighted one, matching `SparseSignals.from_long(..., weight_col=...)`.
+        """
+        days = pd.DatetimeIndex(pd.to_datetime(np.asarray(dates))).normalize()
+        tickers = np.asarray(tickers, dtype=object)
+        values = np.asarray(values, dtype=float)
+        weights = np.ones(len(values)) if weights is None else np.asarray(weights, dtype=float)
+        keep = ~np.isnan(values)
+        if self.closed_through is not None:
+            late = days <= self.closed_through
+            self.late_dropped += int((late & keep).sum())
+            keep &= ~late
+        if not keep.any():
+            return self
+        days, tickers, values, weights = days[keep], tickers[keep], values[keep], weights[keep]
+
+        day_codes, day_uniques = pd.factorize(days)
+        row_ids = np.array([self._row_for(d) for d in day_uniques])[day_codes]
+        col_ids = self._ticker_ids(tickers)
+        np.add.at(self._sum, (row_ids, col_ids), weights * values)
+        np.add.at(self._cnt, (row_ids, col_ids), weights)
+
+        if self.auto_close:                 # 批次中最新日期之前的日子视为已收盘
+            self.close_before(days.max())
+        return self
+
+    # ---------------- 发布 ---------------- #
+    def _row_series(self, day: pd.Timestamp) -> pd.Series:
+        r = self.rows[day]
+        n = len(self.tickers)
+        cnt = self._cnt[r, :n]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._sum[r, :n] / cnt
+        s = pd.Series(mean, index=list(self.tickers), name=day)
+        return s[cnt > 0].sort_index()
+
+    def open_days(self) -> list[pd.Timestamp]:
+        return sorted(self.rows)
+
+    def current_row(self, day=None) -> pd.Series:
+        """Mean signal per ticker for `day` (default: latest open day)."""
+        if not self.rows:
+            return pd.Series(dtype=float)
+        day = max(self.rows) if day is None else pd.Timestamp(day).normalize()
+        return self._row_series(day)
+
+    def matrix(self) -> pd.DataFrame:
+        """Wide date × ticker frame of all open days."""
+        rows = [self._row_series(d) for d in self.open_days()]
+        return pd.DataFrame(rows).rename_axis(DATE_COL) if rows else pd.DataFrame()
+
+    # ---------------- 收盘 & 持久化 ---------------- #
+    def close_day(self, day) -> pd.Series:
+        """Publish `day` as one new part file and drop it from memory."""
+        day = pd.Timestamp(day).normalize()
+        row = self._row_series(day) if day in self.rows else pd.Series(dtype=float, name=day)
+        if self.path is not None and not row.empty:
+            self._write_part(day, row)
+        if day in self.rows:
+            r = self.rows.pop(day)
+            self._sum[r] = 0
+            self._cnt[r] = 0
+            self._free_rows.append(r)
+        if self.closed_through is None or day > self.closed_through:
+            self.closed_through = day
+        return row
+
+    def close_before(self, day) -> None:
+        """Close every open day strictly before `day` (e.g. at the session start)."""
+        day = pd.Timestamp(day).normalize()
+        for d in [d for d in self.open_days() if d < day]:
+            self.close_day(d)
+
+    def _write_part(self, day: pd.Timestamp, row: pd.Series):
+        _ensure_dataset_dir(self.path)
+        frame = pd.DataFrame({DATE_COL: day, TICKER_COL: row.index.astype(str),
+                              VALUE_COL: row.to_numpy()})
+        final = self.path / f"{PART_PREFIX}{day:%Y-%m-%d}.parquet"
+        tmp = final.with_suffix(".tmp")
+        frame.to_parquet(tmp, index=False)
+        os.replace(tmp, final)              # 原子替换：读者不会看到半个分片
+
+    def _last_written_day(self) -> pd.Timestamp | None:
+        if self.path is None or not self.path.exists():
+            return None
+        if self.path.is_file():                         # 旧版单文件，首次收盘时迁移
+            return _max_index_day(self.path)
+        days = [p.stem[len(PART_PREFIX):] for p in self.path.glob(f"{PART_PREFIX}*.parquet")
+                if p.name != HISTORY_PART]
+        if days:
+            return pd.Timestamp(max(days))
+        history = self.path / HISTORY_PART
+        return _max_index_day(history) if history.exists() else None
+
+# ---------------------------------------------------------------------------
+# Dataset helpers
+# ---------------------------------------------------------------------------
+
+def is_long_file(path: Path) -> bool:
+    """True for the long (DATE, TICKER, SIGNAL) layout, False for a legacy wide matrix."""
+    import pyarrow.parquet as pq
+
+    return {TICKER_COL, VALUE_COL} <= set(pq.read_schema(path).names)
+
+
+def _read_wide_file(path: Path) -> pd.DataFrame:
+    if not is_long_file(path):
+        return pd.read_parquet(path)
+    long = pd.read_parquet(path)
+    wide = long.pivot(index=DATE_COL, columns=TICKER_COL, values=VALUE_COL)
+    wide.index = pd.DatetimeIndex(wide.index, name=DATE_COL)
+    wide.columns.name = None
+    return wide
+
+
+def _max_index_day(path: Path) -> pd.Timestamp | None:
+    if is_long_file(path):
+        idx = pd.DatetimeIndex(pd.read_parquet(path, columns=[DATE_COL])[DATE_COL])
+    else:
+        idx = pd.read_parquet(path, columns=[]).index
+    return pd.Timestamp(idx.max()).normalize() if len(idx) else None
+
+
+def _ensure_dataset_dir(path: Path):
+    """Turn a legacy single-file signals.parquet into a dataset directory.
+
+    The old file is moved (not rewritten) into the directory as the history
+    part, so existing readers keep seeing the same rows.
+    """
+    if path.is_dir():
+        return
+    if path.exists():
+        tmp = path.with_name(path.name + ".migrating")
+        os.replace(path, tmp)
+        path.mkdir(parents=True)
+        os.replace(tmp, path / HISTORY_PART)
+        logging.info("已将 %s 迁移为分片目录", path)
+    else:
+        path.mkdir(parents=True)
+
+
+def write_signals(long: pd.DataFrame, path: str | Path = "signals.parquet") -> Path:
+    """Publish a full (DATE, TICKER, SIGNAL) rebuild, whether `path` is a file or a part directory.
+
+    For a directory (already converted by `close_day`) the rebuild becomes the
+    history part, and daily parts up to its last date are removed because the
+    rebuild supersedes them; later parts (days closed after the export) stay.
+    """
+    path = Path(path)
+    target = path / HISTORY_PART if path.is_dir() else path
+    tmp = target.with_name(target.name + ".tmp")
+    long.to_parquet(tmp, index=False)
+    os.replace(tmp, target)                             # 原子替换
+    if path.is_dir() and len(long):
+        last = pd.Timestamp(long[DATE_COL].max()).normalize()
+        for part in path.glob(f"{PART_PREFIX}*.parquet"):
+            if part.name != HISTORY_PART and pd.Timestamp(part.stem[len(PART_PREFIX):]) <= last:
+                part.unlink()
+    return path
+
+
+def read_signals(path: str | Path = "signals.parquet") -> pd.DataFrame:
+    """Date × ticker signal matrix from a single file (long or wide) or a part directory."""
+    path = Path(path)
+    if not path.is_dir():
+        return _read_wide_file(path)
+
+    import pyarrow.parquet as pq
+
+    parts = sorted(str(p) for p in path.glob(f"{PART_PREFIX}*.parquet")
+                   if p.name != HISTORY_PART)
+    frames = []
+    if (path / HISTORY_PART).exists():                  # 迁移来的旧版单文件
+        frames.append(_read_wide_file(path / HISTORY_PART))
+    if parts:
+        long = pq.ParquetDataset(parts).read().to_pandas()
+        frames.append(long.pivot(index=DATE_COL, columns=TICKER_COL, values=VALUE_COL))
+    if not frames:
+        return pd.DataFrame()
+    wide = pd.concat(frames, axis=0, sort=True) if len(frames) > 1 else frames[0]
+    wide.index = pd.DatetimeIndex(wide.index, name=DATE_COL)
+    wide = wide[~wide.index.duplicated(keep="last")].sort_index()
+    wide.columns.name = None
+    return wide
+
+
+def replay_csv(csv_path, path="signals.parquet", date_col=DATE_COL, ticker_col="STOCK_CODE",
+               value_col="net_tone", chunksize=10_000, weight_col="DUP_COUNT") -> SignalAggregator:
+    """Stream a tweet-level prediction CSV through the aggregator in date order.
+
+    When the CSV has `weight_col` the daily means are weighted by it, as in
+    day2_export_signals.
+    """
+    agg = SignalAggregator(path, auto_close=True)
+    header = pd.read_csv(csv_path, nrows=0).columns
+    weight_col = weight_col if weight_col in header else None
+    cols = [date_col, ticker_col, value_col] + ([weight_col] if weight_col else [])
+    df = pd.read_csv(csv_path, usecols=cols, parse_dates=[date_col])
+    df = df.sort_values(date_col, kind="stable")
+    for start in range(0, len(df), chunksize):
+        chunk = df.iloc[start:start + chunksize]
+        agg.update(chunk[date_col], chunk[ticker_col], chunk[value_col],
+                   chunk[weight_col] if weight_col else None)
+    for day in agg.open_days():
+        agg.close_day(day)
+    return agg
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    ap = argparse.ArgumentParser(description="Replay tweet-level predictions into the signal dataset")
+    ap.add_argument("--tweets", default="tweet_level_preds.csv")
+    ap.add_argument("--out", default="signals.parquet")
+    ap.add_argument("--value_col", default="net_tone")
+    ap.add_argument("--chunksize", type=int, default=10_000)
+    args = ap.parse_args()
+
+    agg = replay_csv(args.tweets, args.out, value_col=args.value_col, chunksize=args.chunksize)
+    logging.info("✔ %s: %s (late dropped: %d)", args.out, read_signals(args.out).shape,
+                 agg.late_dropped)
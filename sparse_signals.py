@@ -0,0 +1,302 @@
+#!/usr/bin/env python
+# sparse_signals.py
+# Coding: UTF-8
+"""
+Sparse (date, ticker, value) signals
+====================================
+* 日度信号绝大多数 (日期, 股票) 没有推文 → 宽表几乎全是 NaN；这里按 **CSR** 存储：
+  每个日期一行，`indptr` 切出该日的 (股票列号, 数值)，内存只与观测数成正比
+* 构造：`from_long()`（推文级 / 长表，重复键求均值）、`from_wide()`、`read_sparse_signals()`（信号数据集）
+* 多空权重 `long_short_weights()`：一次全局稳定排序得到每日行内名次，top / bottom N 直接由名次筛出，
+  结果与逐日 `nlargest` / `nsmallest` 完全一致（同值按股票顺序取先出现者）
+* 分位收益 `quantile_returns()`：行内名次 → 分位编号 → 一次 `bincount`，只读取有信号的位置的远期收益
+* 只有下游库必须要矩阵时（如 vectorbt）才 `to_wide()`
+
+示例
+----
+```python
+sig = SparseSignals.from_long(preds, "DATE", "STOCK_CODE", "net_tone").shift(1)
+w_long, w_short = long_short_weights(sig, top_n=50)
+w_long.to_wide(fill_value=0.0)            # 仅在交给 vectorbt 前稠密化
+```
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from quantile_returns import quantile_bucket_ids as _quantile_bucket_ids
+from signal_aggregator import DATE_COL, HISTORY_PART, PART_PREFIX, TICKER_COL, VALUE_COL, is_long_file
+
+# ---------------------------------------------------------------------------
+# Container
+# ---------------------------------------------------------------------------
+
+class SparseSignals:
+    """Date-major CSR matrix of signal values with pandas labels.
+
+    Rows follow `dates` (sorted), column ids index into `tickers`; within a
+    row the entries are ordered by column id, so row order matches the
+    columns of the equivalent wide frame.
+    """
+
+    def __init__(self, dates, tickers, indptr, cols, values):
+        self.dates = pd.DatetimeIndex(dates, name=DATE_COL)
+        self.tickers = pd.Index(tickers)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.cols = np.asarray(cols, dtype=np.int64)
+        self.values = np.asarray(values, dtype=float)
+
+    # ---------------- 构造 ---------------- #
+    @classmethod
+    def from_codes(cls, dates, tickers, rows, cols, values, weights=None) -> "SparseSignals":
+        """Build from (row id, column id, value) triplets; duplicate cells are (weighted-)averaged."""
+        rows, cols = np.asarray(rows, dtype=np.int64), np.asarray(cols, dtype=np.int64)
+        values = np.asarray(values, dtype=float)
+        keep = ~np.isnan(values)
+        rows, cols, values = rows[keep], cols[keep], values[keep]
+        n_dates, n_tickers = len(dates), len(tickers)
+        cell = rows * n_tickers + cols
+
+        if weights is None:
+            # groupby 的均值带补偿求和：与宽表 `groupby().mean().unstack()` 逐位一致（并列名次才不会错位）
+            means = pd.Series(values).groupby(cell, sort=True).mean()
+        else:
+            # 去重后的推文带簇大小权重：Σw·v / Σw 等于未去重时的均值
+            weights = np.asarray(weights, dtype=float)[keep]
+            sums = pd.DataFrame({"wv": weights * values, "w": weights}).groupby(cell, sort=True).sum()
+            means = sums["wv"] / sums["w"]
+        keys = means.index.to_numpy(dtype=np.int64)
+        indptr = np.zeros(n_dates + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_tickers, minlength=n_dates), out=indptr[1:])
+        return cls(dates, tickers, indptr, keys % n_tickers, means.to_numpy())
+
+    @classmethod
+    def from_long(cls, df: pd.DataFrame, date_col: str = DATE_COL, ticker_col: str = TICKER_COL,
+                  value_col: str = VALUE_COL, weight_col: str | None = None) -> "SparseSignals":
+        """Long / tweet-level rows → daily mean per (date, ticker), like `groupby().mean()`.
+
+        `weight_col` (e.g. near_dedup's `DUP_COUNT`) turns it into a weighted mean.
+        """
+        row_ids, dates = pd.factorize(pd.to_datetime(df[date_col]), sort=True)
+        col_ids, tickers = pd.factorize(df[ticker_col], sort=True)
+        weights = df[weight_col].to_numpy(dtype=float) if weight_col else None
+        return cls.from_codes(dates, tickers, row_ids, col_ids, df[value_col].to_numpy(dtype=float), weights)
+
+    @classmethod
+    def from_wide(cls, wide: pd.DataFrame) -> "SparseSignals":
+        values = wide.to_numpy(dtype=float)
+        rows, cols = np.nonzero(~np.isnan(values))
+        indptr = np.zeros(len(wide) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(wide)), out=indptr[1:])
+        return cls(wide.index, wide.columns, indptr, cols, values[rows, cols])
+
+    # ---------------- 基本属性 ---------------- #
+    @property
+    def shape(self) -> tuple[int, int]:
+        return len(self.dates), len(self.tickers)
+
+    @property
+    def nnz(self) -> int:
+        return len(self.values)
+
+    @property
+    def density(self) -> float:
+        cells = self.shape[0] * self.shape[1]
+        return self.nnz / cells if cells else 0.0
+
+    def row_ids(self) -> np.ndarray:
+        return np.repeat(np.arange(len(self.dates)), np.diff(self.indptr))
+
+    def counts(self) -> np.ndarray:
+        """Observations per date."""
+        return np.diff(self.indptr)
+
+    def row(self, i: int) -> pd.Series:
+        """One date's signals (only tickers with a value)."""
+        i = range(len(self.dates))[i]
+        lo, hi = self.indptr[i], self.indptr[i + 1]
+        return pd.Series(self.values[lo:hi], index=self.tickers[self.cols[lo:hi]], name=self.dates[i])
+
+    def __repr__(self) -> str:
+        return (f"SparseSignals({self.shape[0]} dates × {self.shape[1]} tickers, "
+                f"nnz={self.nnz}, density={self.density:.2%})")
+
+    # ---------------- 变换 ---------------- #
+    def shift(self, periods: int = 1) -> "SparseSignals":
+        """Row shift like `wide.shift(periods)` (periods ≥ 0): date i gets date i-periods."""
+        if periods < 0:
+            raise ValueError("only forward shifts (periods >= 0) are supported")
+        n = len(self.dates)
+        k = min(periods, n)
+        indptr = np.concatenate([np.zeros(k, dtype=np.int64), self.indptr[:n + 1 - k]])
+        end = indptr[-1]
+        return SparseSignals(self.dates, self.tickers, indptr, self.cols[:end], self.values[:end])
+
+    def select(self, dates=None, tickers=None) -> "SparseSignals":
+        """Restrict to a subset of dates and/or tickers (order of the given labels)."""
+        rows, cols, values = self.row_ids(), self.cols, self.values
+        new_dates, new_tickers = self.dates, self.tickers
+        row_map = np.arange(len(self.dates))
+        col_map = np.arange(len(self.tickers))
+        if dates is not None:
+            new_dates = pd.DatetimeIndex(dates)
+            row_map = self.dates.get_indexer(new_dates)
+            inv = np.full(len(self.dates), -1)
+            inv[row_map[row_map >= 0]] = np.nonzero(row_map >= 0)[0]
+            row_map = inv
+        if tickers is not None:
+            new_tickers = pd.Index(tickers)
+            pos = self.tickers.get_indexer(new_tickers)
+            inv = np.full(len(self.tickers), -1)
+            inv[pos[pos >= 0]] = np.nonzero(pos >= 0)[0]
+            col_map = inv
+        rows, cols = row_map[rows], col_map[cols]
+        keep = (rows >= 0) & (cols >= 0)
+        return SparseSignals.from_codes(new_dates, new_tickers, rows[keep], cols[keep], values[keep])
+
+    # ---------------- 输出 ---------------- #
+    def to_wide(self, index=None, columns=None, fill_value: float = np.nan) -> pd.DataFrame:
+        """Densify (only where a downstream library needs a matrix)."""
+        sig = self if index is None and columns is None else self.select(index, columns)
+        out = np.full(sig.shape, fill_value, dtype=float)
+        out[sig.row_ids(), sig.cols] = sig.values
+        return pd.DataFrame(out, index=sig.dates, columns=sig.tickers)
+
+    def to_long(self) -> pd.DataFrame:
+        return pd.DataFrame({DATE_COL: self.dates[self.row_ids()],
+                             TICKER_COL: self.tickers[self.cols],
+                             VALUE_COL: self.values})
+
+    def to_scipy(self):
+        from scipy.sparse import csr_matrix
+
+        return csr_matrix((self.values, self.cols, self.indptr), shape=self.shape)
+
+# ---------------------------------------------------------------------------
+# 读取
+# ---------------------------------------------------------------------------
+
+def _read_file(path: Path) -> SparseSignals:
+    df = pd.read_parquet(path)
+    return SparseSignals.from_long(df) if is_long_file(path) else SparseSignals.from_wide(df)
+
+
+def read_sparse_signals(path: str | Path = "signals.parquet") -> SparseSignals:
+    """Signal dataset (part directory, long file or legacy wide file) without a wide pivot."""
+    path = Path(path)
+    if not path.is_dir():
+        return _read_file(path)
+
+    import pyarrow.parquet as pq
+
+    frames = []
+    parts = sorted(str(p) for p in path.glob(f"{PART_PREFIX}*.parquet") if p.name != HISTORY_PART)
+    if parts:
+        frames.append(pq.ParquetDataset(parts).read().to_pandas())
+    if (path / HISTORY_PART).exists():                  # 迁移来的旧版宽表 → 长表
+        history = _read_file(path / HISTORY_PART).to_long()
+        if frames:                                      # 同一日期以分片为准（与 read_signals 一致）
+            history = history[~history[DATE_COL].isin(pd.to_datetime(frames[0][DATE_COL]))]
+        frames.insert(0, history)
+    if not frames:
+        return SparseSignals([], [], [0], [], [])
+    return SparseSignals.from_long(pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0])
+
+# ---------------------------------------------------------------------------
+# 行内名次
+# ---------------------------------------------------------------------------
+
+def _row_order(sig: SparseSignals, descending: bool = False) -> np.ndarray:
+    """Entry order by (row, value), ties kept in column order (stable)."""
+    order = np.argsort(-sig.values if descending else sig.values, kind="stable")
+    return order[np.argsort(sig.row_ids()[order], kind="stable")]
+
+
+def _rank_in_row(sig: SparseSignals, order: np.ndarray) -> np.ndarray:
+    """0-based position of each ordered entry within its row."""
+    rows = sig.row_ids()[order]
+    return np.arange(sig.nnz) - sig.indptr[rows]
+
+# ---------------------------------------------------------------------------
+# 多空权重
+# ---------------------------------------------------------------------------
+
+def long_short_weights(
+    sig: SparseSignals,
+    top_n: int = 50,
+    weight_scheme: str = "equal",
+) -> tuple[SparseSignals, SparseSignals]:
+    """Sparse long (≥ 0) and short (≤ 0) weights per date.
+
+    Same selection as ``row.nlargest(top_n)`` / ``row.nsmallest(top_n)``;
+    `weight_scheme="equal"` gives 1/N per leg, anything else weights by
+    |signal| (a leg whose |signal| sums to zero gets zero weights).
+    """
+    counts = sig.counts()
+    legs = []
+    for descending, sign in ((True, 1.0), (False, -1.0)):
+        order = _row_order(sig, descending)
+        picked = order[_rank_in_row(sig, order) < top_n]
+        rows = sig.row_ids()[picked]
+        if weight_scheme == "equal":
+            w = 1.0 / np.minimum(counts[rows], top_n)
+        else:
+            mag = np.abs(sig.values[picked])
+            total = np.bincount(rows, weights=mag, minlength=len(sig.dates))[rows]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                w = np.nan_to_num(mag / total, nan=0.0)
+        legs.append(SparseSignals.from_codes(sig.dates, sig.tickers, rows, sig.cols[picked], sign * w))
+    return legs[0], legs[1]
+
+# ---------------------------------------------------------------------------
+# 分位收益
+# ---------------------------------------------------------------------------
+
+def quantile_bucket_ids(sig: SparseSignals, n_bins: int = 5, block_cells: int = 1 << 22) -> np.ndarray:
+    """Per-entry quantile bucket (0 … n_bins-1), see quantile_returns.quantile_bucket_ids.
+
+    Rows are packed into NaN-padded blocks of at most ~`block_cells` cells, so
+    the tie rule lives in one place and memory stays bounded.
+    """
+    counts = sig.counts()
+    width = int(counts.max()) if len(counts) else 0
+    out = np.empty(sig.nnz, dtype=np.int64)
+    step = max(1, block_cells // max(width, 1))
+    for lo in range(0, len(sig.dates), step):
+        hi = min(lo + step, len(sig.dates))
+        a, b = sig.indptr[lo], sig.indptr[hi]
+        rows = np.repeat(np.arange(hi - lo), counts[lo:hi])
+        pos = np.arange(a, b) - sig.indptr[lo:hi][rows]
+        block = np.full((hi - lo, width), np.nan)
+        block[rows, pos] = sig.values[a:b]
+        out[a:b] = _quantile_bucket_ids(block, n_bins)[rows, pos]
+    return out
+
+
+def quantile_returns(sig: SparseSignals, prices: pd.DataFrame, n_bins: int = 5) -> pd.DataFrame:
+    """Mean next-period return per signal quantile, one row per date.
+
+    Sparse counterpart of `quantile_returns.signal_quantile_returns`; forward
+    returns are looked up only at the observed (date, ticker) cells.
+    """
+    forward = prices.pct_change(fill_method=None).shift(-1)
+    r = forward.index.get_indexer(sig.dates)
+    c = forward.columns.get_indexer(sig.tickers)
+    rows, cols = sig.row_ids(), sig.cols
+    fr = np.full(sig.nnz, np.nan)
+    ok = (r[rows] >= 0) & (c[cols] >= 0)
+    fr[ok] = forward.to_numpy(dtype=float)[r[rows][ok], c[cols][ok]]
+
+    buckets = quantile_bucket_ids(sig, n_bins)
+    mask = ~np.isnan(fr)
+    flat = rows[mask] * n_bins + buckets[mask]
+    size = len(sig.dates) * n_bins
+    sums = np.bincount(flat, weights=fr[mask], minlength=size)
+    cnt = np.bincount(flat, minlength=size)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        means = (sums / cnt).reshape(len(sig.dates), n_bins)
+    return pd.DataFrame(means, index=sig.dates, columns=[f"Q{i + 1}" for i in range(n_bins)])
@@ -0,0 +1,258 @@
+#!/usr/bin/env python
+# stage_timer.py
+# Coding: UTF-8
+"""
+Stage-level timing log
+======================
+* `with stage("vectorize", rows=len(texts)) as rec:` / `@timed("weights")` 包住流水线各阶段
+* 每个阶段写一行 JSON：墙钟时间、CPU 时间、峰值 RSS、行数、状态（ok / error）、嵌套深度
+* 峰值 RSS 取 `/proc/self/status` 的 VmHWM，阶段开始前经 `/proc/self/clear_refs` 清零（Linux）；
+  嵌套阶段的峰值向外层取最大值，外层数值不会被内层清零“吃掉”
+* 可选剖析：对每个 **最外层** 阶段开 cProfile（`.prof`，snakeviz / pstats 可读）或
+  采样栈（`.folded`，与 `py-spy record --format raw` 相同的折叠栈格式，speedscope / flamegraph.pl 可读），
+  进程结束时只保留 **最慢** 阶段的剖析文件
+* 未启用（既没有 `--timing_log` 也没有 `STAGE_LOG` 环境变量）时只剩两次计时调用，可常驻代码中
+
+启用方式
+--------
+```bash
+STAGE_LOG=timings.jsonl python day2_sestm_pipeline_delete_noise.py --force_retrain
+python Day3enhancednew.py --timing_log timings.jsonl --profile sample
+```
+"""
+
+from __future__ import annotations
+
+import atexit
+import cProfile
+import functools
+import json
+import logging
+import os
+import resource
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, List
+
+PROFILE_MODES = ("cprofile", "sample")
+
+# ---------------------------------------------------------------------------
+# 峰值内存
+# ---------------------------------------------------------------------------
+
+def reset_peak_rss() -> bool:
+    """Reset VmHWM to the current RSS (Linux ≥ 4.0); False when not permitted."""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS since the last reset (falls back to the process-wide ru_maxrss)."""
+    try:
+        for line in Path("/proc/self/status").read_text().splitlines():
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024       # Linux: KiB
+
+# ---------------------------------------------------------------------------
+# 采样剖析（py-spy raw / 折叠栈格式）
+# ---------------------------------------------------------------------------
+
+class _Sampler:
+    """Sample the calling thread's stack every `interval` s into folded-stack counts."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({code.co_filename}:{frame.f_lineno})")
+                frame = frame.f_back
+            if stack:
+                self.counts[";".join(reversed(stack))] += 1
+
+    def enable(self):
+        self._thread.start()
+
+    def disable(self):
+        self._stop.set()
+        self._thread.join()
+
+    def dump(self, path: Path):
+        path.write_text("".join(f"{stack} {n}\n" for stack, n in self.counts.most_common()))
+
+# ---------------------------------------------------------------------------
+# 日志
+# ---------------------------------------------------------------------------
+
+class StageLog:
+    """Process-wide sink for stage records (one JSON object per line)."""
+
+    def __init__(self):
+        self.path: Path | None = None
+        self.profile: str | None = None
+        self.profile_dir = Path("profiles")
+        self.run_id = uuid.uuid4().hex[:8]
+        self.script = Path(sys.argv[0]).name if sys.argv and sys.argv[0] else "<interactive>"
+        self._stack: List[Dict] = []
+        self._slowest: tuple[float, str, object] | None = None    # (wall_s, stage, profiler)
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def configure(self, path: str | Path | None = None, profile: str | None = None,
+                  profile_dir: str | Path | None = None):
+        if profile is not None and profile not in PROFILE_MODES:
+            raise ValueError(f"profile must be one of {PROFILE_MODES}")
+        self.path = Path(path) if path else None
+        self.profile = profile if self.path else None
+        if profile_dir:
+            self.profile_dir = Path(profile_dir)
+
+    def write(self, rec: Dict):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rec, default=str) + "\n")
+
+    def offer_profile(self, wall_s: float, name: str, profiler):
+        if self._slowest is None or wall_s > self._slowest[0]:
+            self._slowest = (wall_s, name, profiler)
+
+    def dump_profile(self) -> Path | None:
+        """Write the slowest top-level stage's profile; called at exit."""
+        if self._slowest is None:
+            return None
+        wall_s, name, profiler = self._slowest
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+        stem = f"{Path(self.script).stem}-{self.run_id}-{name}"
+        if isinstance(profiler, _Sampler):
+            path = self.profile_dir / f"{stem}.folded"
+            profiler.dump(path)
+        else:
+            path = self.profile_dir / f"{stem}.prof"
+            profiler.dump_stats(path)
+        logging.info("最慢阶段 %s（%.2fs）剖析 → %s", name, wall_s, path)
+        self._slowest = None
+        return path
+
+
+_LOG = StageLog()
+_LOG.configure(os.environ.get("STAGE_LOG"), os.environ.get("STAGE_PROFILE"), os.environ.get("STAGE_PROFILE_DIR"))
+atexit.register(_LOG.dump_profile)
+
+
+def configure(path: str | Path | None = None, profile: str | None = None,
+              profile_dir: str | Path | None = None) -> StageLog:
+    """Enable the JSON-lines log (and optional profiling) for this process."""
+    _LOG.configure(path, profile, profile_dir)
+    return _LOG
+
+
+def add_timing_args(parser) -> None:
+    """`--timing_log` / `--profile` / `--profile_dir` shared by the pipeline scripts."""
+    parser.add_argument("--timing_log", default=os.environ.get("STAGE_LOG"),
+                        help="阶段耗时 / 内存写入该 JSON lines 文件（默认读取 STAGE_LOG 环境变量）")
+    parser.add_argument("--profile", choices=PROFILE_MODES, default=os.environ.get("STAGE_PROFILE"),
+                        help="剖析最慢的阶段：cprofile → .prof，sample → 折叠栈 .folded")
+    parser.add_argument("--profile_dir", default=os.environ.get("STAGE_PROFILE_DIR", "profiles"))
+
+
+def configure_from_args(args) -> StageLog:
+    return configure(args.timing_log, args.profile, args.profile_dir)
+
+# ---------------------------------------------------------------------------
+# 阶段
+# ---------------------------------------------------------------------------
+
+def _row_count(obj) -> int | None:
+    shape = getattr(obj, "shape", None)
+    if shape:
+        return int(shape[0])
+    if isinstance(obj, tuple) and obj:
+        return _row_count(obj[0])
+    try:
+        return len(obj)
+    except TypeError:
+        return None
+
+
+@contextmanager
+def stage(name: str, rows: int | None = None, **extra):
+    """Time one pipeline stage; set `rec["rows"]` inside the block if known only later."""
+    rec = {"stage": name, "rows": rows, **extra}
+    if not _LOG.enabled:
+        yield rec
+        return
+
+    parent = _LOG._stack[-1] if _LOG._stack else None
+    if parent is not None:                          # 清零前先把外层到目前为止的峰值记下
+        parent["_child_peak"] = max(parent["_child_peak"], peak_rss_mb())
+    rec["depth"] = len(_LOG._stack)
+    rec["_child_peak"] = 0.0
+    _LOG._stack.append(rec)
+    profiler = None
+    if _LOG.profile and parent is None:            # cProfile 不能嵌套：只剖析最外层阶段
+        profiler = cProfile.Profile() if _LOG.profile == "cprofile" else _Sampler()
+        profiler.enable()
+    reset_peak_rss()
+    wall0, cpu0 = time.perf_counter(), time.process_time()
+    status = "ok"
+    try:
+        yield rec
+    except BaseException as e:
+        status = f"error ({type(e).__name__})"
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - wall0, time.process_time() - cpu0
+        if profiler is not None:
+            profiler.disable()
+            _LOG.offer_profile(wall, name, profiler)
+        peak = max(peak_rss_mb(), rec.pop("_child_peak"))
+        _LOG._stack.pop()
+        if parent is not None:
+            parent["_child_peak"] = max(parent["_child_peak"], peak)
+        _LOG.write({"ts": time.strftime("%Y-%m-%dT%H:%M:%S"), "run_id": _LOG.run_id, "script": _LOG.script,
+                    **rec, "wall_s": round(wall, 4), "cpu_s": round(cpu, 4),
+                    "peak_rss_mb": round(peak, 1), "status": status})
+
+
+def timed(name: str | None = None):
+    """Decorator form of `stage`; rows = len / shape[0] of the return value."""
+    def wrap(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with stage(label) as rec:
+                out = fn(*args, **kwargs)
+                if rec["rows"] is None:
+                    rec["rows"] = _row_count(out)
+                return out
+        return inner
+    return wrap
+
+
+def read_log(path: str | Path):
+    """Timing log → DataFrame (pandas imported lazily)."""
+    import pandas as pd
+
+    return pd.read_json(path, lines=True)
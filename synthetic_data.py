@@ -0,0 +1,278 @@
+#!/usr/bin/env python
+# synthetic_data.py
+# Coding: UTF-8
+"""
+Synthetic aligned tweet / price data for scale testing
+======================================================
+* 输出与 `filter_2017_cleaned_aligned_data.csv` 相同的列：TWEET, STOCK, DATE, LAST_PRICE,
+  *_DAY_RETURN, PX_VOLUME, VOLATILITY_10D/30D, LSTM_POLARITY, TEXTBLOB_POLARITY, MENTION,
+  STOCK_CODE, cleaned_text（字符串化的 token 列表，与真实文件一致）
+* 先模拟 股票 × 交易日 的价格面板，收益列由价格路径计算 → 同一 (股票, 日) 的推文收益一致
+* **埋入信号**：每个 (股票, 日) 有潜在情绪 s，推文中的正 / 负情感词数量随 s 变化，
+  次日对数收益 = signal_strength·σ·s + σ·噪声 → 下游 IC 应可恢复该关系
+* 填充词服从 Zipf 分布；股票热度同样长尾
+* **转推与截断副本**：`retweet_rate`（默认 0.44，与真实文件中 `RT @` 的占比相当）的行是同块内某条原创推文的
+  `RT @userN: …` 转推，`truncate_rate` 的行是截断后加 `…` 的副本；副本沿用原推文的股票 / 日期，
+  可用来压测 near_dedup 与 day13 的去重路径
+* 分块生成，10k ~ 1 亿行均可：Parquet 按块写成 `part-*.parquet` 目录数据集，内存占用只与块大小有关
+
+运行示例
+--------
+```bash
+python synthetic_data.py --rows 100000 --out synth.csv
+python synthetic_data.py --rows 100000000 --tickers 3000 --days 1000 \\
+       --out synth_parquet --chunk_rows 2000000 --prices_out synth_prices.parquet
+python synthetic_data.py --check synth_parquet        # 检查埋入信号是否可恢复
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+import pandas as pd
+
+POS_WORDS = ("beat", "surge", "upgrade", "record", "bullish", "growth", "profit", "rally",
+             "outperform", "strong")
+NEG_WORDS = ("miss", "plunge", "downgrade", "lawsuit", "bearish", "loss", "recall", "selloff",
+             "weak", "fraud")
+HORIZONS = (1, 2, 3, 7)
+RETURN_COLS = [f"{h}_DAY_RETURN" for h in HORIZONS]
+COLUMNS = ["TWEET", "STOCK", "DATE", "LAST_PRICE", *RETURN_COLS, "PX_VOLUME", "VOLATILITY_10D",
+           "VOLATILITY_30D", "LSTM_POLARITY", "TEXTBLOB_POLARITY", "MENTION", "STOCK_CODE", "cleaned_text"]
+
+
+@dataclass
+class SyntheticSpec:
+    rows: int = 100_000
+    tickers: int = 100
+    days: int = 250
+    vocab: int = 20_000
+    zipf_a: float = 1.2              # 填充词 Zipf 指数
+    words_per_tweet: int = 10
+    sentiment_rate: float = 1.0      # 每条推文情感词的期望个数
+    signal_strength: float = 0.1     # 潜在情绪对次日收益的载荷（以日波动为单位）
+    daily_vol: float = 0.02
+    retweet_rate: float = 0.44       # 转推（RT @user: 原文）占比
+    truncate_rate: float = 0.05      # 截断副本（原文前 60–90% + …）占比
+    start: str = "2017-01-02"
+    seed: int = 0
+
+# ---------------------------------------------------------------------------
+# 价格面板
+# ---------------------------------------------------------------------------
+
+def ticker_names(n: int) -> np.ndarray:
+    return np.array([f"T{i:04d}" for i in range(n)])
+
+
+def _panel(spec: SyntheticSpec):
+    """(dates, sentiment[d, t], close[d, t], volume[d, t]) — 额外模拟 max(HORIZONS) 天以计算远期收益."""
+    rng = np.random.default_rng([spec.seed, 0])
+    n_total = spec.days + max(HORIZONS)
+    dates = pd.bdate_range(spec.start, periods=n_total)
+    vol = spec.daily_vol * rng.lognormal(0, 0.3, spec.tickers)
+    senti = rng.standard_normal((n_total, spec.tickers))
+    log_ret = vol * (rng.standard_normal((n_total, spec.tickers)) + spec.signal_strength * np.roll(senti, 1, axis=0))
+    log_ret[0] = 0.0
+    close = rng.uniform(10, 500, spec.tickers) * np.exp(np.cumsum(log_ret, axis=0))
+    volume = np.round(rng.lognormal(15, 1, spec.tickers) * rng.lognormal(0, 0.4, (n_total, spec.tickers)))
+    return dates, senti, close, volume
+
+
+def price_panel(spec: SyntheticSpec) -> pd.DataFrame:
+    """Wide DATE × ticker close prices (`prices.parquet` layout), trading days only."""
+    dates, _, close, _ = _panel(spec)
+    return pd.DataFrame(close[:spec.days], index=pd.DatetimeIndex(dates[:spec.days], name="DATE"),
+                        columns=pd.Index(ticker_names(spec.tickers), name="STOCK_CODE"))
+
+# ---------------------------------------------------------------------------
+# 推文
+# ---------------------------------------------------------------------------
+
+def iter_chunks(spec: SyntheticSpec, chunk_rows: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """Yield the dataset in chunks of at most `chunk_rows` rows (sorted by DATE within a chunk).
+
+    每块使用独立的随机流 (seed, 块序号)：相同 spec + chunk_rows 结果完全可复现。
+    """
+    dates, senti, close, volume = _panel(spec)
+    names = ticker_names(spec.tickers)
+    log_close = np.log(close)
+    fwd = {h: np.exp(log_close[h:] - log_close[:-h])[:spec.days] - 1 for h in HORIZONS}
+    daily = np.diff(log_close, axis=0, prepend=log_close[:1])
+    vol10 = pd.DataFrame(daily).rolling(10, min_periods=2).std().to_numpy() * np.sqrt(252) * 100
+    vol30 = pd.DataFrame(daily).rolling(30, min_periods=2).std().to_numpy() * np.sqrt(252) * 100
+
+    vocab = np.array([f"w{i}" for i in range(spec.vocab)])
+    pos, neg = np.array(POS_WORDS), np.array(NEG_WORDS)
+    popularity = 1.0 / np.arange(1, spec.tickers + 1) ** 0.8          # 长尾的股票热度
+    popularity /= popularity.sum()
+
+    for i, start in enumerate(range(0, spec.rows, chunk_rows)):
+        n = min(chunk_rows, spec.rows - start)
+        rng = np.random.default_rng([spec.seed, i + 1])
+        d = rng.integers(0, spec.days, n)
+        t = rng.choice(spec.tickers, size=n, p=popularity)
+        s = senti[d, t]
+
+        p_pos = 1 / (1 + np.exp(-2 * s))
+        n_pos = rng.poisson(spec.sentiment_rate * p_pos)
+        n_neg = rng.poisson(spec.sentiment_rate * (1 - p_pos))
+        ranks = (rng.zipf(spec.zipf_a, size=(n, spec.words_per_tweet)) - 1) % spec.vocab   # 长尾折回词表
+        filler = vocab[ranks].tolist()
+        pos_draw = pos[rng.integers(0, len(pos), (n, 3))].tolist()
+        neg_draw = neg[rng.integers(0, len(neg), (n, 3))].tolist()
+
+        # 副本：转推 (1) / 截断 (2) 指向同块内的一条原创推文 (0)，沿用其股票、日期与内容
+        kind = rng.choice(3, size=n, p=[1 - spec.retweet_rate - spec.truncate_rate,
+                                         spec.retweet_rate, spec.truncate_rate])
+        originals = np.flatnonzero(kind == 0)
+        if originals.size == 0:
+            kind[:] = 0
+            originals = np.arange(n)
+        src = np.where(kind == 0, np.arange(n), originals[rng.integers(0, originals.size, n)])
+        order = np.argsort(d[src], kind="stable")                      # 块内按日期排序
+        src, kind = src[order], kind[order]
+        d, t, n_pos, n_neg = d[src], t[src], n_pos[src], n_neg[src]
+        filler, pos_draw, neg_draw = ([x[j] for j in src.tolist()] for x in (filler, pos_draw, neg_draw))
+
+        tokens = [f + p[:a] + q[:b] for f, p, q, a, b in
+                  zip(filler, pos_draw, neg_draw, np.minimum(n_pos, 3).tolist(), np.minimum(n_neg, 3).tolist())]
+        keep = np.maximum(1, (rng.uniform(0.6, 0.9, n) * spec.words_per_tweet).astype(int)).tolist()
+        mention = np.char.add("@", names[t])
+        user = np.char.add("@user", rng.integers(0, 10_000, n).astype(str))
+        polarity = np.clip((n_pos - n_neg) / 3 + rng.normal(0, 0.2, n), -1, 1)
+
+        text, cleaned = [], []
+        for k, tok, m, u, cut in zip(kind.tolist(), tokens, mention, user, keep):
+            body = f"{' '.join(tok)} {m} https://t.co/x"
+            if k == 1:
+                text.append(f"RT {u}: {body}")
+                cleaned.append(str(["rt", *tok]))
+            elif k == 2:
+                text.append(f"{' '.join(tok[:cut])}…")
+                cleaned.append(str(tok[:cut]))
+            else:
+                text.append(body)
+                cleaned.append(str(tok))
+
+        chunk = {
+            "TWEET": text,
+            "STOCK": names[t],
+            "DATE": dates[d],
+            "LAST_PRICE": np.round(close[d, t], 2),
+            **{f"{h}_DAY_RETURN": fwd[h][d, t] for h in HORIZONS},
+            "PX_VOLUME": volume[d, t],
+            "VOLATILITY_10D": np.round(vol10[d, t], 3),
+            "VOLATILITY_30D": np.round(vol30[d, t], 3),
+            "LSTM_POLARITY": np.sign(n_pos - n_neg).astype(int),
+            "TEXTBLOB_POLARITY": np.round(polarity, 3),
+            "MENTION": mention,
+            "STOCK_CODE": names[t],
+            "cleaned_text": cleaned,
+        }
+        yield pd.DataFrame(chunk, columns=COLUMNS)
+
+
+def generate(spec: SyntheticSpec, chunk_rows: int = 1_000_000) -> pd.DataFrame:
+    """Whole dataset in memory (small sizes / tests)."""
+    return pd.concat(iter_chunks(spec, chunk_rows), ignore_index=True)
+
+# ---------------------------------------------------------------------------
+# 输出
+# ---------------------------------------------------------------------------
+
+def write(spec: SyntheticSpec, out: str | Path, chunk_rows: int = 1_000_000) -> Path:
+    """`.csv` → one CSV appended chunk by chunk; otherwise a Parquet directory of parts.
+
+    目录内附 `_spec.json` 记录生成参数，便于回溯埋入的信号强度。
+    """
+    out = Path(out)
+    if out.suffix == ".csv":
+        tmp = out.with_name(out.name + ".tmp")
+        for i, chunk in enumerate(iter_chunks(spec, chunk_rows)):
+            chunk.to_csv(tmp, mode="w" if i == 0 else "a", header=i == 0, index=False)
+            logging.info("块 %d：%d 行 → %s", i, len(chunk), out)
+        os.replace(tmp, out)
+        return out
+
+    out.mkdir(parents=True, exist_ok=True)
+    for old in out.glob("part-*.parquet"):
+        old.unlink()
+    for i, chunk in enumerate(iter_chunks(spec, chunk_rows)):
+        chunk.to_parquet(out / f"part-{i:05d}.parquet", index=False)
+        logging.info("块 %d：%d 行 → %s", i, len(chunk), out)
+    (out / "_spec.json").write_text(json.dumps(asdict(spec), indent=1))
+    return out
+
+
+def read(path: str | Path, columns: list[str] | None = None) -> pd.DataFrame:
+    """Read back a CSV or Parquet directory written by `write`."""
+    path = Path(path)
+    if path.suffix == ".csv":
+        return pd.read_csv(path, usecols=columns, parse_dates=["DATE"])
+    return pd.read_parquet(path, columns=columns)
+
+# ---------------------------------------------------------------------------
+# 信号恢复检查
+# ---------------------------------------------------------------------------
+
+def lexicon_tone(cleaned_text: pd.Series) -> np.ndarray:
+    """(#positive − #negative) planted words per tweet."""
+    text = cleaned_text.astype(str)
+    count = lambda words: sum(text.str.count(f"'{w}'") for w in words)     # noqa: E731
+    return (count(POS_WORDS) - count(NEG_WORDS)).to_numpy()
+
+
+def planted_ic(df: pd.DataFrame, return_col: str = "1_DAY_RETURN") -> float:
+    """Mean daily Spearman IC between the (ticker, day) lexicon tone and `return_col`."""
+    daily = (df.assign(tone=lexicon_tone(df["cleaned_text"]))
+               .groupby(["DATE", "STOCK_CODE"])[["tone", return_col]].mean())
+    ranks = daily.groupby(level="DATE").rank()
+    ic = ranks.groupby(level="DATE").apply(lambda g: g["tone"].corr(g[return_col]))
+    return float(ic.mean())
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    defaults = SyntheticSpec()
+    ap = argparse.ArgumentParser(description="Generate synthetic aligned tweet / price data")
+    ap.add_argument("--rows", type=int, default=defaults.rows)
+    ap.add_argument("--tickers", type=int, default=defaults.tickers)
+    ap.add_argument("--days", type=int, default=defaults.days)
+    ap.add_argument("--vocab", type=int, default=defaults.vocab)
+    ap.add_argument("--zipf_a", type=float, default=defaults.zipf_a)
+    ap.add_argument("--signal_strength", type=float, default=defaults.signal_strength)
+    ap.add_argument("--retweet_rate", type=float, default=defaults.retweet_rate, help="转推占比")
+    ap.add_argument("--truncate_rate", type=float, default=defaults.truncate_rate, help="截断副本占比")
+    ap.add_argument("--seed", type=int, default=defaults.seed)
+    ap.add_argument("--chunk_rows", type=int, default=1_000_000)
+    ap.add_argument("--out", default="synthetic_aligned.csv", help=".csv 为单文件，否则写 Parquet 目录")
+    ap.add_argument("--prices_out", default=None, help="另存宽表价格 (DATE × STOCK_CODE) Parquet")
+    ap.add_argument("--check", default=None, help="只检查已有数据集的埋入信号（日均 Spearman IC）")
+    args = ap.parse_args()
+
+    if args.check:
+        df = read(args.check, columns=["DATE", "STOCK_CODE", "cleaned_text", "1_DAY_RETURN"])
+        print(json.dumps({"rows": len(df), "planted_ic": round(planted_ic(df), 4)}))
+        return
+
+    spec = SyntheticSpec(rows=args.rows, tickers=args.tickers, days=args.days, vocab=args.vocab,
+                         zipf_a=args.zipf_a, signal_strength=args.signal_strength, seed=args.seed,
+                         retweet_rate=args.retweet_rate, truncate_rate=args.truncate_rate)
+    out = write(spec, args.out, args.chunk_rows)
+    if args.prices_out:
+        price_panel(spec).to_parquet(args.prices_out)
+    logging.info("✔ %d 行合成数据 → %s", spec.rows, out)
+
+
+if __name__ == "__main__":
+    main()
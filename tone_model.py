@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# tone_model.py
+# Coding: UTF-8
+"""
+SESTM tone scoring
+==================
+* 载入 day2 流水线保存的三件套：`vectorizer.pkl` / `lda_model.pkl` / `logreg.pkl`
+* `score_texts` 对一批（已清洗的）文本做一次稀疏 transform → LDA → Logistic
+* day2_export_signals.py（批量导出）与 tone_service.py（常驻服务）共用本模块
+* 若存在 `<model_dir>/lean/`（见 lean_model.py），默认改用纯数组格式：不导入 sklearn、mmap 载入；
+  哈希特征导出的 lean 模型（meta `hashed: true`）只是近似，默认仍用 pickle
+"""
+
+from __future__ import annotations
+
+import json
+import pickle
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, NamedTuple, Sequence, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from lean_model import LeanToneModel
+
+
+class ToneModels(NamedTuple):
+    vectorizer: object
+    lda: object
+    clf: object
+
+
+def load_models(model_dir: str | Path = "models", lean: bool | None = None):
+    """Load the tone model stack once.
+
+    `lean=None` picks the array format in `<model_dir>/lean` when it exists and
+    is exact (not exported from hashed features), and falls back to the pickled
+    vectorizer / LDA / logistic stack otherwise. `lean=True` forces it.
+    """
+    model_dir = Path(model_dir)
+    if lean is None:
+        meta = model_dir / "lean" / "meta.json"
+        lean = meta.exists() and not json.loads(meta.read_text()).get("hashed", False)
+    if lean:
+        from lean_model import load_lean
+
+        return load_lean(model_dir / "lean")
+
+    parts = []
+    for name in ("vectorizer.pkl", "lda_model.pkl", "logreg.pkl"):
+        with open(model_dir / name, "rb") as f:
+            parts.append(pickle.load(f))
+    return ToneModels(*parts)
+
+
+def score_texts(models: Union[ToneModels, "LeanToneModel"], texts: Sequence[str]) -> Dict[str, np.ndarray]:
+    """p_pos / p_neg / net_tone for a batch of texts (one sparse transform)."""
+    if not isinstance(models, ToneModels):
+        return models.score(texts)
+    X = models.vectorizer.transform(texts)
+    doc_topic = models.lda.transform(X)
+    p_pos = models.clf.predict_proba(doc_topic)[:, 1]
+    return {
+        "p_pos": p_pos,
+        "p_neg": 1 - p_pos,
+        "net_tone": doc_topic[:, 0] - doc_topic[:, 1],
+    }
@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# tone_service.py
+# Coding: UTF-8
+"""
+Real-time tweet scoring service
+===============================
+* 常驻进程：模型只在启动时载入一次（见 tone_model.py）
+* HTTP（默认 127.0.0.1:8765）或 Unix socket（--unix PATH）
+* **请求合并**：几毫秒内到达的请求拼成一个批次，只做一次稀疏 transform，再按请求拆回
+* `GET /metrics` 返回请求延迟 p50 / p99、批大小等统计
+
+接口
+----
+```
+POST /score    {"texts": ["cleaned text", ...]}
+  → {"p_pos": [...], "p_neg": [...], "net_tone": [...]}
+GET  /metrics  → {"requests": ..., "latency_ms": {"p50": ..., "p99": ...}, ...}
+GET  /health   → {"status": "ok"}
+```
+
+运行示例
+--------
+```bash
+python tone_service.py --model_dir models --port 8765
+curl -s localhost:8765/score -d '{"texts": ["great earnings beat"]}'
+```
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+import numpy as np
+
+from tone_model import load_models, score_texts
+
+# ---------------------------------------------------------------------------
+# 请求合并
+# ---------------------------------------------------------------------------
+
+class _Pending:
+    __slots__ = ("texts", "done", "result", "error")
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesce requests arriving within `max_wait_ms` into one scoring call.
+
+    A single worker thread owns the models: it blocks for the first request,
+    keeps collecting until the wait window closes or `max_batch` texts are
+    queued, scores the concatenation once and hands each caller its slice.
+    """
+
+    def __init__(self, models, max_wait_ms: float = 2.0, max_batch: int = 512):
+        self.models = models
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[_Pending]" = queue.Queue()
+        self.batch_sizes: deque = deque(maxlen=10_000)
+        self._sizes_lock = threading.Lock()   # /metrics 读取时 worker 线程可能正在追加
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def score(self, texts: List[str]) -> dict:
+        item = _Pending(texts)
+        self._queue.put(item)
+        item.done.wait()
+        if item.error is not None:
+            raise item.error
+        return item.result
+
+    def batch_size_history(self) -> List[int]:
+        """Copy of the recent batch sizes, taken under the worker's lock."""
+        with self._sizes_lock:
+            return list(self.batch_sizes)
+
+    def _collect(self) -> List[_Pending]:
+        batch = [self._queue.get()]
+        n_texts = len(batch[0].texts)
+        deadline = time.perf_counter() + self.max_wait
+        while n_texts < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            n_texts += len(item.texts)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            texts = [t for item in batch for t in item.texts]
+            try:
+                scores = score_texts(self.models, texts)
+            except Exception as e:              # 整批失败 → 每个请求都收到同一个错误
+                for item in batch:
+                    item.error = e
+                    item.done.set()
+                continue
+            with self._sizes_lock:
+                self.batch_sizes.append(len(texts))
+
+            start = 0
+            for item in batch:
+                stop = start + len(item.texts)
+                item.result = {k: v[start:stop].tolist() for k, v in scores.items()}
+                item.done.set()
+                start = stop
+
+# ---------------------------------------------------------------------------
+# 延迟统计
+# ---------------------------------------------------------------------------
+
+class LatencyStats:
+    """Rolling window of request latencies (milliseconds)."""
+
+    def __init__(self, window: int = 10_000):
+        self._lat = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.texts = 0
+
+    def add(self, ms: float, n_texts: int):
+        with self._lock:
+            self._lat.append(ms)
+            self.requests += 1
+            self.texts += n_texts
+
+    def snapshot(self, batch_sizes) -> dict:
+        with self._lock:
+            lat = np.array(self._lat)
+            requests, texts = self.requests, self.texts
+        sizes = np.array(batch_sizes)
+        pct = (lambda a, q: round(float(np.percentile(a, q)), 3) if a.size else None)
+        return {
+            "requests": requests,
+            "texts": texts,
+            "latency_ms": {"p50": pct(lat, 50), "p90": pct(lat, 90), "p99": pct(lat, 99),
+                           "max": pct(lat, 100)},
+            "batches": int(sizes.size),
+            "batch_size": {"mean": round(float(sizes.mean()), 2) if sizes.size else None,
+                           "p99": pct(sizes, 99)},
+        }
+
+# ---------------------------------------------------------------------------
+# HTTP
+# ---------------------------------------------------------------------------
+
+class ToneHandler(BaseHTTPRequestHandler):
+    server_version = "ToneService/1.0"
+    protocol_version = "HTTP/1.1"          # keep-alive：客户端可复用连接
+
+    def _send(self, code: int, payload: dict):
+        body = json.dumps(payload).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send(200, self.server.stats.snapshot(self.server.batcher.batch_size_history()))
+        else:
+            self._send(404, {"error": f"unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/score":
+            self._send(404, {"error": f"unknown path {self.path}"})
+            return
+        t0 = time.perf_counter()
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            texts = body.get("texts") if isinstance(body, dict) else None   # [1, 2] / "x" 也是合法 JSON
+            if not isinstance(texts, list):
+                raise ValueError('body must be {"texts": [...]}')
+            texts = [str(t) for t in texts]
+        except ValueError as e:             # json.JSONDecodeError 也是 ValueError
+            self._send(400, {"error": str(e)})
+            return
+
+        try:
+            result = self.server.batcher.score(texts) if texts else \
+                {"p_pos": [], "p_neg": [], "net_tone": []}
+        except Exception as e:
+            logging.exception("scoring failed")
+            self._send(500, {"error": str(e)})
+            return
+        self.server.stats.add((time.perf_counter() - t0) * 1000, len(texts))
+        self._send(200, result)
+
+    def log_message(self, fmt, *args):      # 每个请求都打日志会拖慢尾延迟
+        logging.debug(fmt, *args)
+
+
+class ToneHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = socket.SOMAXCONN   # 默认 listen(5)：并发突发时多余连接直接被 reset
+
+
+class UnixToneServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    request_queue_size = socket.SOMAXCONN
+
+    def get_request(self):
+        sock, _ = super().get_request()
+        return sock, ("unix", 0)            # BaseHTTPRequestHandler 需要 (host, port)
+
+
+def make_server(models, host="127.0.0.1", port=8765, unix_socket=None,
+                max_wait_ms=2.0, max_batch=512):
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.unlink(unix_socket)
+        server = UnixToneServer(unix_socket, ToneHandler)
+    else:
+        server = ToneHTTPServer((host, port), ToneHandler)
+    server.batcher = MicroBatcher(models, max_wait_ms, max_batch)
+    server.stats = LatencyStats()
+    return server
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s",
+                        datefmt="%H:%M:%S")
+    ap = argparse.ArgumentParser(description="Real-time net_tone scoring service")
+    ap.add_argument("--model_dir", default="models")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--unix", default=None, help="监听 Unix socket 路径（替代 TCP）")
+    ap.add_argument("--max_wait_ms", type=float, default=2.0, help="请求合并等待窗口（毫秒）")
+    ap.add_argument("--max_batch", type=int, default=512, help="单批最多文本数")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    models = load_models(args.model_dir)
+    logging.info("模型已载入 (%.2fs)", time.perf_counter() - t0)
+
+    server = make_server(models, args.host, args.port, args.unix, args.max_wait_ms, args.max_batch)
+    logging.info("监听 %s", args.unix or f"http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.unix and os.path.exists(args.unix):
+            os.unlink(args.unix)
+
+
+if __name__ == "__main__":
+    main()
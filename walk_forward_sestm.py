@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Walk-forward SESTM 流水线（样本外 net_tone）
+==========================================
+* 按周期（默认月）切分：expanding / rolling 训练窗 → 只为 **下一个窗口** 生成样本外信号
+* 每个窗口重新做 min_df 过滤 + χ² 词筛选 + 2‑Topic LDA + Logistic（与 day2 流水线同一套组件）
+* **计数复用**：全样本只做一次 CountVectorizer；每个周期的词频 / 文档频数 / 正类词频
+  预先汇总成 周期 × 词 的稀疏矩阵 → 任意窗口的 min_df 与 χ² 只需对窗口内几行求和，不再重新扫描文本
+* 各窗口的 LDA / Logistic 训练互相独立 → joblib 多进程并行
+
+运行示例
+--------
+```bash
+python walk_forward_sestm.py --data filter_2017_cleaned_aligned_data.csv \
+    --scheme expanding --min_train_periods 3 --n_jobs 4
+```
+输出与 day2_export_signals.py 同格式（仅含样本外行）：
+`tweet_level_preds_wf.csv`、`signals_wf.parquet`，以及窗口汇总 `walk_forward_windows.csv`。
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import time
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+from joblib import Parallel, delayed
+from sklearn.feature_extraction.text import CountVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, roc_auc_score
+
+from day2_sestm_pipeline_delete_noise import build_stopwords, setup_logging, train_lda
+
+RETURN_COLS = ["1_DAY_RETURN", "2_DAY_RETURN", "3_DAY_RETURN", "7_DAY_RETURN"]
+
+# ---------------------------------------------------------------------------
+# 窗口定义
+# ---------------------------------------------------------------------------
+
+@dataclass
+class Window:
+    train_start: int      # 周期编号（含）
+    train_end: int        # 周期编号（不含）
+    test_end: int         # 测试期为 [train_end, test_end)
+
+
+def make_windows(
+    n_periods: int,
+    scheme: str = "expanding",
+    train_periods: int = 6,
+    min_train_periods: int = 3,
+    test_periods: int = 1,
+) -> List[Window]:
+    """Expanding or rolling train windows, each followed by its test block."""
+    windows = []
+    first = train_periods if scheme == "rolling" else min_train_periods
+    for end in range(first, n_periods, test_periods):
+        start = max(0, end - train_periods) if scheme == "rolling" else 0
+        windows.append(Window(start, end, min(end + test_periods, n_periods)))
+    return windows
+
+# ---------------------------------------------------------------------------
+# 周期级计数（一次计算，所有窗口复用）
+# ---------------------------------------------------------------------------
+
+class PeriodCounts:
+    """Per-period term statistics over one global count matrix.
+
+    Document frequency, term counts and positive-class term counts are kept
+    as sparse period × term matrices; a window is the sum of its rows, so
+    `min_df` filtering and the χ² scores never rescan the documents and the
+    vocabulary is never densified per period.
+    """
+
+    def __init__(self, X: sp.csr_matrix, period: np.ndarray, y: np.ndarray, n_periods: int):
+        n_docs = X.shape[0]
+        G = sp.csr_matrix((np.ones(n_docs), (period, np.arange(n_docs))),
+                          shape=(n_periods, n_docs))
+        G_pos = G @ sp.diags(y.astype(float))
+        X_bin = X.copy()
+        X_bin.data[:] = 1
+
+        self.doc_freq = sp.csr_matrix(G @ X_bin)
+        self.term_count = sp.csr_matrix(G @ X)
+        self.pos_count = sp.csr_matrix(G_pos @ X)
+        self.n_docs = np.concatenate([[0], np.cumsum(np.bincount(period, minlength=n_periods))])
+        self.n_pos = np.concatenate([[0], np.cumsum(np.bincount(period, weights=y, minlength=n_periods))])
+
+    def window(self, w: Window):
+        a, b = w.train_start, w.train_end
+
+        def total(M):
+            return np.asarray(M[a:b].sum(axis=0)).ravel()
+
+        return (total(self.doc_freq),
+                total(self.term_count),
+                total(self.pos_count),
+                self.n_docs[b] - self.n_docs[a],
+                self.n_pos[b] - self.n_pos[a])
+
+
+def chi2_from_counts(term_count, pos_count, n_docs, n_pos) -> np.ndarray:
+    """Same statistic as `sklearn.feature_selection.chi2` for a binary label."""
+    observed = np.vstack([term_count - pos_count, pos_count])
+    class_prob = np.array([n_docs - n_pos, n_pos])[:, None] / n_docs
+    expected = class_prob * term_count
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return ((observed - expected) ** 2 / expected).sum(axis=0)
+
+
+def select_window_terms(stats, min_df: int, top_k: int) -> np.ndarray:
+    """Column ids kept for one window: min_df on train docs, then χ² top-k."""
+    doc_freq, term_count, pos_count, n_docs, n_pos = stats
+    candidates = np.flatnonzero(doc_freq >= min_df)
+    scores = chi2_from_counts(term_count[candidates], pos_count[candidates], n_docs, n_pos)
+    keep = candidates[np.argsort(scores, kind="stable")[-top_k:]]
+    return np.sort(keep)
+
+# ---------------------------------------------------------------------------
+# 单窗口训练（在子进程中运行）
+# ---------------------------------------------------------------------------
+
+def fit_window(X_train, y_train, X_test, n_topics: int = 2) -> dict:
+    """LDA + Logistic on one training window; score the following test block.
+
+    Topic labels are arbitrary between refits, so net_tone is oriented by
+    the training classifier: the topic with the larger "up" coefficient is
+    the positive one.
+    """
+    t0 = time.perf_counter()
+    lda, doc_topic = train_lda(X_train, n_topics)
+    clf = LogisticRegression(max_iter=1000)
+    clf.fit(doc_topic, y_train)
+
+    test_topic = lda.transform(X_test)
+    pos_topic, neg_topic = np.argsort(clf.coef_[0])[[-1, 0]]
+    return dict(
+        p_pos=clf.predict_proba(test_topic)[:, 1],
+        net_tone=test_topic[:, pos_topic] - test_topic[:, neg_topic],
+        fit_seconds=time.perf_counter() - t0,
+    )
+
+# ---------------------------------------------------------------------------
+# 主流程
+# ---------------------------------------------------------------------------
+
+def walk_forward(
+    df: pd.DataFrame,
+    text_col: str = "cleaned_text",
+    date_col: str = "DATE",
+    return_col: str = "1_DAY_RETURN",
+    freq: str = "M",
+    scheme: str = "expanding",
+    train_periods: int = 6,
+    min_train_periods: int = 3,
+    test_periods: int = 1,
+    top_k: int = 5000,
+    min_df: int = 3,
+    remove_brand_words: bool = False,
+    n_jobs: int = -1,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Out-of-sample tweet-level predictions and a per-window summary."""
+    df = df.dropna(subset=[text_col, return_col]).sort_values(date_col, kind="stable")
+    df = df.reset_index(drop=True)
+    y = (df[return_col] > 0).astype(int).to_numpy()
+
+    periods = pd.to_datetime(df[date_col]).dt.to_period(freq)
+    period_index = pd.PeriodIndex(sorted(periods.unique()))
+    period = period_index.get_indexer(periods)
+
+    logging.info("→ 全样本向量化（只做一次）…")
+    vec = CountVectorizer(min_df=1, stop_words=build_stopwords(remove_brand_words), lowercase=True)
+    X = vec.fit_transform(df[text_col]).tocsr()
+    counts = PeriodCounts(X, period, y, len(period_index))
+
+    windows = make_windows(len(period_index), scheme, train_periods, min_train_periods, test_periods)
+    if not windows:
+        raise ValueError(f"只有 {len(period_index)} 个周期，不足以构造 walk-forward 窗口")
+    logging.info("→ %d 个窗口 (%s, freq=%s)", len(windows), scheme, freq)
+
+    # 行按日期排序 → 每个窗口的行是连续切片
+    bounds = np.searchsorted(period, np.arange(len(period_index) + 1))
+    jobs, meta = [], []
+    for w in windows:
+        cols = select_window_terms(counts.window(w), min_df, top_k)
+        tr = slice(bounds[w.train_start], bounds[w.train_end])
+        te = slice(bounds[w.train_end], bounds[w.test_end])
+        jobs.append(delayed(fit_window)(X[tr][:, cols], y[tr], X[te][:, cols]))
+        meta.append((w, tr, te, len(cols)))
+
+    results = Parallel(n_jobs=n_jobs)(jobs)
+
+    preds, summary = [], []
+    for (w, tr, te, n_terms), res in zip(meta, results):
+        out = df.iloc[te].drop(columns=[text_col]).copy()
+        out["p_pos"] = res["p_pos"]
+        out["p_neg"] = 1 - res["p_pos"]
+        out["net_tone"] = res["net_tone"]
+        out["window"] = len(summary)
+        preds.append(out)
+
+        y_te = y[te]
+        auc = roc_auc_score(y_te, res["p_pos"]) if len(np.unique(y_te)) == 2 else np.nan
+        summary.append({
+            "window": len(summary),
+            "train_start": str(period_index[w.train_start]),
+            "train_end": str(period_index[w.train_end - 1]),
+            "test_start": str(period_index[w.train_end]),
+            "test_end": str(period_index[w.test_end - 1]),
+            "n_train": tr.stop - tr.start,
+            "n_test": te.stop - te.start,
+            "n_terms": n_terms,
+            "oos_auc": auc,
+            "oos_acc": accuracy_score(y_te, (res["p_pos"] > 0.5).astype(int)),
+            "fit_seconds": res["fit_seconds"],
+        })
+    return pd.concat(preds, ignore_index=True), pd.DataFrame(summary)
+
+
+def main():
+    setup_logging()
+    ap = argparse.ArgumentParser(description="Walk-forward SESTM: 样本外 net_tone")
+    ap.add_argument("--data", default="filter_2017_cleaned_aligned_data.csv", help="CSV 数据路径")
+    ap.add_argument("--text_col", default="cleaned_text", help="文本列名")
+    ap.add_argument("--date_col", default="DATE")
+    ap.add_argument("--ticker_col", default="STOCK_CODE")
+    ap.add_argument("--return_col", default="1_DAY_RETURN", help="收益列名，用于派生标签")
+    ap.add_argument("--freq", default="M", help="重训周期（pandas Period 频率，如 M / Q / W）")
+    ap.add_argument("--scheme", choices=["expanding", "rolling"], default="expanding")
+    ap.add_argument("--train_periods", type=int, default=6, help="rolling 训练窗长度（周期数）")
+    ap.add_argument("--min_train_periods", type=int, default=3, help="expanding 首个窗口的最少周期数")
+    ap.add_argument("--test_periods", type=int, default=1, help="每个窗口的样本外周期数")
+    ap.add_argument("--top_k", type=int, default=5000, help="词筛选 top‑k 大小")
+    ap.add_argument("--min_df", type=int, default=3)
+    ap.add_argument("--remove_brand_words", action="store_true")
+    ap.add_argument("--n_jobs", type=int, default=-1, help="并行进程数 (-1 = 全部核心)")
+    ap.add_argument("--out_tweet_csv", default="tweet_level_preds_wf.csv")
+    ap.add_argument("--out_signal_pq", default="signals_wf.parquet")
+    ap.add_argument("--out_windows_csv", default="walk_forward_windows.csv")
+    args = ap.parse_args()
+
+    df = pd.read_csv(args.data, parse_dates=[args.date_col])
+    t0 = time.perf_counter()
+    preds, summary = walk_forward(
+        df, args.text_col, args.date_col, args.return_col, args.freq, args.scheme,
+        args.train_periods, args.min_train_periods, args.test_periods,
+        args.top_k, args.min_df, args.remove_brand_words, args.n_jobs,
+    )
+    logging.info("walk-forward 完成，用时 %.1fs", time.perf_counter() - t0)
+
+    keep = [c for c in [args.date_col, args.ticker_col, "p_pos", "p_neg", "net_tone", "window",
+                        "LAST_PRICE", *RETURN_COLS, "TWEET"] if c in preds.columns]
+    preds[keep].to_csv(args.out_tweet_csv, index=False)
+    summary.to_csv(args.out_windows_csv, index=False)
+
+    daily = (
+        preds.groupby([args.date_col, args.ticker_col])["net_tone"]
+        .mean()
+        .unstack(fill_value=np.nan)
+        .sort_index()
+    )
+    daily.to_parquet(args.out_signal_pq)
+    logging.info("样本外 AUC 均值 = %.3f", summary["oos_auc"].mean())
+    logging.info("✔ 导出 %s %s / %s / %s", args.out_signal_pq, daily.shape,
+                 args.out_tweet_csv, args.out_windows_csv)
+
+
+if __name__ == "__main__":
+    main()